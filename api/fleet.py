@@ -0,0 +1,75 @@
+"""
+SysGuard fleet aggregator - HTTP side
+Runs the agent ingest server inside the FastAPI app and serves the fleet
+overview, per-host history and a websocket feed:
+
+    uvicorn api.fleet:app_fleet --port 8100
+"""
+import asyncio
+import time
+from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi.responses import Response
+from cli.config import load_config
+from fleet.agent import DEFAULT_PORT, parse_address
+from fleet.aggregator import Aggregator
+from monitor import selfstats
+from storage.fleet import FleetStore
+
+# A websocket send slower than this drops the client
+SEND_TIMEOUT = 5.0
+
+_config = load_config()
+_fleet = _config.get('fleet', {})
+_listen = parse_address(_fleet.get('listen', f"0.0.0.0:{DEFAULT_PORT}"))
+aggregator = Aggregator(
+    FleetStore(retention=_config.get('storage', {}).get('retention')),
+    host=_listen[0], port=_listen[1],
+    batch_size=_fleet.get('batch_size', 5000),
+    flush_interval=_fleet.get('flush_interval', 1.0),
+)
+
+app_fleet = FastAPI()
+
+@app_fleet.on_event("startup")
+async def start_aggregator():
+    await aggregator.start()
+
+@app_fleet.on_event("shutdown")
+async def stop_aggregator():
+    await aggregator.stop()
+
+@app_fleet.get("/fleet")
+async def fleet():
+    """Latest sample of every host plus fleet-wide totals"""
+    if aggregator.payload is None:
+        aggregator.publish()
+    return Response(content=aggregator.payload, media_type="application/json")
+
+@app_fleet.get("/fleet/history")
+def fleet_history(host: str, metric: str = "cpu", since: float = None, until: float = None):
+    """One host's stored samples between epoch timestamps"""
+    until = time.time() if until is None else until
+    since = until - 3600 if since is None else since
+    try:
+        rows = aggregator.store.query(host, metric, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"host": host, "metric": metric, "points": [{"t": ts, "value": v} for ts, v in rows]}
+
+@app_fleet.get("/metrics")
+async def metrics():
+    """Aggregator overhead in the Prometheus text format"""
+    return Response(content=selfstats.render(), media_type="text/plain; version=0.0.4")
+
+@app_fleet.websocket("/ws")
+async def fleet_feed(ws: WebSocket):
+    """The fleet overview every publish interval"""
+    await ws.accept()
+    queue = aggregator.subscribe()
+    try:
+        while True:
+            await asyncio.wait_for(ws.send_text(await queue.get()), SEND_TIMEOUT)
+    except Exception:
+        pass
+    finally:
+        aggregator.unsubscribe(queue)
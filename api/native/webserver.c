@@ -1,9 +1,20 @@
+#define _GNU_SOURCE
 #include <stdio.h>
+#include <stdarg.h>
+#include <stddef.h>
+#include <math.h>
 #include <stdlib.h>
 #include <string.h>
+#include <strings.h>
+#include <stdint.h>
 #include <unistd.h>
 #include <sys/socket.h>
+#include <sys/epoll.h>
+#include <sys/eventfd.h>
+#include <sys/uio.h>
+#include <sys/resource.h>
 #include <netinet/in.h>
+#include <netinet/tcp.h>
 #include <pthread.h>
 #include <fcntl.h>
 #include <sys/stat.h>
@@ -11,24 +22,213 @@
 #include <signal.h>
 #include <dlfcn.h>
 #include <time.h>
+#include <zlib.h>
+#include <sqlite3.h>
 
 #define PORT 8000
 #define BUFFER_SIZE 8192
-#define MAX_CLIENTS 50
+#define LISTEN_BACKLOG 1024
+#define MAX_CONNECTIONS 4096
+#define MAX_WS_CLIENTS 256
+#define MAX_EVENTS 256
 #define WEB_ROOT "../web"
 
-typedef char* (*metrics_fn)(void);
+#define PROCESS_LIMIT 10
+// REFRESH_* flags in lib.rs
+#define REFRESH_CPU 0x01
+#define REFRESH_MEMORY 0x02
+#define REFRESH_DISK 0x04
+#define REFRESH_PROCESSES 0x08
+#define REFRESH_DISK_IO 0x20
+#define REFRESH_NETWORK 0x40
+#define REFRESH_ALL 0x6F  // every subsystem except per-process IO
+// Adaptive sampling defaults, matching monitoring.adaptive in config/sysguard.yaml.
+// api/server.py passes the configured values in SYSGUARD_SAMPLE_* variables.
+#define MIN_INTERVAL_MS 500
+#define MAX_INTERVAL_MS 10000
+#define PROCESS_CADENCE_MS 5000
+#define DISK_CADENCE_MS 30000
+#define CALM 0.7
+#define MAX_LIMITS 32
+// A subscriber whose socket stays full this long is disconnected
+#define WS_SEND_TIMEOUT_SEC 5
+// Idle keep-alive connections are closed after this long
+#define KEEPALIVE_TIMEOUT_SEC 30
+// Stop parsing pipelined requests while this much output is unsent
+#define OUTPUT_HIGH_WATER (256 * 1024)
+// Queued output pieces per connection (headers, bodies, frames)
+#define MAX_SEGMENTS 64
+// Static assets are re-checked on disk at most this often
+#define ASSET_CHECK_SEC 1
+// Metric history, written by the Python side (storage/db.py); SYSGUARD_DB overrides
+#define DB_PATH "storage/sysguard.db"
+// Row bound and retention defaults matching storage/db.py and storage/rollup.py;
+// SYSGUARD_RETENTION_RAW_HOURS / _MINUTE_DAYS override the retention
+#define MAX_POINTS 2000
+#define RAW_HOURS 48
+#define MINUTE_DAYS 30
+
+#define WS_GUID "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+// Subscription channels, matching CHANNEL_* in the Rust delta module
+#define CHANNEL_CPU 1
+#define CHANNEL_MEMORY 2
+#define CHANNEL_DISK 4
+#define CHANNEL_PROCESSES 8
+#define CHANNEL_IO 16
+#define CHANNEL_NETWORK 32
+#define CHANNEL_ALL 0x3F
+// Full keyframe after this many deltas
+#define KEYFRAME_EVERY 60
+#define DELTA_CACHE_SIZE 16
+
+// Scalar metrics, mirrors SgMetrics in lib.rs
+typedef struct {
+    uint64_t mem_total_mb;
+    uint64_t mem_used_mb;
+    uint64_t mem_available_mb;
+    uint64_t disk_total_gb;
+    uint64_t disk_used_gb;
+    uint64_t disk_free_gb;
+    double load_avg_1;
+    double load_avg_5;
+    double load_avg_15;
+    double mem_percent;
+    double disk_percent;
+    float cpu_usage_percent;
+    uint32_t cores_logical;
+    uint32_t process_count;
+    uint32_t process_written;
+} sg_metrics_t;
+
+typedef void* (*collector_new_fn)(void);
+typedef void (*collector_refresh_fn)(void*, unsigned int);
+typedef size_t (*collector_read_fn)(void*, sg_metrics_t*, void*, size_t);
+typedef char* (*collector_read_json_fn)(const void*, size_t);
+typedef void (*collector_free_fn)(void*);
+typedef char* (*metrics_delta_fn)(const char*, const char*, unsigned int);
 typedef void (*free_fn)(char*);
 
 static void* rust_lib = NULL;
-static metrics_fn rust_get_metrics = NULL;
+static collector_new_fn rust_collector_new = NULL;
+static collector_refresh_fn rust_collector_refresh = NULL;
+static collector_read_json_fn rust_collector_read_json = NULL;
+static collector_read_fn rust_collector_read = NULL;
+static collector_free_fn rust_collector_free = NULL;
+static metrics_delta_fn rust_metrics_delta = NULL;
 static free_fn rust_free_string = NULL;
 static volatile int running = 1;
 
+/*
+ * One sampled metrics document, kept both as the raw JSON (for /health) and
+ * as a complete WebSocket text frame (header + payload) so every subscriber
+ * is sent the same bytes. The JSON is NUL-terminated after the frame so it
+ * can be handed back to Rust. Frames are reference counted and immutable;
+ * with header_len 0 they also hold cached assets and response headers, so
+ * bodies are queued by reference instead of copied.
+ */
+typedef struct {
+    int refs;
+    unsigned long seq;
+    // Monotonic time the sample was published
+    uint64_t published_ns;
+    size_t header_len;
+    size_t len;
+    unsigned char data[];
+} frame_t;
+
+/*
+ * Broadcast hub: the sampler publishes the latest frame, bumps `seq` and
+ * signals the event loop through `notify_fd`. Subscribers always take the
+ * newest frame, so a client that falls behind skips intermediate samples
+ * instead of queueing them.
+ */
+static struct {
+    pthread_mutex_t lock;
+    frame_t* latest;
+    unsigned long seq;
+    int notify_fd;
+} hub = {PTHREAD_MUTEX_INITIALIZER, NULL, 0, -1};
+
+enum { CONN_HTTP, CONN_WS };
+
+// `len` bytes of `frame->data` starting at `off`, waiting to be written
+typedef struct {
+    frame_t* frame;
+    size_t off;
+    size_t len;
+} segment_t;
+
+/*
+ * Per-connection state for the event loop. Input is parsed in place and
+ * may hold several pipelined requests; output is a ring of segments that
+ * is written with one writev.
+ */
+typedef struct conn {
+    int fd;
+    int state;
+    int close_after_write;
+    char in[BUFFER_SIZE + 1];
+    size_t in_len;
+    segment_t out[MAX_SEGMENTS];
+    int out_head;
+    int out_count;
+    size_t out_bytes;
+    unsigned long seen;
+    // Subscription: 0 channels means legacy full documents every sample
+    unsigned int channels;
+    uint64_t interval_ns;
+    uint64_t last_sent_ns;
+    frame_t* base;
+    int since_keyframe;
+    time_t last_active;
+    time_t stalled_since;
+    uint32_t events;
+    struct conn* prev;
+    struct conn* next;
+} conn_t;
+
+static conn_t* connections = NULL;
+// Closed during the current batch of events; freed once the batch is done
+static conn_t* closed_connections = NULL;
+static int connection_count = 0;
+static int ws_count = 0;
+static int epoll_fd = -1;
+
+/*
+ * Static files kept in memory with a gzip variant and validators. They are
+ * reloaded when the file on disk changes (checked at most once a second).
+ */
+typedef struct {
+    const char* name;
+    frame_t* body;
+    frame_t* gzip;
+    char etag[64];
+    char last_modified[64];
+    time_t mtime;
+    off_t size;
+    ino_t ino;
+    time_t checked;
+} asset_t;
+
+static asset_t assets[] = {
+    {.name = "index.html"},
+    {.name = "dashboard.js"},
+};
+
 void handle_signal(int sig) {
     running = 0;
 }
 
+// The sampler leaves signals to the event loop so epoll_wait() sees EINTR
+static void block_signals(void) {
+    sigset_t set;
+    sigemptyset(&set);
+    sigaddset(&set, SIGINT);
+    sigaddset(&set, SIGTERM);
+    pthread_sigmask(SIG_BLOCK, &set, NULL);
+}
+
 int load_rust_library() {
     const char* lib_path = "monitor/native/rust/target/release/libsysguard_monitor.so";
     rust_lib = dlopen(lib_path, RTLD_LAZY);
@@ -36,19 +236,686 @@ int load_rust_library() {
         fprintf(stderr, "Failed to load Rust library: %s\n", dlerror());
         return 0;
     }
-    
-    rust_get_metrics = (metrics_fn)dlsym(rust_lib, "rust_get_metrics_json");
+
+    rust_collector_new = (collector_new_fn)dlsym(rust_lib, "rust_collector_new");
+    rust_collector_refresh = (collector_refresh_fn)dlsym(rust_lib, "rust_collector_refresh");
+    rust_collector_read_json = (collector_read_json_fn)dlsym(rust_lib, "rust_collector_read_json");
+    rust_collector_read = (collector_read_fn)dlsym(rust_lib, "rust_collector_read");
+    rust_collector_free = (collector_free_fn)dlsym(rust_lib, "rust_collector_free");
+    rust_metrics_delta = (metrics_delta_fn)dlsym(rust_lib, "rust_metrics_delta");
     rust_free_string = (free_fn)dlsym(rust_lib, "rust_free_string");
-    
-    if (!rust_get_metrics || !rust_free_string) {
+
+    if (!rust_collector_new || !rust_collector_refresh || !rust_collector_read_json ||
+        !rust_collector_read || !rust_collector_free || !rust_metrics_delta || !rust_free_string) {
         fprintf(stderr, "Failed to load Rust functions\n");
         dlclose(rust_lib);
         return 0;
     }
-    
+
     return 1;
 }
 
+/* --- SHA-1 / base64 for the WebSocket handshake (RFC 6455 4.2.2) ------- */
+
+#define ROL32(v, n) (((v) << (n)) | ((v) >> (32 - (n))))
+
+static void sha1_block(uint32_t h[5], const unsigned char* p) {
+    uint32_t w[80];
+    for (int i = 0; i < 16; i++) {
+        w[i] = (uint32_t)p[i * 4] << 24 | (uint32_t)p[i * 4 + 1] << 16 |
+               (uint32_t)p[i * 4 + 2] << 8 | (uint32_t)p[i * 4 + 3];
+    }
+    for (int i = 16; i < 80; i++) {
+        w[i] = ROL32(w[i - 3] ^ w[i - 8] ^ w[i - 14] ^ w[i - 16], 1);
+    }
+    uint32_t a = h[0], b = h[1], c = h[2], d = h[3], e = h[4];
+    for (int i = 0; i < 80; i++) {
+        uint32_t f, k;
+        if (i < 20) { f = (b & c) | (~b & d); k = 0x5A827999; }
+        else if (i < 40) { f = b ^ c ^ d; k = 0x6ED9EBA1; }
+        else if (i < 60) { f = (b & c) | (b & d) | (c & d); k = 0x8F1BBCDC; }
+        else { f = b ^ c ^ d; k = 0xCA62C1D6; }
+        uint32_t t = ROL32(a, 5) + f + e + k + w[i];
+        e = d; d = c; c = ROL32(b, 30); b = a; a = t;
+    }
+    h[0] += a; h[1] += b; h[2] += c; h[3] += d; h[4] += e;
+}
+
+static void sha1(const unsigned char* data, size_t len, unsigned char out[20]) {
+    uint32_t h[5] = {0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0};
+    unsigned char block[64];
+    size_t i = 0;
+    for (; i + 64 <= len; i += 64) sha1_block(h, data + i);
+
+    size_t rest = len - i;
+    memset(block, 0, sizeof(block));
+    memcpy(block, data + i, rest);
+    block[rest] = 0x80;
+    if (rest >= 56) {
+        sha1_block(h, block);
+        memset(block, 0, sizeof(block));
+    }
+    uint64_t bits = (uint64_t)len * 8;
+    for (int j = 0; j < 8; j++) block[63 - j] = (bits >> (j * 8)) & 0xFF;
+    sha1_block(h, block);
+
+    for (int j = 0; j < 5; j++) {
+        out[j * 4] = h[j] >> 24;
+        out[j * 4 + 1] = h[j] >> 16;
+        out[j * 4 + 2] = h[j] >> 8;
+        out[j * 4 + 3] = h[j];
+    }
+}
+
+static void base64_encode(const unsigned char* in, size_t len, char* out) {
+    static const char table[] =
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+    size_t i = 0;
+    for (; i + 2 < len; i += 3) {
+        *out++ = table[in[i] >> 2];
+        *out++ = table[((in[i] & 3) << 4) | (in[i + 1] >> 4)];
+        *out++ = table[((in[i + 1] & 15) << 2) | (in[i + 2] >> 6)];
+        *out++ = table[in[i + 2] & 63];
+    }
+    if (i < len) {
+        *out++ = table[in[i] >> 2];
+        if (i + 1 < len) {
+            *out++ = table[((in[i] & 3) << 4) | (in[i + 1] >> 4)];
+            *out++ = table[(in[i + 1] & 15) << 2];
+        } else {
+            *out++ = table[(in[i] & 3) << 4];
+            *out++ = '=';
+        }
+        *out++ = '=';
+    }
+    *out = '\0';
+}
+
+/* --- frames and the sampler -------------------------------------------- */
+
+static uint64_t now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+}
+
+static frame_t* frame_build(const char* json, size_t len) {
+    unsigned char header[10];
+    size_t header_len;
+
+    header[0] = 0x81;
+    if (len <= 125) {
+        header[1] = len;
+        header_len = 2;
+    } else if (len <= 65535) {
+        header[1] = 126;
+        header[2] = (len >> 8) & 0xFF;
+        header[3] = len & 0xFF;
+        header_len = 4;
+    } else {
+        header[1] = 127;
+        for (int i = 0; i < 8; i++) {
+            header[2 + i] = ((unsigned long long)len >> (56 - i * 8)) & 0xFF;
+        }
+        header_len = 10;
+    }
+
+    frame_t* frame = malloc(sizeof(frame_t) + header_len + len + 1);
+    if (!frame) return NULL;
+    frame->refs = 1;
+    frame->seq = 0;
+    frame->header_len = header_len;
+    frame->len = header_len + len;
+    memcpy(frame->data, header, header_len);
+    memcpy(frame->data + header_len, json, len);
+    frame->data[header_len + len] = '\0';
+    return frame;
+}
+
+// Plain shared buffer of `len` bytes
+static frame_t* frame_alloc(size_t len) {
+    frame_t* frame = malloc(sizeof(frame_t) + len + 1);
+    if (!frame) return NULL;
+    frame->refs = 1;
+    frame->seq = 0;
+    frame->header_len = 0;
+    frame->len = len;
+    frame->data[len] = '\0';
+    return frame;
+}
+
+static void frame_release(frame_t* frame) {
+    if (frame && __atomic_sub_fetch(&frame->refs, 1, __ATOMIC_ACQ_REL) == 0) {
+        free(frame);
+    }
+}
+
+// Returns a reference to the newest frame (or NULL) and its sequence number
+static frame_t* hub_acquire(unsigned long* seq) {
+    pthread_mutex_lock(&hub.lock);
+    frame_t* frame = hub.latest;
+    if (frame) __atomic_add_fetch(&frame->refs, 1, __ATOMIC_RELAXED);
+    if (seq) *seq = hub.seq;
+    pthread_mutex_unlock(&hub.lock);
+    return frame;
+}
+
+static void hub_publish(frame_t* frame) {
+    pthread_mutex_lock(&hub.lock);
+    frame_t* old = hub.latest;
+    hub.latest = frame;
+    frame->seq = ++hub.seq;
+    frame->published_ns = now_ns();
+    pthread_mutex_unlock(&hub.lock);
+    frame_release(old);
+
+    uint64_t one = 1;
+    if (write(hub.notify_fd, &one, sizeof(one)) < 0 && errno != EAGAIN) {
+        perror("eventfd write");
+    }
+}
+
+/* --- self-instrumentation ----------------------------------------------- */
+
+/*
+ * Fixed-bucket histograms and counters for the server's own overhead,
+ * served on /metrics in the Prometheus text format. Each metric has one
+ * writer thread, so recording is a few relaxed atomic adds; /metrics reads
+ * them from the event loop.
+ */
+
+// Upper bounds in seconds, matching LATENCY_BUCKETS in monitor/selfstats.py
+static const double latency_buckets[] = {
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+};
+#define LATENCY_BUCKET_COUNT (sizeof(latency_buckets) / sizeof(latency_buckets[0]))
+
+typedef struct {
+    const char* name;
+    const char* help;
+    uint64_t counts[LATENCY_BUCKET_COUNT + 1];
+    uint64_t sum_ns;
+    uint64_t count;
+} histogram_t;
+
+static histogram_t refresh_seconds = {
+    .name = "sysguard_native_refresh_seconds", .help = "Native collector refresh time"};
+static histogram_t ffi_read_seconds = {
+    .name = "sysguard_ffi_read_seconds", .help = "Time reading collector results across the FFI"};
+static histogram_t sample_seconds = {
+    .name = "sysguard_sample_seconds", .help = "Time to collect one snapshot, refresh to published"};
+static histogram_t delta_encode_seconds = {
+    .name = "sysguard_delta_encode_seconds", .help = "Time encoding one keyframe or delta message"};
+static histogram_t query_seconds = {
+    .name = "sysguard_db_query_seconds", .help = "Time answering one history query"};
+
+static struct {
+    uint64_t http_requests;
+    uint64_t sample_errors;
+    uint64_t frames_sent;
+    uint64_t frames_dropped;
+    uint64_t clients_dropped;
+} stats;
+
+static void histogram_observe(histogram_t* h, uint64_t started_ns) {
+    uint64_t elapsed = now_ns() - started_ns;
+    double seconds = elapsed / 1e9;
+    size_t i = 0;
+    while (i < LATENCY_BUCKET_COUNT && seconds > latency_buckets[i]) i++;
+    __atomic_add_fetch(&h->counts[i], 1, __ATOMIC_RELAXED);
+    __atomic_add_fetch(&h->sum_ns, elapsed, __ATOMIC_RELAXED);
+    __atomic_add_fetch(&h->count, 1, __ATOMIC_RELAXED);
+}
+
+static void timespec_add_ms(struct timespec* ts, long ms) {
+    ts->tv_sec += ms / 1000;
+    ts->tv_nsec += (ms % 1000) * 1000000L;
+    if (ts->tv_nsec >= 1000000000L) {
+        ts->tv_sec++;
+        ts->tv_nsec -= 1000000000L;
+    }
+}
+
+/*
+ * Adaptive sampling, the same policy as monitor/scheduler.py: the interval
+ * is max_ms while every watched metric is below `calm` of its limit,
+ * min_ms at or past a limit, and shrinks geometrically in between. A
+ * metric also counts where it would be one interval later at its current
+ * rate. The process table and mount usage refresh on slower cadences
+ * unless one of their metrics is close to a limit.
+ */
+typedef struct {
+    char metric[32];
+    int rising;
+    double limit;
+    double previous;
+    int seen;
+} limit_t;
+
+static struct {
+    long min_ms;
+    long max_ms;
+    long process_cadence_ms;
+    long disk_cadence_ms;
+    double calm;
+    limit_t limits[MAX_LIMITS];
+    int limit_count;
+    // Current interval, read by /metrics
+    long interval_ms;
+    // Collectors refreshed every tick while one of their metrics is near a limit
+    unsigned int urgent;
+} schedule = {
+    .min_ms = MIN_INTERVAL_MS,
+    .max_ms = MAX_INTERVAL_MS,
+    .process_cadence_ms = PROCESS_CADENCE_MS,
+    .disk_cadence_ms = DISK_CADENCE_MS,
+    .calm = CALM,
+    // monitoring.thresholds defaults
+    .limits = {
+        {.metric = "cpu_usage_percent", .rising = 1, .limit = 85.0},
+        {.metric = "memory_percent", .rising = 1, .limit = 90.0},
+        {.metric = "disk_percent", .rising = 1, .limit = 90.0},
+    },
+    .limit_count = 3,
+    .interval_ms = MIN_INTERVAL_MS,
+};
+
+/*
+ * SYSGUARD_SAMPLE_MIN_MS / _MAX_MS / _PROCESS_MS / _DISK_MS / _CALM, and
+ * SYSGUARD_SAMPLE_LIMITS as "cpu_usage_percent>85,disk_free_gb<10".
+ * Setting MIN and MAX to the same value gives a fixed interval.
+ */
+static void schedule_configure(void) {
+    const char* v;
+    if ((v = getenv("SYSGUARD_SAMPLE_MIN_MS"))) schedule.min_ms = atol(v);
+    if ((v = getenv("SYSGUARD_SAMPLE_MAX_MS"))) schedule.max_ms = atol(v);
+    if ((v = getenv("SYSGUARD_SAMPLE_PROCESS_MS"))) schedule.process_cadence_ms = atol(v);
+    if ((v = getenv("SYSGUARD_SAMPLE_DISK_MS"))) schedule.disk_cadence_ms = atol(v);
+    if ((v = getenv("SYSGUARD_SAMPLE_CALM"))) schedule.calm = atof(v);
+    if ((v = getenv("SYSGUARD_SAMPLE_LIMITS"))) {
+        int count = 0;
+        while (*v && count < MAX_LIMITS) {
+            size_t name_len = strcspn(v, "<>,");
+            if (v[name_len] != '<' && v[name_len] != '>') {
+                // Malformed entry: skip to the next one
+                v += name_len + (v[name_len] == ',');
+                continue;
+            }
+            limit_t* l = &schedule.limits[count++];
+            snprintf(l->metric, sizeof(l->metric), "%.*s", (int)name_len, v);
+            l->rising = v[name_len] == '>';
+            char* end;
+            l->limit = strtod(v + name_len + 1, &end);
+            l->seen = 0;
+            v = end + strcspn(end, ",");
+            if (*v == ',') v++;
+        }
+        schedule.limit_count = count;
+    }
+    if (schedule.min_ms < 10) schedule.min_ms = 10;
+    if (schedule.max_ms < schedule.min_ms) schedule.max_ms = schedule.min_ms;
+    if (schedule.calm <= 0.0 || schedule.calm >= 1.0) schedule.calm = CALM;
+    schedule.interval_ms = schedule.min_ms;
+}
+
+// Flattened metric names as used by autofix rules
+static int metric_value(const sg_metrics_t* m, const char* name, double* out) {
+    static const struct { const char* name; size_t offset; char type; } fields[] = {
+        {"cpu_usage_percent", offsetof(sg_metrics_t, cpu_usage_percent), 'f'},
+        {"cpu_load_avg_1", offsetof(sg_metrics_t, load_avg_1), 'd'},
+        {"cpu_load_avg_5", offsetof(sg_metrics_t, load_avg_5), 'd'},
+        {"cpu_load_avg_15", offsetof(sg_metrics_t, load_avg_15), 'd'},
+        {"memory_total_mb", offsetof(sg_metrics_t, mem_total_mb), 'u'},
+        {"memory_used_mb", offsetof(sg_metrics_t, mem_used_mb), 'u'},
+        {"memory_available_mb", offsetof(sg_metrics_t, mem_available_mb), 'u'},
+        {"memory_percent", offsetof(sg_metrics_t, mem_percent), 'd'},
+        {"disk_total_gb", offsetof(sg_metrics_t, disk_total_gb), 'u'},
+        {"disk_used_gb", offsetof(sg_metrics_t, disk_used_gb), 'u'},
+        {"disk_free_gb", offsetof(sg_metrics_t, disk_free_gb), 'u'},
+        {"disk_percent", offsetof(sg_metrics_t, disk_percent), 'd'},
+    };
+    for (size_t i = 0; i < sizeof(fields) / sizeof(fields[0]); i++) {
+        if (strcmp(fields[i].name, name) != 0) continue;
+        const char* p = (const char*)m + fields[i].offset;
+        switch (fields[i].type) {
+            case 'f': *out = *(const float*)p; break;
+            case 'd': *out = *(const double*)p; break;
+            default: *out = (double)*(const uint64_t*)p; break;
+        }
+        return 1;
+    }
+    return 0;
+}
+
+// 1.0 at the limit, 0 far below it; above 1.0 once the limit is crossed
+static double closeness(double value, int rising, double limit) {
+    if (rising) return limit > 0 ? value / limit : (value > limit ? HUGE_VAL : 0.0);
+    return value > 0 ? limit / value : HUGE_VAL;
+}
+
+// Pick the next interval from the scalars of the sample just taken
+static void schedule_update(const sg_metrics_t* m, double elapsed) {
+    double nearest = 0.0;
+    double urgent_at = (1.0 + schedule.calm) / 2;
+    unsigned int urgent = 0;
+    for (int i = 0; i < schedule.limit_count; i++) {
+        limit_t* l = &schedule.limits[i];
+        double value;
+        if (!metric_value(m, l->metric, &value) || isnan(value)) continue;
+        double c = closeness(value, l->rising, l->limit);
+        if (l->seen && elapsed > 0) {
+            double projected = value + (value - l->previous) / elapsed * (schedule.interval_ms / 1000.0);
+            double pc = closeness(projected, l->rising, l->limit);
+            if (pc > c) c = pc;
+        }
+        l->previous = value;
+        l->seen = 1;
+        if (c > nearest) nearest = c;
+        if (c >= urgent_at) {
+            if (strncmp(l->metric, "disk_", 5) == 0) urgent |= REFRESH_DISK;
+            if (strncmp(l->metric, "memory_", 7) == 0) urgent |= REFRESH_MEMORY;
+        }
+    }
+    long interval;
+    if (nearest >= 1.0) {
+        interval = schedule.min_ms;
+    } else if (nearest <= schedule.calm) {
+        interval = schedule.max_ms;
+    } else {
+        double position = (nearest - schedule.calm) / (1.0 - schedule.calm);
+        interval = (long)(schedule.max_ms * pow((double)schedule.min_ms / schedule.max_ms, position));
+    }
+    schedule.urgent = urgent;
+    __atomic_store_n(&schedule.interval_ms, interval, __ATOMIC_RELAXED);
+}
+
+/*
+ * The only thread that touches the collector: one refresh and one
+ * serialization per tick, however many clients are connected. Each tick
+ * refreshes only the collectors that are due.
+ */
+void* sampler_thread(void* arg) {
+    void* collector = arg;
+    struct timespec next;
+    sg_metrics_t scalars;
+    uint64_t process_refreshed = 0, disk_refreshed = 0, previous = 0;
+    block_signals();
+    clock_gettime(CLOCK_MONOTONIC, &next);
+    // sysinfo needs a gap between CPU refreshes before usage is meaningful
+    timespec_add_ms(&next, 200);
+
+    while (running) {
+        clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &next, NULL);
+
+        uint64_t started = now_ns();
+        // Half a minimum interval of slack so a cadence equal to the interval is not a tick late
+        uint64_t slack = schedule.min_ms * 500000ULL;
+        unsigned int what = REFRESH_ALL & ~(REFRESH_PROCESSES | REFRESH_DISK);
+        if (!process_refreshed || started - process_refreshed + slack >= schedule.process_cadence_ms * 1000000ULL) {
+            what |= REFRESH_PROCESSES;
+            process_refreshed = started;
+        }
+        if (!disk_refreshed || (schedule.urgent & REFRESH_DISK) ||
+            started - disk_refreshed + slack >= schedule.disk_cadence_ms * 1000000ULL) {
+            what |= REFRESH_DISK;
+            disk_refreshed = started;
+        }
+        rust_collector_refresh(collector, what);
+        histogram_observe(&refresh_seconds, started);
+        uint64_t read_started = now_ns();
+        char* metrics = rust_collector_read_json(collector, PROCESS_LIMIT);
+        rust_collector_read(collector, &scalars, NULL, 0);
+        histogram_observe(&ffi_read_seconds, read_started);
+        schedule_update(&scalars, previous ? (started - previous) / 1e9 : 0.0);
+        previous = started;
+        timespec_add_ms(&next, schedule.interval_ms);
+        if (!metrics) {
+            __atomic_add_fetch(&stats.sample_errors, 1, __ATOMIC_RELAXED);
+            continue;
+        }
+        frame_t* frame = frame_build(metrics, strlen(metrics));
+        rust_free_string(metrics);
+        if (frame) hub_publish(frame);
+        histogram_observe(&sample_seconds, started);
+    }
+    return NULL;
+}
+
+/* --- connections -------------------------------------------------------- */
+
+// Queue a reference to part of a frame; the caller keeps its own reference
+static int out_push(conn_t* c, frame_t* frame, size_t off, size_t len) {
+    if (c->out_count == MAX_SEGMENTS) return -1;
+    if (len == 0) return 0;
+    segment_t* seg = &c->out[(c->out_head + c->out_count) % MAX_SEGMENTS];
+    __atomic_add_fetch(&frame->refs, 1, __ATOMIC_RELAXED);
+    seg->frame = frame;
+    seg->off = off;
+    seg->len = len;
+    c->out_count++;
+    c->out_bytes += len;
+    return 0;
+}
+
+static int out_append(conn_t* c, const void* data, size_t len) {
+    frame_t* copy = frame_alloc(len);
+    if (!copy) return -1;
+    memcpy(copy->data, data, len);
+    int result = out_push(c, copy, 0, len);
+    frame_release(copy);
+    return result;
+}
+
+static void out_clear(conn_t* c) {
+    while (c->out_count) {
+        frame_release(c->out[c->out_head].frame);
+        c->out_head = (c->out_head + 1) % MAX_SEGMENTS;
+        c->out_count--;
+    }
+    c->out_bytes = 0;
+}
+
+static int has_output(conn_t* c) {
+    return c->out_count > 0;
+}
+
+// Leave room for a full response (headers + body) in the segment ring
+static int output_full(conn_t* c) {
+    return c->out_bytes >= OUTPUT_HIGH_WATER || c->out_count > MAX_SEGMENTS - 4;
+}
+
+static void conn_close(conn_t* c) {
+    if (c->fd < 0) return;
+    epoll_ctl(epoll_fd, EPOLL_CTL_DEL, c->fd, NULL);
+    close(c->fd);
+    c->fd = -1;
+    if (c->state == CONN_WS) ws_count--;
+    if (c->prev) c->prev->next = c->next;
+    else connections = c->next;
+    if (c->next) c->next->prev = c->prev;
+    connection_count--;
+    c->next = closed_connections;
+    closed_connections = c;
+}
+
+static void free_closed_connections(void) {
+    while (closed_connections) {
+        conn_t* c = closed_connections;
+        closed_connections = c->next;
+        out_clear(c);
+        frame_release(c->base);
+        free(c);
+    }
+}
+
+// Read while there is room for input and output; write while output is pending
+static void conn_update_events(conn_t* c) {
+    uint32_t events = 0;
+    if (!c->close_after_write && !output_full(c)) events |= EPOLLIN | EPOLLRDHUP;
+    if (has_output(c)) events |= EPOLLOUT;
+    if (events == c->events) return;
+    struct epoll_event ev = {0};
+    ev.events = events;
+    ev.data.ptr = c;
+    epoll_ctl(epoll_fd, EPOLL_CTL_MOD, c->fd, &ev);
+    c->events = events;
+}
+
+/*
+ * Subscription message for `latest`: a keyframe when `base` is NULL,
+ * otherwise the delta from `base`. Subscribers on the same channels and
+ * base share one encoded message through a small cache.
+ */
+static frame_t* subscription_message(frame_t* base, frame_t* latest, unsigned int channels) {
+    static struct {
+        unsigned long base_seq;
+        unsigned long seq;
+        unsigned int channels;
+        frame_t* message;
+    } cache[DELTA_CACHE_SIZE];
+    static int cache_next = 0;
+
+    unsigned long base_seq = base ? base->seq : 0;
+    for (int i = 0; i < DELTA_CACHE_SIZE; i++) {
+        if (cache[i].message && cache[i].seq == latest->seq &&
+            cache[i].base_seq == base_seq && cache[i].channels == channels) {
+            __atomic_add_fetch(&cache[i].message->refs, 1, __ATOMIC_RELAXED);
+            return cache[i].message;
+        }
+    }
+
+    uint64_t started = now_ns();
+    char* data = rust_metrics_delta(base ? (char*)base->data + base->header_len : NULL,
+                                    (char*)latest->data + latest->header_len, channels);
+    if (!data) return NULL;
+    size_t size = strlen(data) + 64;
+    char* text = malloc(size);
+    frame_t* message = NULL;
+    if (text) {
+        int n = snprintf(text, size, "{\"type\":\"%s\",\"seq\":%lu,\"data\":%s}",
+                         base ? "delta" : "keyframe", latest->seq, data);
+        message = frame_build(text, n);
+        free(text);
+    }
+    rust_free_string(data);
+    if (!message) return NULL;
+    histogram_observe(&delta_encode_seconds, started);
+
+    frame_release(cache[cache_next].message);
+    cache[cache_next].base_seq = base_seq;
+    cache[cache_next].seq = latest->seq;
+    cache[cache_next].channels = channels;
+    cache[cache_next].message = message;
+    cache_next = (cache_next + 1) % DELTA_CACHE_SIZE;
+    __atomic_add_fetch(&message->refs, 1, __ATOMIC_RELAXED);
+    return message;
+}
+
+/*
+ * Queue the newest sample for an idle subscriber if it is due one: the raw
+ * document for legacy clients, or a keyframe/delta against what the client
+ * last received for subscribed ones.
+ */
+static void next_ws_message(conn_t* c) {
+    unsigned long seq;
+    frame_t* latest = hub_acquire(&seq);
+    // A sample a tenth of the interval early still counts, as in monitor/delta.py
+    if (!latest || latest->seq == c->seen ||
+        (c->channels && c->seen &&
+         latest->published_ns - c->last_sent_ns < c->interval_ns - c->interval_ns / 10)) {
+        frame_release(latest);
+        return;
+    }
+    // Samples published since the last one sent that the client was due
+    if (c->seen && latest->seq - c->seen > 1) {
+        unsigned long missed = latest->seq - c->seen - 1;
+        if (c->interval_ns) {
+            uint64_t due = (latest->published_ns - c->last_sent_ns) / c->interval_ns;
+            missed = due > 1 ? (missed < due - 1 ? missed : due - 1) : 0;
+        }
+        stats.frames_dropped += missed;
+    }
+    c->seen = latest->seq;
+    c->last_sent_ns = latest->published_ns;
+    stats.frames_sent++;
+    if (!c->channels) {
+        out_push(c, latest, 0, latest->len);
+        frame_release(latest);
+        return;
+    }
+
+    int keyframe = !c->base || c->since_keyframe >= KEYFRAME_EVERY;
+    frame_t* message = subscription_message(keyframe ? NULL : c->base, latest, c->channels);
+    if (!message) {
+        frame_release(latest);
+        return;
+    }
+    out_push(c, message, 0, message->len);
+    frame_release(message);
+    frame_release(c->base);
+    c->base = latest;
+    c->since_keyframe = keyframe ? 0 : c->since_keyframe + 1;
+}
+
+/*
+ * Write as much pending output as the socket takes. A subscriber that has
+ * drained its output picks up the newest frame if one was published since.
+ * Returns -1 if the connection was closed.
+ */
+static int conn_flush(conn_t* c) {
+    for (;;) {
+        if (!has_output(c) && c->state == CONN_WS) {
+            next_ws_message(c);
+        }
+        if (!has_output(c)) break;
+
+        struct iovec iov[MAX_SEGMENTS];
+        int iovcnt = c->out_count;
+        for (int i = 0; i < iovcnt; i++) {
+            segment_t* seg = &c->out[(c->out_head + i) % MAX_SEGMENTS];
+            iov[i].iov_base = seg->frame->data + seg->off;
+            iov[i].iov_len = seg->len;
+        }
+
+        ssize_t sent = writev(c->fd, iov, iovcnt);
+        if (sent < 0) {
+            if (errno == EINTR) continue;
+            if (errno == EAGAIN || errno == EWOULDBLOCK) {
+                if (!c->stalled_since) c->stalled_since = time(NULL);
+                conn_update_events(c);
+                return 0;
+            }
+            conn_close(c);
+            return -1;
+        }
+
+        c->out_bytes -= sent;
+        while (sent > 0) {
+            segment_t* seg = &c->out[c->out_head];
+            if ((size_t)sent < seg->len) {
+                seg->off += sent;
+                seg->len -= sent;
+                break;
+            }
+            sent -= seg->len;
+            frame_release(seg->frame);
+            c->out_head = (c->out_head + 1) % MAX_SEGMENTS;
+            c->out_count--;
+        }
+    }
+
+    c->stalled_since = 0;
+    if (c->close_after_write) {
+        conn_close(c);
+        return -1;
+    }
+    conn_update_events(c);
+    return 0;
+}
+
+/* --- HTTP ----------------------------------------------------------------- */
+
 char* get_content_type(const char* path) {
     if (strstr(path, ".html")) return "text/html";
     if (strstr(path, ".js")) return "application/javascript";
@@ -57,187 +924,937 @@ char* get_content_type(const char* path) {
     return "text/plain";
 }
 
-void send_file(int client_fd, const char* filepath) {
+static void respond(conn_t* c, const char* status, const char* type,
+                    const char* body, size_t body_len, int keep_alive) {
+    char header[512];
+    int n = snprintf(header, sizeof(header),
+        "HTTP/1.1 %s\r\n"
+        "Content-Type: %s\r\n"
+        "Access-Control-Allow-Origin: *\r\n"
+        "Content-Length: %zu\r\n"
+        "Connection: %s\r\n\r\n",
+        status, type, body_len, keep_alive ? "keep-alive" : "close");
+    out_append(c, header, n);
+    if (body_len) out_append(c, body, body_len);
+    if (!keep_alive) c->close_after_write = 1;
+}
+
+static frame_t* gzip_frame(const unsigned char* data, size_t len) {
+    z_stream zs = {0};
+    // windowBits 15 + 16 selects the gzip wrapper
+    if (deflateInit2(&zs, Z_BEST_COMPRESSION, Z_DEFLATED, 15 + 16, 8, Z_DEFAULT_STRATEGY) != Z_OK) {
+        return NULL;
+    }
+    frame_t* frame = frame_alloc(deflateBound(&zs, len));
+    if (frame) {
+        zs.next_in = (unsigned char*)data;
+        zs.avail_in = len;
+        zs.next_out = frame->data;
+        zs.avail_out = frame->len;
+        if (deflate(&zs, Z_FINISH) == Z_STREAM_END) {
+            frame->len = zs.total_out;
+        } else {
+            frame_release(frame);
+            frame = NULL;
+        }
+    }
+    deflateEnd(&zs);
+    return frame;
+}
+
+// Load or reload an asset if the file changed since it was cached
+static void asset_refresh(asset_t* a) {
+    time_t now = time(NULL);
+    if (a->body && now - a->checked < ASSET_CHECK_SEC) return;
+    a->checked = now;
+
     char full_path[512];
-    snprintf(full_path, sizeof(full_path), "%s/%s", WEB_ROOT, filepath);
-    
+    snprintf(full_path, sizeof(full_path), "%s/%s", WEB_ROOT, a->name);
+    struct stat st;
+    if (stat(full_path, &st) < 0) return;
+    if (a->body && st.st_mtime == a->mtime && st.st_size == a->size && st.st_ino == a->ino) return;
+
     int fd = open(full_path, O_RDONLY);
-    if (fd < 0) {
-        const char* response = 
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Length: 9\r\n\r\n"
-            "Not Found";
-        send(client_fd, response, strlen(response), 0);
+    if (fd < 0) return;
+    frame_t* body = frame_alloc(st.st_size);
+    size_t total = 0;
+    while (body && total < (size_t)st.st_size) {
+        ssize_t bytes = read(fd, body->data + total, st.st_size - total);
+        if (bytes <= 0) break;
+        total += bytes;
+    }
+    close(fd);
+    if (!body) return;
+    body->len = total;
+
+    frame_t* gzip = gzip_frame(body->data, body->len);
+    if (gzip && gzip->len >= body->len) {
+        frame_release(gzip);
+        gzip = NULL;
+    }
+
+    frame_release(a->body);
+    frame_release(a->gzip);
+    a->body = body;
+    a->gzip = gzip;
+    a->mtime = st.st_mtime;
+    a->size = st.st_size;
+    a->ino = st.st_ino;
+    snprintf(a->etag, sizeof(a->etag), "\"%lx-%lx-%lx\"",
+             (unsigned long)st.st_ino, (unsigned long)st.st_size, (unsigned long)st.st_mtime);
+    strftime(a->last_modified, sizeof(a->last_modified), "%a, %d %b %Y %H:%M:%S GMT",
+             gmtime(&st.st_mtime));
+}
+
+static int find_header(const char* headers, const char* end, const char* name,
+                       char* out, size_t out_size);
+
+/*
+ * Serve a cached asset: 304 when the client's validators still match,
+ * otherwise the gzip variant if accepted. The body is queued by reference.
+ */
+void send_file(conn_t* c, const char* filepath, const char* headers, const char* end,
+               int keep_alive) {
+    asset_t* a = NULL;
+    for (size_t i = 0; i < sizeof(assets) / sizeof(assets[0]); i++) {
+        if (strcmp(assets[i].name, filepath) == 0) a = &assets[i];
+    }
+    if (a) asset_refresh(a);
+    if (!a || !a->body) {
+        respond(c, "404 Not Found", "text/plain", "Not Found", 9, keep_alive);
         return;
     }
-    
-    struct stat st;
-    fstat(fd, &st);
-    
+
+    char value[256];
+    int gzip = a->gzip && find_header(headers, end, "Accept-Encoding", value, sizeof(value)) &&
+               strstr(value, "gzip") && !strstr(value, "gzip;q=0");
+    // The gzip variant is a different representation, so it gets its own tag
+    char etag[72];
+    size_t tag_len = strlen(a->etag);
+    snprintf(etag, sizeof(etag), "%.*s%s\"", (int)tag_len - 1, a->etag, gzip ? "-gz" : "");
+
+    int not_modified = 0;
+    if (find_header(headers, end, "If-None-Match", value, sizeof(value))) {
+        not_modified = strstr(value, etag) != NULL || strcmp(value, "*") == 0;
+    } else if (find_header(headers, end, "If-Modified-Since", value, sizeof(value))) {
+        struct tm tm = {0};
+        not_modified = strptime(value, "%a, %d %b %Y %H:%M:%S GMT", &tm) && timegm(&tm) >= a->mtime;
+    }
+
+    frame_t* body = gzip ? a->gzip : a->body;
     char header[512];
-    snprintf(header, sizeof(header),
-        "HTTP/1.1 200 OK\r\n"
+    int n = snprintf(header, sizeof(header),
+        "HTTP/1.1 %s\r\n"
         "Content-Type: %s\r\n"
-        "Content-Length: %ld\r\n"
-        "Connection: close\r\n\r\n",
-        get_content_type(filepath), st.st_size);
-    
-    send(client_fd, header, strlen(header), 0);
-    
-    char buffer[BUFFER_SIZE];
-    ssize_t bytes;
-    while ((bytes = read(fd, buffer, sizeof(buffer))) > 0) {
-        send(client_fd, buffer, bytes, 0);
-    }
-    
-    close(fd);
+        "Content-Length: %zu\r\n"
+        "%s"
+        "ETag: %s\r\n"
+        "Last-Modified: %s\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Vary: Accept-Encoding\r\n"
+        "Connection: %s\r\n\r\n",
+        not_modified ? "304 Not Modified" : "200 OK", get_content_type(filepath),
+        not_modified ? 0 : body->len, gzip ? "Content-Encoding: gzip\r\n" : "",
+        etag, a->last_modified, keep_alive ? "keep-alive" : "close");
+    out_append(c, header, n);
+    if (!not_modified) out_push(c, body, 0, body->len);
+    if (!keep_alive) c->close_after_write = 1;
 }
 
-void send_metrics_json(int client_fd) {
-    char* metrics = rust_get_metrics();
-    if (!metrics) {
-        const char* error = "{\"error\":\"Failed to get metrics\"}";
-        char response[256];
-        snprintf(response, sizeof(response),
-            "HTTP/1.1 500 Internal Server Error\r\n"
-            "Content-Type: application/json\r\n"
-            "Content-Length: %ld\r\n\r\n%s",
-            strlen(error), error);
-        send(client_fd, response, strlen(response), 0);
+void send_metrics_json(conn_t* c, int keep_alive) {
+    // Served from the sampler's latest frame; no collection per request
+    frame_t* frame = hub_acquire(NULL);
+    if (!frame) {
+        const char* error = "{\"error\":\"Metrics not sampled yet\"}";
+        respond(c, "503 Service Unavailable", "application/json", error, strlen(error), keep_alive);
         return;
     }
-    
+    size_t len = frame->len - frame->header_len;
     char header[256];
-    snprintf(header, sizeof(header),
+    int n = snprintf(header, sizeof(header),
         "HTTP/1.1 200 OK\r\n"
         "Content-Type: application/json\r\n"
         "Access-Control-Allow-Origin: *\r\n"
-        "Content-Length: %ld\r\n\r\n",
-        strlen(metrics));
-    
-    send(client_fd, header, strlen(header), 0);
-    send(client_fd, metrics, strlen(metrics), 0);
-    
-    rust_free_string(metrics);
-}
-
-void* handle_websocket_client(void* arg) {
-    int client_fd = *(int*)arg;
-    free(arg);
-    
-    const char* ws_accept = 
+        "Content-Length: %zu\r\n"
+        "Connection: %s\r\n\r\n",
+        len, keep_alive ? "keep-alive" : "close");
+    out_append(c, header, n);
+    out_push(c, frame, frame->header_len, len);
+    if (!keep_alive) c->close_after_write = 1;
+    frame_release(frame);
+}
+
+static int append_metric(char** buf, size_t* len, size_t* cap, const char* fmt, ...)
+    __attribute__((format(printf, 4, 5)));
+
+// printf onto a growing buffer
+static int append_metric(char** buf, size_t* len, size_t* cap, const char* fmt, ...) {
+    for (;;) {
+        va_list args;
+        va_start(args, fmt);
+        int n = vsnprintf(*buf + *len, *cap - *len, fmt, args);
+        va_end(args);
+        if (n < 0) return -1;
+        if ((size_t)n < *cap - *len) {
+            *len += n;
+            return 0;
+        }
+        size_t cap_new = *cap * 2 + n;
+        char* grown = realloc(*buf, cap_new);
+        if (!grown) return -1;
+        *buf = grown;
+        *cap = cap_new;
+    }
+}
+
+static void append_histogram(char** buf, size_t* len, size_t* cap, histogram_t* h) {
+    append_metric(buf, len, cap, "# HELP %s %s\n# TYPE %s histogram\n", h->name, h->help, h->name);
+    uint64_t cumulative = 0;
+    for (size_t i = 0; i < LATENCY_BUCKET_COUNT; i++) {
+        cumulative += __atomic_load_n(&h->counts[i], __ATOMIC_RELAXED);
+        append_metric(buf, len, cap, "%s_bucket{le=\"%g\"} %llu\n", h->name, latency_buckets[i],
+                      (unsigned long long)cumulative);
+    }
+    uint64_t count = __atomic_load_n(&h->count, __ATOMIC_RELAXED);
+    append_metric(buf, len, cap, "%s_bucket{le=\"+Inf\"} %llu\n%s_sum %g\n%s_count %llu\n",
+                  h->name, (unsigned long long)count, h->name,
+                  __atomic_load_n(&h->sum_ns, __ATOMIC_RELAXED) / 1e9, h->name,
+                  (unsigned long long)count);
+}
+
+static void append_scalar(char** buf, size_t* len, size_t* cap, const char* name,
+                          const char* type, const char* help, double value) {
+    append_metric(buf, len, cap, "# HELP %s %s\n# TYPE %s %s\n%s %.10g\n",
+                  name, help, name, type, name, value);
+}
+
+// The server's own overhead in the Prometheus text format
+static void send_self_metrics(conn_t* c, int keep_alive) {
+    size_t len = 0, cap = 8192;
+    char* buf = malloc(cap);
+    if (!buf) {
+        respond(c, "500 Internal Server Error", "text/plain", "", 0, keep_alive);
+        return;
+    }
+    buf[0] = '\0';
+    append_histogram(&buf, &len, &cap, &refresh_seconds);
+    append_histogram(&buf, &len, &cap, &ffi_read_seconds);
+    append_histogram(&buf, &len, &cap, &sample_seconds);
+    append_histogram(&buf, &len, &cap, &delta_encode_seconds);
+    append_histogram(&buf, &len, &cap, &query_seconds);
+    append_scalar(&buf, &len, &cap, "sysguard_sample_interval_seconds", "gauge",
+                  "Current sampling interval",
+                  __atomic_load_n(&schedule.interval_ms, __ATOMIC_RELAXED) / 1000.0);
+    append_scalar(&buf, &len, &cap, "sysguard_sample_errors_total", "counter",
+                  "Samples the collector failed to produce",
+                  __atomic_load_n(&stats.sample_errors, __ATOMIC_RELAXED));
+    append_scalar(&buf, &len, &cap, "sysguard_http_requests_total", "counter",
+                  "HTTP requests handled", stats.http_requests);
+    append_scalar(&buf, &len, &cap, "sysguard_http_connections", "gauge",
+                  "Open connections, websockets included", connection_count);
+    append_scalar(&buf, &len, &cap, "sysguard_ws_clients", "gauge",
+                  "Connected websocket clients", ws_count);
+    append_scalar(&buf, &len, &cap, "sysguard_ws_frames_sent_total", "counter",
+                  "Websocket messages queued to clients", stats.frames_sent);
+    append_scalar(&buf, &len, &cap, "sysguard_ws_frames_dropped_total", "counter",
+                  "Samples a websocket client skipped because it was behind", stats.frames_dropped);
+    append_scalar(&buf, &len, &cap, "sysguard_ws_clients_dropped_total", "counter",
+                  "Websocket clients disconnected for not keeping up", stats.clients_dropped);
+
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    append_scalar(&buf, &len, &cap, "process_cpu_seconds_total", "counter",
+                  "User and system CPU time of this process",
+                  usage.ru_utime.tv_sec + usage.ru_stime.tv_sec +
+                  (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1e6);
+    long pages = 0;
+    FILE* statm = fopen("/proc/self/statm", "r");
+    if (statm) {
+        if (fscanf(statm, "%*s %ld", &pages) != 1) pages = 0;
+        fclose(statm);
+    }
+    append_scalar(&buf, &len, &cap, "process_resident_memory_bytes", "gauge",
+                  "Resident memory of this process", (double)pages * sysconf(_SC_PAGESIZE));
+
+    respond(c, "200 OK", "text/plain; version=0.0.4", buf, len, keep_alive);
+    free(buf);
+}
+
+/* --- History -------------------------------------------------------------- */
+
+typedef struct {
+    long long t;
+    double avg, min, max, p95;
+    int null;
+} history_row_t;
+
+static sqlite3* history_db = NULL;
+static double retention_raw_hours = RAW_HOURS;
+static double retention_minute_days = MINUTE_DAYS;
+
+// Read-only handle on the metrics database, opened on first use
+static sqlite3* history_open(void) {
+    if (history_db) return history_db;
+    const char* v;
+    if ((v = getenv("SYSGUARD_RETENTION_RAW_HOURS")) && *v) retention_raw_hours = atof(v);
+    if ((v = getenv("SYSGUARD_RETENTION_MINUTE_DAYS")) && *v) retention_minute_days = atof(v);
+    const char* path = getenv("SYSGUARD_DB");
+    if (sqlite3_open_v2(path && *path ? path : DB_PATH, &history_db,
+                        SQLITE_OPEN_READONLY, NULL) != SQLITE_OK) {
+        sqlite3_close(history_db);
+        history_db = NULL;
+    } else {
+        sqlite3_busy_timeout(history_db, 1000);
+    }
+    return history_db;
+}
+
+// Copies the value of query parameter `name` into `out`
+static int query_param(const char* query, const char* name, char* out, size_t out_size) {
+    size_t name_len = strlen(name);
+    for (const char* p = query; p && *p; p = strchr(p, '&') ? strchr(p, '&') + 1 : NULL) {
+        if (strncmp(p, name, name_len) == 0 && p[name_len] == '=') {
+            const char* v = p + name_len + 1;
+            size_t len = strcspn(v, "&");
+            if (len >= out_size) len = out_size - 1;
+            memcpy(out, v, len);
+            out[len] = '\0';
+            return 1;
+        }
+    }
+    return 0;
+}
+
+static long long oldest_raw(sqlite3* db) {
+    sqlite3_stmt* stmt;
+    long long oldest = -1;
+    if (sqlite3_prepare_v2(db, "SELECT MIN(timestamp) FROM metrics", -1, &stmt, NULL) != SQLITE_OK) {
+        return -1;
+    }
+    if (sqlite3_step(stmt) == SQLITE_ROW && sqlite3_column_type(stmt, 0) != SQLITE_NULL) {
+        oldest = sqlite3_column_int64(stmt, 0);
+    }
+    sqlite3_finalize(stmt);
+    return oldest;
+}
+
+/*
+ * Same choice as choose_resolution in storage/db.py. Raw samples compacted
+ * into the columnar archive are not read here, so a range reaching past the
+ * oldest raw row in SQLite uses the minute tier instead.
+ */
+static const char* history_resolution(sqlite3* db, long long since, long long until, long points) {
+    long long now = time(NULL);
+    double span = until > since ? until - since : 0;
+    double minutes = span / 60, hours = span / 3600;
+    if (since >= now - (long long)(retention_raw_hours * 3600) && (span <= MAX_POINTS || minutes < points)) {
+        long long oldest = oldest_raw(db);
+        if (oldest >= 0 && oldest <= since) return "raw";
+    }
+    if (since >= now - (long long)(retention_minute_days * 86400) && (minutes <= MAX_POINTS || hours < points)) return "1m";
+    return "1h";
+}
+
+// Rows of one metric in [since, until]; returns the count or -1
+static long history_query(sqlite3* db, const char* metric, const char* resolution,
+                          long long since, long long until, history_row_t** out) {
+    char sql[256];
+    int width = 0;
+    if (strcmp(resolution, "raw") == 0) {
+        snprintf(sql, sizeof(sql), "SELECT timestamp, %s, %s, %s, %s FROM metrics "
+                 "WHERE timestamp BETWEEN ?2 AND ?3 ORDER BY timestamp", metric, metric, metric, metric);
+    } else {
+        width = strcmp(resolution, "1m") == 0 ? 60 : 3600;
+        snprintf(sql, sizeof(sql), "SELECT bucket, sum / count, min, max, p95 FROM metrics_%s "
+                 "WHERE metric = ?1 AND bucket BETWEEN ?2 AND ?3 ORDER BY bucket", resolution);
+    }
+    sqlite3_stmt* stmt;
+    if (sqlite3_prepare_v2(db, sql, -1, &stmt, NULL) != SQLITE_OK) return -1;
+    sqlite3_bind_text(stmt, 1, metric, -1, SQLITE_STATIC);
+    sqlite3_bind_int64(stmt, 2, width ? since - since % width : since);
+    sqlite3_bind_int64(stmt, 3, until);
+
+    size_t count = 0, cap = 256;
+    history_row_t* rows = malloc(cap * sizeof(*rows));
+    int rc;
+    while (rows && (rc = sqlite3_step(stmt)) == SQLITE_ROW) {
+        if (count == cap) {
+            history_row_t* grown = realloc(rows, cap * 2 * sizeof(*rows));
+            if (!grown) {
+                free(rows);
+                rows = NULL;
+                break;
+            }
+            rows = grown;
+            cap *= 2;
+        }
+        history_row_t* r = &rows[count++];
+        r->t = sqlite3_column_int64(stmt, 0);
+        r->null = sqlite3_column_type(stmt, 1) == SQLITE_NULL;
+        r->avg = sqlite3_column_double(stmt, 1);
+        r->min = sqlite3_column_double(stmt, 2);
+        r->max = sqlite3_column_double(stmt, 3);
+        r->p95 = sqlite3_column_double(stmt, 4);
+    }
+    sqlite3_finalize(stmt);
+    if (!rows || rc != SQLITE_DONE) {
+        free(rows);
+        return -1;
+    }
+    *out = rows;
+    return count;
+}
+
+/*
+ * Largest-Triangle-Three-Buckets over the averages, as storage/downsample.py:
+ * keeps the first and last row and, per bucket in between, the row forming
+ * the largest triangle with the previous pick and the next bucket's mean.
+ * Compacts the picks to the front of `rows` and returns how many there are.
+ */
+static long lttb(history_row_t* rows, long n, long threshold) {
+    if (threshold >= n) return n;
+    if (threshold < 3) {
+        if (threshold == 2) rows[1] = rows[n - 1];
+        return threshold;
+    }
+    double every = (double)(n - 2) / (threshold - 2);
+    long a = 0, kept = 1;
+    for (long i = 0; i < threshold - 2; i++) {
+        long start = (long)(i * every) + 1, end = (long)((i + 1) * every) + 1;
+        long next_start = end, next_end = (long)((i + 2) * every) + 1;
+        if (next_end > n) next_end = n;
+        if (next_start >= n - 1) {
+            next_start = n - 1;
+            next_end = n;
+        }
+        double avg_t = 0, avg_v = 0;
+        for (long j = next_start; j < next_end; j++) {
+            avg_t += rows[j].t;
+            avg_v += rows[j].avg;
+        }
+        avg_t /= next_end - next_start;
+        avg_v /= next_end - next_start;
+
+        double at = rows[a].t, av = rows[a].avg, best_area = -1;
+        long best = start;
+        for (long j = start; j < end; j++) {
+            double area = fabs((at - avg_t) * (rows[j].avg - av) - (at - rows[j].t) * (avg_v - av));
+            if (area > best_area) {
+                best_area = area;
+                best = j;
+            }
+        }
+        // Picks only move forward, so they can be compacted in place
+        rows[kept++] = rows[best];
+        a = kept - 1;
+    }
+    rows[kept++] = rows[n - 1];
+    return kept;
+}
+
+static void history_error(conn_t* c, const char* status, const char* detail, int keep_alive) {
+    char body[256];
+    int n = snprintf(body, sizeof(body), "{\"detail\":\"%s\"}", detail);
+    respond(c, status, "application/json", body, n, keep_alive);
+}
+
+/*
+ * GET /history?metric=&since=&until=&resolution=&points= as in the Python
+ * fallback: rows from the cheapest tier, or with `points` the averages
+ * downsampled to at most that many [t, value] pairs. Queries run on the
+ * event loop; the tier choice bounds them to MAX_POINTS rows, or 60 *
+ * points raw rows when a short range is drawn at full width.
+ */
+static void send_history(conn_t* c, const char* query, int keep_alive) {
+    static const char* metrics[] = {"cpu", "memory", "disk"};
+    char value[64], metric[16] = "cpu", resolution[8] = "auto";
+    query_param(query, "metric", metric, sizeof(metric));
+    query_param(query, "resolution", resolution, sizeof(resolution));
+    int known = 0;
+    for (size_t i = 0; i < sizeof(metrics) / sizeof(metrics[0]); i++) {
+        known |= strcmp(metric, metrics[i]) == 0;
+    }
+    if (!known) {
+        history_error(c, "400 Bad Request", "Unknown metric, expected one of cpu, memory, disk", keep_alive);
+        return;
+    }
+    if (strcmp(resolution, "auto") != 0 && strcmp(resolution, "raw") != 0 &&
+        strcmp(resolution, "1m") != 0 && strcmp(resolution, "1h") != 0) {
+        history_error(c, "400 Bad Request", "Unknown resolution, expected raw, 1m, 1h or auto", keep_alive);
+        return;
+    }
+    long long until = query_param(query, "until", value, sizeof(value)) ? (long long)strtod(value, NULL)
+                                                                        : (long long)time(NULL);
+    long long since = query_param(query, "since", value, sizeof(value)) ? (long long)strtod(value, NULL)
+                                                                        : until - 3600;
+    long points = 0;
+    if (query_param(query, "points", value, sizeof(value))) {
+        points = strtol(value, NULL, 10);
+        if (points < 2 || points > MAX_POINTS) {
+            char detail[64];
+            snprintf(detail, sizeof(detail), "points must be between 2 and %d", MAX_POINTS);
+            history_error(c, "400 Bad Request", detail, keep_alive);
+            return;
+        }
+    }
+
+    uint64_t started = now_ns();
+    sqlite3* db = history_open();
+    history_row_t* rows = NULL;
+    long count = 0;
+    if (db) {
+        if (strcmp(resolution, "auto") == 0) {
+            snprintf(resolution, sizeof(resolution), "%s", history_resolution(db, since, until, points));
+        }
+        count = history_query(db, metric, resolution, since, until, &rows);
+        if (count < 0) {
+            history_error(c, "500 Internal Server Error", "History query failed", keep_alive);
+            return;
+        }
+    } else if (strcmp(resolution, "auto") == 0) {
+        snprintf(resolution, sizeof(resolution), "%s", "raw");
+    }
+    histogram_observe(&query_seconds, started);
+
+    size_t len = 0, cap = 4096;
+    char* buf = malloc(cap);
+    if (!buf) {
+        free(rows);
+        respond(c, "500 Internal Server Error", "text/plain", "", 0, keep_alive);
+        return;
+    }
+    append_metric(&buf, &len, &cap, "{\"metric\":\"%s\",\"resolution\":\"%s\",\"points\":[",
+                  metric, resolution);
+    if (points) {
+        long kept = 0;
+        for (long i = 0; i < count; i++) {
+            if (!rows[i].null) rows[kept++] = rows[i];
+        }
+        kept = lttb(rows, kept, points);
+        for (long i = 0; i < kept; i++) {
+            append_metric(&buf, &len, &cap, "%s[%lld,%.10g]", i ? "," : "",
+                          rows[i].t, round(rows[i].avg * 100) / 100);
+        }
+    } else {
+        for (long i = 0; i < count; i++) {
+            history_row_t* r = &rows[i];
+            if (r->null) {
+                append_metric(&buf, &len, &cap, "%s{\"t\":%lld,\"avg\":null,\"min\":null,"
+                              "\"max\":null,\"p95\":null}", i ? "," : "", r->t);
+            } else {
+                append_metric(&buf, &len, &cap, "%s{\"t\":%lld,\"avg\":%.17g,\"min\":%.17g,"
+                              "\"max\":%.17g,\"p95\":%.17g}", i ? "," : "", r->t,
+                              r->avg, r->min, r->max, r->p95);
+            }
+        }
+    }
+    append_metric(&buf, &len, &cap, "]}");
+    respond(c, "200 OK", "application/json", buf, len, keep_alive);
+    free(buf);
+    free(rows);
+}
+
+// Copies the value of header `name` (case-insensitive) into `out`
+static int find_header(const char* headers, const char* end, const char* name,
+                       char* out, size_t out_size) {
+    size_t name_len = strlen(name);
+    const char* line = headers;
+    while (line < end) {
+        const char* eol = memchr(line, '\r', end - line);
+        if (!eol) eol = end;
+        if ((size_t)(eol - line) > name_len && line[name_len] == ':' &&
+            strncasecmp(line, name, name_len) == 0) {
+            const char* v = line + name_len + 1;
+            while (v < eol && (*v == ' ' || *v == '\t')) v++;
+            size_t len = eol - v;
+            if (len >= out_size) len = out_size - 1;
+            memcpy(out, v, len);
+            out[len] = '\0';
+            return 1;
+        }
+        line = eol + 2;
+    }
+    return 0;
+}
+
+static void upgrade_websocket(conn_t* c, const char* key) {
+    if (ws_count >= MAX_WS_CLIENTS) {
+        respond(c, "503 Service Unavailable", "text/plain", "", 0, 0);
+        return;
+    }
+
+    char input[128];
+    unsigned char digest[20];
+    char accept[32];
+    int n = snprintf(input, sizeof(input), "%s%s", key, WS_GUID);
+    sha1((unsigned char*)input, n, digest);
+    base64_encode(digest, sizeof(digest), accept);
+
+    char response[256];
+    n = snprintf(response, sizeof(response),
         "HTTP/1.1 101 Switching Protocols\r\n"
         "Upgrade: websocket\r\n"
         "Connection: Upgrade\r\n"
-        "Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\r\n\r\n";
-    
-    send(client_fd, ws_accept, strlen(ws_accept), 0);
-    
-    while (running) {
-        char* metrics = rust_get_metrics();
-        if (metrics) {
-            size_t len = strlen(metrics);
-            unsigned char frame[10];
-            int header_len;
-            
-            frame[0] = 0x81;
-            if (len <= 125) {
-                frame[1] = len;
-                header_len = 2;
-            } else if (len <= 65535) {
-                frame[1] = 126;
-                frame[2] = (len >> 8) & 0xFF;
-                frame[3] = len & 0xFF;
-                header_len = 4;
+        "Sec-WebSocket-Accept: %s\r\n\r\n", accept);
+    out_append(c, response, n);
+
+    c->state = CONN_WS;
+    // seen = 0 makes the first flush send the current sample right away
+    c->seen = 0;
+    ws_count++;
+}
+
+/*
+ * Handle every complete request in `buf` (pipelining). Returns the number
+ * of bytes consumed, or -1 if a request is malformed.
+ */
+static ssize_t handle_requests(conn_t* c, char* buf, size_t len) {
+    size_t consumed = 0;
+    while (c->state == CONN_HTTP && !c->close_after_write && !output_full(c)) {
+        char* start = buf + consumed;
+        size_t avail = len - consumed;
+        char* end = memmem(start, avail, "\r\n\r\n", 4);
+        if (!end) break;
+        size_t request_len = end + 4 - start;
+
+        char line[512], method[16], path[256], version[16];
+        char* eol = memchr(start, '\r', end + 2 - start);
+        size_t line_len = eol - start;
+        if (line_len >= sizeof(line)) return -1;
+        memcpy(line, start, line_len);
+        line[line_len] = '\0';
+        if (sscanf(line, "%15s %255s %15s", method, path, version) != 3) return -1;
+        char* headers = eol + 2;
+        char* query = strchr(path, '?');
+        if (query) *query++ = '\0';
+
+        char value[128];
+        size_t body_len = 0;
+        if (find_header(headers, end, "Content-Length", value, sizeof(value))) {
+            body_len = strtoul(value, NULL, 10);
+        }
+        if (request_len + body_len > avail) {
+            if (request_len + body_len > BUFFER_SIZE) return -1;
+            break;
+        }
+        consumed += request_len + body_len;
+        stats.http_requests++;
+
+        int keep_alive = strcmp(version, "HTTP/1.0") != 0;
+        if (find_header(headers, end, "Connection", value, sizeof(value))) {
+            if (strcasestr(value, "close")) keep_alive = 0;
+            else if (strcasestr(value, "keep-alive")) keep_alive = 1;
+        }
+
+        if (strcmp(method, "GET") != 0) {
+            respond(c, "405 Method Not Allowed", "text/plain", "", 0, keep_alive);
+            continue;
+        }
+
+        char key[64];
+        if (find_header(headers, end, "Upgrade", value, sizeof(value)) &&
+            strcasecmp(value, "websocket") == 0) {
+            if (find_header(headers, end, "Sec-WebSocket-Key", key, sizeof(key))) {
+                upgrade_websocket(c, key);
             } else {
-                frame[1] = 127;
-                for (int i = 0; i < 8; i++) {
-                    frame[2 + i] = (len >> (56 - i * 8)) & 0xFF;
-                }
-                header_len = 10;
+                respond(c, "400 Bad Request", "text/plain", "", 0, 0);
             }
-            
-            if (send(client_fd, frame, header_len, 0) <= 0) break;
-            if (send(client_fd, metrics, len, 0) <= 0) break;
-            
-            rust_free_string(metrics);
+        } else if (strcmp(path, "/health") == 0) {
+            send_metrics_json(c, keep_alive);
+        } else if (strcmp(path, "/metrics") == 0) {
+            send_self_metrics(c, keep_alive);
+        } else if (strcmp(path, "/history") == 0) {
+            send_history(c, query, keep_alive);
+        } else if (strcmp(path, "/dashboard.js") == 0) {
+            send_file(c, "dashboard.js", headers, end, keep_alive);
+        } else {
+            send_file(c, "index.html", headers, end, keep_alive);
         }
-        sleep(1);
     }
-    
-    close(client_fd);
-    return NULL;
+    return consumed;
 }
 
-void handle_client(int client_fd) {
-    char buffer[BUFFER_SIZE];
-    ssize_t bytes = recv(client_fd, buffer, sizeof(buffer) - 1, 0);
-    
-    if (bytes <= 0) {
-        close(client_fd);
+/*
+ * {"subscribe": ["cpu", "processes"], "interval": 2} switches the client to
+ * keyframe + delta messages; {"resync": true} asks for a new keyframe.
+ */
+static void handle_ws_message(conn_t* c, const char* text) {
+    const char* subscribe = strstr(text, "\"subscribe\"");
+    if (subscribe) {
+        static const struct { const char* name; unsigned int flag; } names[] = {
+            {"\"cpu\"", CHANNEL_CPU}, {"\"memory\"", CHANNEL_MEMORY},
+            {"\"disk\"", CHANNEL_DISK}, {"\"processes\"", CHANNEL_PROCESSES},
+            {"\"io\"", CHANNEL_IO}, {"\"network\"", CHANNEL_NETWORK},
+        };
+        unsigned int channels = 0;
+        const char* list = strchr(subscribe, '[');
+        const char* end = list ? strchr(list, ']') : NULL;
+        for (size_t i = 0; end && i < sizeof(names) / sizeof(names[0]); i++) {
+            if (memmem(list, end - list, names[i].name, strlen(names[i].name))) {
+                channels |= names[i].flag;
+            }
+        }
+
+        double interval = 0.0;
+        const char* value = strstr(text, "\"interval\"");
+        if (value && (value = strchr(value, ':'))) interval = strtod(value + 1, NULL);
+
+        c->channels = channels ? channels : CHANNEL_ALL;
+        c->interval_ns = interval > 0 ? (uint64_t)(interval * 1e9) : 0;
+    } else if (!strstr(text, "\"resync\"")) {
         return;
     }
-    
-    buffer[bytes] = '\0';
-    
-    if (strstr(buffer, "Upgrade: websocket")) {
-        int* fd_ptr = malloc(sizeof(int));
-        *fd_ptr = client_fd;
-        pthread_t thread;
-        pthread_create(&thread, NULL, handle_websocket_client, fd_ptr);
-        pthread_detach(thread);
-        return;
+    // Next message is a keyframe, sent right away
+    frame_release(c->base);
+    c->base = NULL;
+    c->seen = 0;
+}
+
+/*
+ * Subscribers send subscription messages and control frames: answer pings,
+ * honour close, ignore everything else. Returns the number of bytes
+ * consumed or -1 to close.
+ */
+static ssize_t handle_ws_input(conn_t* c, char* buf, size_t len_in) {
+    size_t pos = 0;
+    while (len_in - pos >= 2) {
+        unsigned char* p = (unsigned char*)buf + pos;
+        int opcode = p[0] & 0x0F;
+        int masked = p[1] & 0x80;
+        uint64_t len = p[1] & 0x7F;
+        size_t header = 2;
+        if (len == 126) {
+            if (len_in - pos < 4) break;
+            len = (uint64_t)p[2] << 8 | p[3];
+            header = 4;
+        } else if (len == 127) {
+            return -1;
+        }
+        if (masked) header += 4;
+        if (header + len > BUFFER_SIZE) return -1;
+        if (len_in - pos < header + len) break;
+
+        if (opcode == 0x8) return -1;
+        if (opcode == 0x1 && len < 1024) {
+            char text[1024];
+            for (uint64_t i = 0; i < len; i++) {
+                text[i] = p[header + i] ^ (masked ? p[header - 4 + (i & 3)] : 0);
+            }
+            text[len] = '\0';
+            handle_ws_message(c, text);
+        }
+        if (opcode == 0x9 && len <= 125) {
+            unsigned char pong[2 + 125];
+            pong[0] = 0x8A;
+            pong[1] = len;
+            for (uint64_t i = 0; i < len; i++) {
+                pong[2 + i] = p[header + i] ^ (masked ? p[header - 4 + (i & 3)] : 0);
+            }
+            out_append(c, pong, 2 + len);
+        }
+        pos += header + len;
     }
-    
-    if (strncmp(buffer, "GET /health", 11) == 0) {
-        send_metrics_json(client_fd);
-    } else if (strncmp(buffer, "GET /dashboard.js", 17) == 0) {
-        send_file(client_fd, "dashboard.js");
-    } else if (strncmp(buffer, "GET /", 5) == 0) {
-        send_file(client_fd, "index.html");
-    } else {
-        const char* response = "HTTP/1.1 400 Bad Request\r\n\r\n";
-        send(client_fd, response, strlen(response), 0);
+    return pos;
+}
+
+// Consume whatever complete requests or frames are buffered
+static int process_input(conn_t* c) {
+    size_t consumed = 0;
+    if (c->state == CONN_HTTP) {
+        ssize_t n = handle_requests(c, c->in, c->in_len);
+        if (n < 0) return -1;
+        consumed = n;
+    }
+    // A request may have upgraded the connection; the rest is WebSocket data
+    if (c->state == CONN_WS) {
+        ssize_t n = handle_ws_input(c, c->in + consumed, c->in_len - consumed);
+        if (n < 0) return -1;
+        consumed += n;
+    }
+    memmove(c->in, c->in + consumed, c->in_len - consumed);
+    c->in_len -= consumed;
+    c->in[c->in_len] = '\0';
+    return 0;
+}
+
+static void conn_read(conn_t* c) {
+    while (c->in_len < BUFFER_SIZE && !output_full(c) && !c->close_after_write) {
+        ssize_t bytes = recv(c->fd, c->in + c->in_len, BUFFER_SIZE - c->in_len, 0);
+        if (bytes < 0 && errno == EINTR) continue;
+        if (bytes < 0 && (errno == EAGAIN || errno == EWOULDBLOCK)) break;
+        if (bytes < 0 || (bytes == 0 && c->state == CONN_WS)) {
+            conn_close(c);
+            return;
+        }
+        if (bytes == 0) {
+            // Peer finished sending; answer what we have, then close
+            c->close_after_write = 1;
+            break;
+        }
+        c->in_len += bytes;
+        c->in[c->in_len] = '\0';
+        c->last_active = time(NULL);
+        if (process_input(c) < 0) {
+            conn_close(c);
+            return;
+        }
+    }
+
+    if (c->in_len == BUFFER_SIZE && c->state == CONN_HTTP && !output_full(c)) {
+        respond(c, "431 Request Header Fields Too Large", "text/plain", "", 0, 0);
+        c->in_len = 0;
+    }
+    conn_flush(c);
+}
+
+// Output drained: pick up pipelined requests that were held back
+static void conn_resume(conn_t* c) {
+    while (c->fd >= 0 && c->state == CONN_HTTP && c->in_len > 0 &&
+           !has_output(c) && !c->close_after_write) {
+        size_t before = c->in_len;
+        if (process_input(c) < 0) {
+            conn_close(c);
+            return;
+        }
+        if (c->in_len == before) break;
+        if (conn_flush(c) < 0) return;
+    }
+}
+
+static void accept_connections(int server_fd) {
+    for (;;) {
+        int fd = accept4(server_fd, NULL, NULL, SOCK_NONBLOCK | SOCK_CLOEXEC);
+        if (fd < 0) {
+            if (errno == EINTR) continue;
+            if (errno != EAGAIN && errno != EWOULDBLOCK) perror("Accept failed");
+            return;
+        }
+        if (connection_count >= MAX_CONNECTIONS) {
+            const char* response =
+                "HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n";
+            send(fd, response, strlen(response), MSG_NOSIGNAL);
+            close(fd);
+            continue;
+        }
+
+        int opt = 1;
+        setsockopt(fd, IPPROTO_TCP, TCP_NODELAY, &opt, sizeof(opt));
+
+        conn_t* c = calloc(1, sizeof(conn_t));
+        if (!c) {
+            close(fd);
+            continue;
+        }
+        c->fd = fd;
+        c->state = CONN_HTTP;
+        c->last_active = time(NULL);
+        c->events = EPOLLIN | EPOLLRDHUP;
+
+        struct epoll_event ev = {0};
+        ev.events = c->events;
+        ev.data.ptr = c;
+        if (epoll_ctl(epoll_fd, EPOLL_CTL_ADD, fd, &ev) < 0) {
+            close(fd);
+            free(c);
+            continue;
+        }
+        c->next = connections;
+        if (connections) connections->prev = c;
+        connections = c;
+        connection_count++;
+    }
+}
+
+// Hand the new sample to every subscriber that is not still sending one
+static void broadcast(void) {
+    uint64_t count;
+    if (read(hub.notify_fd, &count, sizeof(count)) < 0 && errno != EAGAIN) {
+        perror("eventfd read");
+    }
+    conn_t* c = connections;
+    while (c) {
+        conn_t* next = c->next;
+        if (c->state == CONN_WS && !has_output(c)) conn_flush(c);
+        c = next;
+    }
+}
+
+static void sweep_connections(void) {
+    time_t now = time(NULL);
+    conn_t* c = connections;
+    while (c) {
+        conn_t* next = c->next;
+        if (c->stalled_since && now - c->stalled_since > WS_SEND_TIMEOUT_SEC) {
+            if (c->state == CONN_WS) stats.clients_dropped++;
+            conn_close(c);
+        } else if (c->state == CONN_HTTP && !has_output(c) &&
+                   now - c->last_active > KEEPALIVE_TIMEOUT_SEC) {
+            conn_close(c);
+        }
+        c = next;
     }
-    
-    close(client_fd);
 }
 
 int main() {
-    signal(SIGINT, handle_signal);
-    signal(SIGTERM, handle_signal);
-    
+    struct sigaction sa = {0};
+    sa.sa_handler = handle_signal;
+    sigaction(SIGINT, &sa, NULL);
+    sigaction(SIGTERM, &sa, NULL);
+    signal(SIGPIPE, SIG_IGN);
+
     if (!load_rust_library()) {
         fprintf(stderr, "Failed to load Rust library. Build it first: ./buildnative.sh\n");
         return 1;
     }
-    
-    int server_fd = socket(AF_INET, SOCK_STREAM, 0);
+
+    schedule_configure();
+    hub.notify_fd = eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+    void* collector = rust_collector_new();
+    pthread_t sampler;
+    if (hub.notify_fd < 0 || !collector ||
+        pthread_create(&sampler, NULL, sampler_thread, collector) != 0) {
+        fprintf(stderr, "Failed to start metrics sampler\n");
+        return 1;
+    }
+
+    int server_fd = socket(AF_INET, SOCK_STREAM | SOCK_NONBLOCK | SOCK_CLOEXEC, 0);
     if (server_fd < 0) {
         perror("Socket creation failed");
         return 1;
     }
-    
+
     int opt = 1;
     setsockopt(server_fd, SOL_SOCKET, SO_REUSEADDR, &opt, sizeof(opt));
-    
+
     struct sockaddr_in addr = {0};
     addr.sin_family = AF_INET;
     addr.sin_addr.s_addr = INADDR_ANY;
     addr.sin_port = htons(PORT);
-    
+
     if (bind(server_fd, (struct sockaddr*)&addr, sizeof(addr)) < 0) {
         perror("Bind failed");
         close(server_fd);
         return 1;
     }
-    
-    if (listen(server_fd, MAX_CLIENTS) < 0) {
+
+    if (listen(server_fd, LISTEN_BACKLOG) < 0) {
         perror("Listen failed");
         close(server_fd);
         return 1;
     }
-    
+
+    for (size_t i = 0; i < sizeof(assets) / sizeof(assets[0]); i++) {
+        asset_refresh(&assets[i]);
+    }
+
+    epoll_fd = epoll_create1(EPOLL_CLOEXEC);
+    struct epoll_event ev = {0};
+    ev.events = EPOLLIN;
+    ev.data.ptr = &server_fd;
+    epoll_ctl(epoll_fd, EPOLL_CTL_ADD, server_fd, &ev);
+    ev.data.ptr = &hub.notify_fd;
+    epoll_ctl(epoll_fd, EPOLL_CTL_ADD, hub.notify_fd, &ev);
+
     printf("\n");
     printf("  ╔════════════════════════════════════╗\n");
     printf("  ║   SysGuard Native Web Server      ║\n");
@@ -248,23 +1865,57 @@ int main() {
     printf("  [OK] Web interface: http://localhost:%d\n", PORT);
     printf("  [OK] Health endpoint: http://localhost:%d/health\n", PORT);
     printf("  [OK] Press Ctrl+C to stop\n\n");
-    
+
+    struct epoll_event events[MAX_EVENTS];
+    time_t last_sweep = time(NULL);
     while (running) {
-        struct sockaddr_in client_addr;
-        socklen_t client_len = sizeof(client_addr);
-        
-        int client_fd = accept(server_fd, (struct sockaddr*)&client_addr, &client_len);
-        if (client_fd < 0) {
-            if (running) perror("Accept failed");
+        int n = epoll_wait(epoll_fd, events, MAX_EVENTS, 1000);
+        if (n < 0) {
+            if (errno != EINTR) perror("epoll_wait");
             continue;
         }
-        
-        handle_client(client_fd);
+
+        for (int i = 0; i < n; i++) {
+            void* ptr = events[i].data.ptr;
+            if (ptr == &server_fd) {
+                accept_connections(server_fd);
+            } else if (ptr == &hub.notify_fd) {
+                broadcast();
+            } else {
+                conn_t* c = ptr;
+                if (c->fd < 0) continue;
+                if (events[i].events & EPOLLERR) {
+                    conn_close(c);
+                    continue;
+                }
+                if (events[i].events & EPOLLOUT) {
+                    if (conn_flush(c) == 0) conn_resume(c);
+                }
+                if (c->fd >= 0 && events[i].events & (EPOLLIN | EPOLLRDHUP | EPOLLHUP)) {
+                    conn_read(c);
+                }
+            }
+        }
+        free_closed_connections();
+
+        time_t now = time(NULL);
+        if (now != last_sweep) {
+            sweep_connections();
+            last_sweep = now;
+        }
     }
-    
+
     printf("\n[OK] Server shutting down...\n");
+    while (connections) conn_close(connections);
+    free_closed_connections();
     close(server_fd);
+    close(epoll_fd);
+    pthread_join(sampler, NULL);
+    frame_release(hub.latest);
+    rust_collector_free(collector);
+    close(hub.notify_fd);
+    sqlite3_close(history_db);
     if (rust_lib) dlclose(rust_lib);
-    
+
     return 0;
 }
@@ -12,9 +12,20 @@ def main():
     native_server = os.path.join(os.path.dirname(__file__), "native/webserver")
     
     if os.path.exists(native_server):
+        from cli.config import load_config
+        from monitor.scheduler import native_environment
+        from storage.db import DB_PATH
+        from storage.rollup import DEFAULT_RETENTION
         print("[OK] Starting native C web server...")
         try:
-            subprocess.run([native_server], check=True)
+            # Same adaptive sampling schedule, history database and retention as the Python side
+            config = load_config()
+            retention = {**DEFAULT_RETENTION, **(config.get('storage', {}).get('retention') or {})}
+            env = dict(os.environ, SYSGUARD_DB=DB_PATH,
+                       SYSGUARD_RETENTION_RAW_HOURS=str(retention['raw_hours']),
+                       SYSGUARD_RETENTION_MINUTE_DAYS=str(retention['minute_days']),
+                       **native_environment(config))
+            subprocess.run([native_server], check=True, env=env)
         except KeyboardInterrupt:
             print("\n[OK] Server stopped")
         return 0
@@ -27,16 +38,142 @@ if __name__ == "__main__":
     sys.exit(main())
 
 # Fallback FastAPI server for Python-only environments
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import asyncio
-from monitor.cpu import get_cpu_metrics
-from monitor.memory import get_memory_metrics
-from monitor.disk import get_disk_metrics
-from monitor.process import get_process_metrics, get_process_list
+import json
+import logging
+import time
+from monitor import selfstats
+from cli.config import load_config
+from monitor.scheduler import AdaptiveScheduler
+from monitor.snapshot import configure_sampler
+from monitor.delta import Subscription
+from storage.archive import archive_dir
+from storage.db import MAX_POINTS, init_db, query_metrics, choose_resolution
+from storage.downsample import lttb
+
+logger = logging.getLogger("sysguard.api")
+
+# Process records in /health and websocket documents
+PROCESS_LIMIT = 10
+# A websocket send slower than this drops the client
+SEND_TIMEOUT = 5.0
+
+_SERIALIZE_SECONDS = selfstats.histogram(
+    "sysguard_json_serialize_seconds", "Time serializing the shared snapshot document")
+_FRAMES_DROPPED = selfstats.counter(
+    "sysguard_ws_frames_dropped_total", "Samples a websocket client skipped because it was behind")
+_CLIENTS_DROPPED = selfstats.counter(
+    "sysguard_ws_clients_dropped_total", "Websocket clients disconnected for not keeping up")
+
+
+class SnapshotHub:
+    """
+    One asyncio task samples per interval, with the blocking native call
+    run in the default executor, and fans snapshots out to websocket clients.
+
+    Each client has a one-slot queue: a new sample replaces one the client
+    has not picked up yet, so slow clients skip samples instead of holding
+    up the sampler or other clients. The full JSON document is serialized
+    once per sample and shared.
+    """
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.latest = None
+        self.seq = 0
+        self._payload = None
+        self._document = None
+        self._clients = set()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def collect(self):
+        """Sample now without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, self.sampler.collect, PROCESS_LIMIT)
+        self.publish(snapshot)
+        return snapshot
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Sampling failed: {e}")
+            await asyncio.sleep(max(0.0, self.sampler.next_interval() - (loop.time() - started)))
+
+    def publish(self, snapshot):
+        self.seq += 1
+        self.latest = snapshot
+        self._payload = None
+        self._document = None
+        for queue in self._clients:
+            if queue.full():
+                queue.get_nowait()
+                _FRAMES_DROPPED.inc()
+            queue.put_nowait((self.seq, snapshot))
+
+    def document(self, snapshot):
+        """Plain-dict document for a snapshot, built once for the latest one"""
+        if snapshot is not self.latest:
+            return snapshot.to_dict(process_limit=PROCESS_LIMIT)
+        if self._document is None:
+            self._document = snapshot.to_dict(process_limit=PROCESS_LIMIT)
+        return self._document
+
+    def payload(self):
+        """The latest snapshot as JSON, serialized once per sample"""
+        if self._payload is None and self.latest is not None:
+            with _SERIALIZE_SECONDS.time():
+                self._payload = json.dumps(self.document(self.latest))
+        return self._payload
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait((self.seq, self.latest))
+        self._clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._clients.discard(queue)
+
 
 app_fallback = FastAPI()
+config = load_config()
+sampler = configure_sampler(scheduler=AdaptiveScheduler.from_config(config))
+# Raw history reaching past SQLite is read from where the writer compacts to
+ARCHIVE_PATH = archive_dir(config)
+# Tier choice follows the retention the writer prunes with
+RETENTION = config.get('storage', {}).get('retention')
+hub = SnapshotHub(sampler)
+selfstats.gauge("sysguard_ws_clients", "Connected websocket clients", lambda: len(hub._clients))
+
+@app_fallback.on_event("startup")
+async def start_sampler():
+    # A single sampling task feeds /health and every websocket client
+    hub.start()
+
+@app_fallback.on_event("shutdown")
+async def stop_sampler():
+    await hub.stop()
 
 static_dir = os.path.join(os.path.dirname(__file__), "../web")
 app_fallback.mount("/static", StaticFiles(directory=static_dir), name="static")
@@ -50,25 +187,95 @@ async def read_js():
     return FileResponse(os.path.join(static_dir, "dashboard.js"))
 
 @app_fallback.get("/health")
-def health():
+async def health():
+    if hub.latest is None:
+        await hub.collect()
+    return Response(content=hub.payload(), media_type="application/json")
+
+@app_fallback.get("/metrics")
+async def metrics():
+    """SysGuard's own overhead in the Prometheus text format"""
+    return Response(content=selfstats.render(), media_type="text/plain; version=0.0.4")
+
+@app_fallback.get("/history")
+def history(metric: str = "cpu", since: float = None, until: float = None, resolution: str = "auto",
+            points: int = None):
+    """
+    Metric history between epoch timestamps from the cheapest rollup tier.
+    With `points`, the averages are downsampled with LTTB to at most that
+    many [t, value] pairs.
+    """
+    until = time.time() if until is None else until
+    since = until - 3600 if since is None else since
+    if points is not None and not 2 <= points <= MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 2 and {MAX_POINTS}")
+    if resolution == "auto":
+        resolution = choose_resolution(since, until, RETENTION, points=points)
+    try:
+        init_db()
+        rows = query_metrics(metric, since, until, resolution, ARCHIVE_PATH, RETENTION)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if points is not None:
+        return {
+            "metric": metric,
+            "resolution": resolution,
+            "points": [[ts, round(avg, 2)] for ts, avg, *_ in
+                       lttb([row for row in rows if row[1] is not None], points)]
+        }
     return {
-        "cpu": get_cpu_metrics(),
-        "memory": get_memory_metrics(),
-        "disk": get_disk_metrics(),
-        "processes": get_process_list()[:10]
+        "metric": metric,
+        "resolution": resolution,
+        "points": [
+            {"t": ts, "avg": avg, "min": lo, "max": hi, "p95": p95}
+            for ts, avg, lo, hi, p95 in rows
+        ]
     }
 
 @app_fallback.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
+    """
+    Full documents every interval, or keyframe + deltas once the client
+    sends {"subscribe": [channels], "interval": seconds}.
+    """
     await ws.accept()
+    state = {"subscription": None}
+
+    async def receive():
+        async for text in ws.iter_text():
+            try:
+                request = json.loads(text)
+            except ValueError:
+                continue
+            if "subscribe" in request:
+                state["subscription"] = Subscription.from_request(request)
+            elif request.get("resync") and state["subscription"] is not None:
+                state["subscription"].resync()
+
+    receiver = asyncio.create_task(receive())
+    queue = hub.subscribe()
     try:
         while True:
-            await ws.send_json({
-                "cpu": get_cpu_metrics(),
-                "memory": get_memory_metrics(),
-                "disk": get_disk_metrics(),
-                "processes": get_process_list()[:10]
-            })
-            await asyncio.sleep(1)
+            next_sample = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({next_sample, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                # Client went away
+                next_sample.cancel()
+                break
+            seq, snapshot = next_sample.result()
+            subscription = state["subscription"]
+            if subscription is None:
+                text = hub.payload() if snapshot is hub.latest else json.dumps(hub.document(snapshot))
+            else:
+                message = subscription.message(hub.document(snapshot), seq)
+                if message is None:
+                    continue
+                text = json.dumps(message, separators=(",", ":"))
+            await asyncio.wait_for(ws.send_text(text), SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        _CLIENTS_DROPPED.inc()
     except Exception:
-        pass
\ No newline at end of file
+        pass
+    finally:
+        hub.unsubscribe(queue)
+        receiver.cancel()
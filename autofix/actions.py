@@ -1,13 +1,46 @@
 import os
+import signal
 import subprocess
 import logging
 
 logger = logging.getLogger("sysguard.autofix")
 
-def kill_process(pid: int) -> bool:
-    """Kills a process by PID."""
+def process_start_time(pid: int):
+    """Start time of pid in clock ticks after boot (field 22 of /proc/<pid>/stat), or None if it is gone."""
     try:
-        os.kill(pid, 9) # SIGKILL
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after the parenthesised name start at field 3
+    return int(stat[stat.rindex(b")") + 2:].split()[19])
+
+def _replaced(pid, start_time):
+    """True (and logged) if pid no longer belongs to the process that started at start_time."""
+    if start_time is None or process_start_time(pid) == start_time:
+        return False
+    logger.warning(f"Skipping process {pid}: target exited")
+    return True
+
+def kill_process(pid: int, start_time: int = None) -> bool:
+    """
+    Kills a process by PID. With start_time, only if the PID still belongs
+    to the process that started then; the check and the signal go through
+    one pidfd so the PID cannot be reused in between.
+    """
+    try:
+        if not hasattr(os, "pidfd_open"):
+            if _replaced(pid, start_time):
+                return False
+            os.kill(pid, signal.SIGKILL)
+        else:
+            pidfd = os.pidfd_open(pid)
+            try:
+                if _replaced(pid, start_time):
+                    return False
+                signal.pidfd_send_signal(pidfd, signal.SIGKILL)
+            finally:
+                os.close(pidfd)
         logger.info(f"Killed process {pid}")
         return True
     except PermissionError:
@@ -20,13 +53,34 @@ def kill_process(pid: int) -> bool:
         logger.error(f"Error killing process {pid}: {e}")
         return False
 
-def restart_service(service_name: str) -> bool:
+def renice_process(pid: int, niceness: int = 10, start_time: int = None) -> bool:
+    """Lowers a process's scheduling priority, skipped if start_time no longer matches."""
+    try:
+        if _replaced(pid, start_time):
+            return False
+        os.setpriority(os.PRIO_PROCESS, pid, niceness)
+        logger.info(f"Reniced process {pid} to {niceness}")
+        return True
+    except PermissionError:
+        logger.error(f"Permission denied renicing process {pid}")
+        return False
+    except ProcessLookupError:
+        logger.warning(f"Process {pid} not found")
+        return False
+    except Exception as e:
+        logger.error(f"Error renicing process {pid}: {e}")
+        return False
+
+def restart_service(service_name: str, timeout: float = 30) -> bool:
     """Restarts a systemd service."""
     cmd = ["systemctl", "restart", service_name]
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
         logger.info(f"Restarted service {service_name}")
         return True
+    except subprocess.TimeoutExpired:
+        logger.error(f"Timed out restarting service {service_name} after {timeout}s")
+        return False
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to restart service {service_name}: {e}")
         return False
@@ -34,18 +88,38 @@ def restart_service(service_name: str) -> bool:
         logger.error("systemctl not found")
         return False
 
-def clear_cache() -> bool:
+def clear_cache(timeout: float = 30) -> bool:
     """Clears page cache (requires root)."""
     # sync; echo 1 > /proc/sys/vm/drop_caches
     try:
-        subprocess.run(["sync"], check=True)
+        subprocess.run(["sync"], check=True, timeout=timeout)
         with open("/proc/sys/vm/drop_caches", "w") as f:
             f.write("1")
         logger.info("Cleared system cache")
         return True
+    except subprocess.TimeoutExpired:
+        logger.error(f"Timed out syncing before cache clear after {timeout}s")
+        return False
     except PermissionError:
         logger.error("Permission denied clearing cache (root required)")
         return False
     except Exception as e:
         logger.error(f"Error clearing cache: {e}")
         return False
+
+def kill_cgroup(cgroup_dir: str) -> bool:
+    """Kills every process in a cgroup v2 group (cgroup.kill, Linux 5.14+)."""
+    try:
+        with open(os.path.join(cgroup_dir, "cgroup.kill"), "w") as f:
+            f.write("1")
+        logger.info(f"Killed cgroup {cgroup_dir}")
+        return True
+    except FileNotFoundError:
+        logger.error(f"cgroup {cgroup_dir} not found or kernel lacks cgroup.kill")
+        return False
+    except PermissionError:
+        logger.error(f"Permission denied killing cgroup {cgroup_dir}")
+        return False
+    except Exception as e:
+        logger.error(f"Error killing cgroup {cgroup_dir}: {e}")
+        return False
@@ -0,0 +1,94 @@
+import logging
+
+import numpy as np
+
+from autofix.process_rules import CompiledProcessMatch
+from autofix.rules import RuleError
+
+logger = logging.getLogger("sysguard.cgroup_rules")
+
+# Numeric columns a cgroup rule can compare against; `name` is the cgroup
+# path below the root, e.g. system.slice/nginx.service
+CGROUP_FIELDS = frozenset({
+    'cpu_percent', 'memory_mb', 'memory_percent', 'memory_limit_percent',
+    'io_read_bytes_per_sec', 'io_write_bytes_per_sec', 'pids',
+})
+
+CGROUP_ACTIONS = frozenset({'notify', 'restart', 'kill'})
+
+
+class CgroupTable:
+    """Column view over one snapshot's cgroups, built per column on first use"""
+
+    def __init__(self, groups):
+        self.groups = groups
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def column(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            if name == 'name':
+                values = np.array([g['path'].encode() for g in self.groups], dtype=bytes)
+            else:
+                values = np.array([g[name] for g in self.groups], dtype=float)
+            self._columns[name] = values
+        return values
+
+
+class CgroupRuleSet:
+    """
+    cgroup-scoped rules evaluated over every group of a snapshot, with a
+    per-(rule, path) cooldown. Parents include their children's usage, so
+    rules usually narrow the match by name.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        for rule in rules:
+            name = rule.get('name', rule.get('match'))
+            action = rule.get('action', 'notify')
+            if action not in CGROUP_ACTIONS:
+                raise RuleError(f"cgroup rule '{name}': unknown action '{action}'")
+            try:
+                compiled = CompiledProcessMatch(rule['match'], CGROUP_FIELDS, kind="cgroup")
+            except RuleError as e:
+                raise RuleError(f"cgroup rule '{name}': {e}") from None
+            self.rules.append((rule, compiled))
+        self._last_fired = {}
+
+    def evaluate(self, groups, now):
+        """
+        Returns [(rule, [path, ...])] for rules with matches that are not
+        cooling down, capped at each rule's max_per_tick.
+        """
+        table = CgroupTable(groups)
+        fired = []
+        for index, (rule, compiled) in enumerate(self.rules):
+            rows = compiled(table)
+            if not len(rows):
+                continue
+            cooldown = rule.get('cooldown', 300)
+            limit = rule.get('max_per_tick', 10)
+            hits = []
+            for row in rows.tolist():
+                path = groups[row]['path']
+                last = self._last_fired.get((index, path))
+                if last is not None and now - last < cooldown:
+                    continue
+                self._last_fired[(index, path)] = now
+                hits.append(path)
+                if len(hits) >= limit:
+                    break
+            if hits:
+                fired.append((rule, hits))
+        self._expire(now)
+        return fired
+
+    def _expire(self, now):
+        if len(self._last_fired) < 1024:
+            return
+        horizon = max((rule.get('cooldown', 300) for rule, _ in self.rules), default=0)
+        self._last_fired = {k: t for k, t in self._last_fired.items() if now - t < horizon}
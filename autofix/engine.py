@@ -1,60 +1,208 @@
 import logging
-from monitor.cpu import get_cpu_metrics
-from monitor.memory import get_memory_metrics
-from monitor.disk import get_disk_metrics
-from autofix.rules import evaluate_condition
-from autofix.actions import clear_cache, restart_service
+import os
+import time
+from monitor.snapshot import current_snapshot
+from autofix.rules import RuleSet
+from autofix.actions import clear_cache, restart_service, kill_process, renice_process, kill_cgroup
+from autofix.executor import ActionExecutor
+from monitor import selfstats
 
 logger = logging.getLogger("sysguard.engine")
 
+_RULE_EVAL_SECONDS = selfstats.histogram(
+    "sysguard_rule_eval_seconds", "Time evaluating all rules for one snapshot")
+_RULES_FIRED = selfstats.counter("sysguard_rules_fired_total", "Rule matches, including dry runs")
+
+# Trailing parts of flattened names that index a list, e.g. cpu_load_avg_1
+_LIST_INDEX = {'1': 0, '5': 1, '15': 2}
+
+def _flat_plan(metrics):
+    """(flattened name, snapshot section, key, list index or None) per metric"""
+    plan = []
+    for name in sorted(metrics):
+        section, _, key = name.partition('_')
+        base, _, suffix = key.rpartition('_')
+        if base and suffix in _LIST_INDEX:
+            plan.append((name, section, base, _LIST_INDEX[suffix]))
+        else:
+            plan.append((name, section, key, None))
+    return plan
+
 class AutoFixEngine:
-    def __init__(self, config):
+    def __init__(self, config, source=current_snapshot, clock=time.monotonic, listener=None):
+        """
+        source() supplies the snapshot when run_check() is called without
+        one, and clock() drives action cooldowns and the rate limit; replays
+        pass recorded snapshots and their timestamps. listener(timestamp,
+        rule, target, skipped) is called for every match, with the reason
+        the action was or would be skipped (None if it runs).
+        """
         self.config = config
+        self.source = source
+        self.listener = listener
         autofix_cfg = config.get("autofix", {})
         self.enabled = autofix_cfg.get("enabled", False)
         self.dry_run = autofix_cfg.get("dry_run", True)
         self.rules = autofix_cfg.get("rules", [])
+        # Compiled and validated once; raises RuleError on a bad trigger
+        self.ruleset = RuleSet(self.rules)
+        # Only the metrics the rules read are flattened each tick
+        self._flat_plan = _flat_plan(self.ruleset.metrics)
+        self.process_rules = autofix_cfg.get("process_rules", [])
+        self.process_ruleset = None
+        if self.process_rules:
+            from autofix.process_rules import ProcessRuleSet
+            self.process_ruleset = ProcessRuleSet(self.process_rules)
+        self.cgroup_rules = autofix_cfg.get("cgroup_rules", [])
+        self.cgroup_ruleset = None
+        if self.cgroup_rules:
+            from autofix.cgroup_rules import CgroupRuleSet
+            from monitor.cgroups import DEFAULT_ROOT
+            self.cgroup_ruleset = CgroupRuleSet(self.cgroup_rules)
+            self.cgroup_root = (config.get("monitoring", {}).get("cgroups") or {}).get("root", DEFAULT_ROOT)
+        # Actions run on a bounded pool so a slow restart never stalls a tick;
+        # dry runs only apply its cooldowns and rate limit
+        self.executor = None
+        if self.enabled:
+            executor_cfg = autofix_cfg.get("executor", {})
+            self.executor = ActionExecutor(
+                workers=executor_cfg.get("workers", 2),
+                max_pending=executor_cfg.get("max_pending", 16),
+                timeout=executor_cfg.get("timeout", 30),
+                cooldown=executor_cfg.get("cooldown", 300),
+                max_actions_per_minute=executor_cfg.get("max_actions_per_minute", 10),
+                clock=clock,
+            )
+
+    @property
+    def needs_process_table(self):
+        """Whether snapshots must carry the full process table"""
+        return self.enabled and self.process_ruleset is not None
+
+    @property
+    def needs_cgroups(self):
+        """Whether snapshots must carry per-cgroup usage"""
+        return self.enabled and self.cgroup_ruleset is not None
 
-    def run_check(self):
+    def run_check(self, snapshot=None):
         if not self.enabled:
             return []
 
-        metrics = {
-            "cpu": get_cpu_metrics(),
-            "memory": get_memory_metrics(),
-            "disk": get_disk_metrics()
-        }
-        
-        flat_metrics = self._flatten_metrics(metrics)
+        snapshot = snapshot or self.source()
+        with _RULE_EVAL_SECONDS.time():
+            triggered_actions = self._check(snapshot)
+        if triggered_actions:
+            _RULES_FIRED.inc(len(triggered_actions))
+        return triggered_actions
+
+    def _check(self, snapshot):
+        flat = self.flat_metrics(snapshot)
         triggered_actions = []
 
-        for rule in self.rules:
-            if evaluate_condition(flat_metrics, rule["trigger"]):
-                action_name = rule["action"]
-                triggered_actions.append(f"Rule '{rule['name']}' triggered: {action_name}")
-                
-                if not self.dry_run:
-                    self.execute_action(action_name)
-                else:
-                    logger.info(f"[DRY RUN] Would execute: {action_name}")
+        for rule in self.ruleset.evaluate(flat, snapshot.timestamp):
+            action_name = rule["action"]
+            triggered_actions.append(f"Rule '{rule['name']}' triggered: {action_name}")
+            self._act(snapshot, rule, action_name, None, self.execute_action, action_name)
+
+        if self.process_ruleset is not None and snapshot.process_table is not None:
+            triggered_actions.extend(self._run_process_rules(snapshot))
+
+        if self.cgroup_ruleset is not None and snapshot.cgroups:
+            triggered_actions.extend(self._run_cgroup_rules(snapshot))
 
         return triggered_actions
+
+    def _run_process_rules(self, snapshot):
+        triggered = []
+        fired = self.process_ruleset.evaluate(
+            snapshot.process_table, snapshot.memory.get('total_mb', 0), snapshot.timestamp)
+        for rule, hits in fired:
+            action_name = rule.get("action", "notify")
+            for pid, start_time, name in hits:
+                triggered.append(f"Rule '{rule['name']}' matched {name} ({pid}): {action_name}")
+                # Keyed and executed on (pid, start_time) so a reused PID is never hit
+                self._act(snapshot, rule, f"{action_name}:{pid}:{start_time}", f"{name} ({pid})",
+                          self.execute_process_action, action_name, pid, rule, start_time)
+        return triggered
+
+    def _run_cgroup_rules(self, snapshot):
+        triggered = []
+        for rule, paths in self.cgroup_ruleset.evaluate(snapshot.cgroups, snapshot.timestamp):
+            action_name = rule.get("action", "notify")
+            for path in paths:
+                triggered.append(f"Rule '{rule['name']}' matched cgroup {path}: {action_name}")
+                self._act(snapshot, rule, f"{action_name}:{path}", f"cgroup {path}",
+                          self.execute_cgroup_action, action_name, path)
+        return triggered
+
+    def _act(self, snapshot, rule, key, target, fn, *args):
+        """Dispatch a matched action, or in a dry run log whether it would run"""
+        if self.dry_run:
+            skipped = self.executor.admit(key, rule.get("cooldown"))
+            on = f" on {target}" if target else ""
+            if skipped:
+                logger.debug(f"[DRY RUN] Would skip: {rule.get('action', 'notify')}{on} ({skipped})")
+            else:
+                logger.info(f"[DRY RUN] Would execute: {rule.get('action', 'notify')}{on}")
+        else:
+            skipped = self._dispatch(key, fn, *args, rule=rule)
+        if self.listener is not None:
+            self.listener(snapshot.timestamp, rule, target, skipped)
+
+    def _dispatch(self, key, fn, *args, rule):
+        """Hand an action to the executor; duplicates and cooldowns are skipped"""
+        skipped = self.executor.submit(key, fn, *args, timeout=rule.get("timeout"),
+                                       cooldown=rule.get("cooldown"))
+        if skipped:
+            logger.debug(f"Skipped {key}: {skipped}")
+        return skipped
+
+    def close(self, wait=True):
+        """Wait for queued actions and stop the worker pool"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+
+    def execute_process_action(self, action_name, pid, rule, start_time=None, timeout=None):
+        logger.info(f"Executing action: {action_name} on pid {pid}")
+        if action_name == "kill":
+            return kill_process(pid, start_time)
+        if action_name == "renice":
+            return renice_process(pid, rule.get("niceness", 10), start_time)
+        return True
     
-    def _flatten_metrics(self, metrics):
-        """Flatten nested metrics once for all rule evaluations"""
+    def execute_cgroup_action(self, action_name, path, timeout=30):
+        logger.info(f"Executing action: {action_name} on cgroup {path}")
+        if action_name == "restart":
+            # Only service units can be restarted; scopes and slices have no ExecStart
+            unit = path.rsplit("/", 1)[-1]
+            if not unit.endswith(".service"):
+                logger.warning(f"Cannot restart cgroup {path}: not a systemd service")
+                return False
+            return restart_service(unit, timeout=timeout)
+        if action_name == "kill":
+            return kill_cgroup(os.path.join(self.cgroup_root, path))
+        return True
+
+    def flat_metrics(self, snapshot):
+        """
+        The snapshot metrics the system rules read, flattened once per check
+        as rules name them (cpu_usage_percent, cpu_load_avg_1, ...)
+        """
+        sections = {"cpu": snapshot.cpu, "memory": snapshot.memory, "disk": snapshot.disk}
         flat = {}
-        for k, v in metrics.items():
-            if isinstance(v, dict):
-                for sub_k, sub_v in v.items():
-                    flat[f"{k}_{sub_k}"] = sub_v
-            else:
-                flat[k] = v
+        for name, section, key, index in self._flat_plan:
+            value = sections.get(section, {}).get(key)
+            if index is not None and value is not None:
+                value = value[index] if index < len(value) else None
+            if value is not None:
+                flat[name] = value
         return flat
 
-    def execute_action(self, action_name):
+    def execute_action(self, action_name, timeout=30):
         logger.info(f"Executing action: {action_name}")
         if action_name == "clear_cache":
-            clear_cache()
-        elif action_name.startswith("restart_"):
+            return clear_cache(timeout=timeout)
+        if action_name.startswith("restart_"):
             svc = action_name.replace("restart_", "")
-            restart_service(svc)
+            return restart_service(svc, timeout=timeout)
+        return True
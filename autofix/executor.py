@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from monitor import selfstats
+
+logger = logging.getLogger("sysguard.executor")
+
+_QUEUE_DEPTH = selfstats.gauge("sysguard_action_queue_depth", "Remediation actions queued or running")
+_SKIPPED = selfstats.counter(
+    "sysguard_actions_skipped_total", "Actions not queued (in flight, cooling down, queue full, rate limited)")
+_ACTION_SECONDS = selfstats.histogram("sysguard_action_seconds", "Remediation action run time")
+
+class ActionExecutor:
+    """
+    Runs remediation actions off the monitoring loop.
+
+    submit() never blocks: an action is dropped if the same key is already
+    running (in-flight dedupe), if it ran within its cooldown window, if the
+    global rate limit is exhausted, or if the bounded queue is full. Each
+    action gets a timeout that is passed to the action function, and every
+    outcome is handed to `record(type, message)` (the alerts table by default).
+    Cooldowns and the rate limit run on `clock`, which replays set to the
+    recorded time.
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=30, cooldown=300,
+                 max_actions_per_minute=10, record=None, clock=time.monotonic):
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.max_pending = max_pending
+        self.max_actions_per_minute = max_actions_per_minute
+        self._record = record
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sysguard-action")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._last_started = {}
+        self._tokens = float(max_actions_per_minute)
+        self._refilled = clock()
+
+    @property
+    def pending(self):
+        """Actions queued or running"""
+        with self._lock:
+            return len(self._in_flight)
+
+    def submit(self, key, fn, *args, timeout=None, cooldown=None, **kwargs):
+        """
+        Queue fn(*args, timeout=..., **kwargs) under `key`.
+        Returns the reason it was skipped, or None if it was queued.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        cooldown = self.cooldown if cooldown is None else cooldown
+        now = self._clock()
+        with self._lock:
+            skipped = self._admit(key, now, cooldown)
+            _QUEUE_DEPTH.set(len(self._in_flight))
+        if skipped:
+            _SKIPPED.inc()
+            return skipped
+        self._pool.submit(self._run, key, fn, args, dict(kwargs, timeout=timeout))
+        return None
+
+    def admit(self, key, cooldown=None):
+        """
+        Apply the cooldown and rate limit to `key` as submit() would, without
+        running anything; dry runs use it to tell which actions would run.
+        Returns the reason it would be skipped, or None.
+        """
+        cooldown = self.cooldown if cooldown is None else cooldown
+        with self._lock:
+            skipped = self._admit(key, self._clock(), cooldown)
+            if skipped is None:
+                # Nothing runs, so nothing stays in flight
+                self._in_flight.discard(key)
+        return skipped
+
+    def _admit(self, key, now, cooldown):
+        """Claim a slot for `key`, or return why it cannot run now"""
+        if key in self._in_flight:
+            return "in flight"
+        last = self._last_started.get(key)
+        if last is not None and now - last < cooldown:
+            return "cooling down"
+        if len(self._in_flight) >= self.max_pending:
+            return "queue full"
+        self._refill(now)
+        if self._tokens < 1:
+            return "rate limited"
+        self._tokens -= 1
+        self._in_flight.add(key)
+        self._last_started[key] = now
+        return None
+
+    def _refill(self, now):
+        rate = self.max_actions_per_minute / 60.0
+        self._tokens = min(float(self.max_actions_per_minute), self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+
+    def _run(self, key, fn, args, kwargs):
+        started = time.monotonic()
+        try:
+            ok = fn(*args, **kwargs)
+            outcome = "succeeded" if ok else "failed"
+        except Exception as e:
+            ok = False
+            outcome = f"raised {e!r}"
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+                _QUEUE_DEPTH.set(len(self._in_flight))
+        elapsed = time.monotonic() - started
+        _ACTION_SECONDS.observe(elapsed)
+        message = f"{key} {outcome} in {elapsed:.2f}s"
+        logger.log(logging.INFO if ok else logging.ERROR, message)
+        self._write_outcome("autofix" if ok else "autofix_error", message)
+
+    def _write_outcome(self, alert_type, message):
+        try:
+            if self._record is not None:
+                self._record(alert_type, message)
+            else:
+                from storage.db import log_alert
+                log_alert(alert_type, message)
+        except Exception as e:
+            logger.error(f"Could not record action outcome: {e}")
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
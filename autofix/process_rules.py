@@ -0,0 +1,232 @@
+import fnmatch
+import logging
+import re
+
+import numpy as np
+
+from autofix.rules import OPERATORS, RuleError, _tokenize
+
+logger = logging.getLogger("sysguard.process_rules")
+
+# Numeric columns a process rule can compare against
+PROCESS_FIELDS = frozenset({'pid', 'cpu_percent', 'memory_kb', 'rss_mb', 'memory_percent'})
+
+PROCESS_ACTIONS = frozenset({'notify', 'kill', 'renice'})
+
+
+class ProcessTable:
+    """
+    Column view over the native process table for one tick.
+    Derived columns are computed once, on first use, for the whole table.
+    """
+
+    def __init__(self, records, total_mb):
+        self.records = records
+        self.total_mb = total_mb
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name):
+        if name in ('pid', 'start_time', 'cpu_percent', 'memory_kb', 'name'):
+            return self.records[name]
+        if name not in self._derived:
+            rss_mb = self.records['memory_kb'] / 1024.0
+            self._derived['rss_mb'] = rss_mb
+            self._derived['memory_percent'] = (
+                rss_mb * (100.0 / self.total_mb) if self.total_mb else np.zeros_like(rss_mb))
+        return self._derived[name]
+
+
+class CompiledProcessMatch:
+    """
+    A process predicate compiled into vectorized functions over row indices.
+
+    Each node maps (table, idx) -> bool array aligned with idx. 'and' only
+    evaluates its right side on rows that passed the left side (and 'or' on
+    rows that failed it), so expensive name matches run on few rows.
+
+    Grammar:
+        expr    := and ('or' and)*
+        and     := not ('and' not)*
+        not     := 'not' not | primary
+        primary := '(' expr ')' | FIELD OP NUMBER | 'name' ('matches' GLOB | '==' STRING)
+
+    FIELD is one of `fields`; any table with column(name) -> array works.
+    """
+
+    def __init__(self, condition, fields=PROCESS_FIELDS, kind="process"):
+        self.source = condition
+        self.fields = fields
+        self.kind = kind
+        self._tokens = _tokenize(condition)
+        self._pos = 0
+        if not self._tokens:
+            raise RuleError("Empty condition")
+        self._fn = self._expr()
+        if self._pos != len(self._tokens):
+            raise RuleError(f"Unexpected '{self._tokens[self._pos][1]}' in '{condition}'")
+        del self._tokens
+
+    def __call__(self, table):
+        """Indices of the rows that match"""
+        idx = np.arange(len(table))
+        if not len(idx):
+            return idx
+        return idx[self._fn(table, idx)]
+
+    # --- parser -----------------------------------------------------------
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _take(self, *kinds):
+        kind, value = self._peek()
+        if kind is None or kind not in kinds:
+            raise RuleError(f"Expected {' or '.join(kinds)} in '{self.source}'")
+        self._pos += 1
+        return value
+
+    def _keyword(self, word):
+        if self._peek() == ('name', word):
+            self._pos += 1
+            return True
+        return False
+
+    def _expr(self):
+        fn = self._and()
+        while self._keyword('or'):
+            fn = self._either(fn, self._and())
+        return fn
+
+    def _and(self):
+        fn = self._not()
+        while self._keyword('and'):
+            fn = self._both(fn, self._not())
+        return fn
+
+    def _not(self):
+        if self._keyword('not'):
+            inner = self._not()
+            return lambda table, idx: ~inner(table, idx)
+        return self._primary()
+
+    def _primary(self):
+        if self._peek() == ('punct', '('):
+            self._pos += 1
+            fn = self._expr()
+            if self._take('punct') != ')':
+                raise RuleError(f"Expected ) in '{self.source}'")
+            return fn
+        field = self._take('name')
+        if field == 'name':
+            return self._name_match()
+        if field not in self.fields:
+            raise RuleError(f"Unknown {self.kind} field '{field}' in '{self.source}'")
+        op = OPERATORS[self._take('op')]
+        number = float(self._take('number'))
+        return lambda table, idx: op(table.column(field)[idx], number)
+
+    def _name_match(self):
+        if self._keyword('matches'):
+            pattern = self._take('glob', 'string', 'name').strip('\'"')
+            regex = re.compile(fnmatch.translate(pattern).encode())
+        elif self._peek() == ('op', '=='):
+            self._pos += 1
+            regex = re.compile(re.escape(self._take('string').strip('\'"').encode()) + b'\\Z')
+        else:
+            raise RuleError(f"Expected 'matches' or '==' after name in '{self.source}'")
+        # Process names repeat across ticks; remember verdicts per distinct name
+        verdicts = {}
+
+        def match(table, idx):
+            names, inverse = np.unique(table.column('name')[idx], return_inverse=True)
+            lookup = np.empty(len(names), dtype=bool)
+            for i, name in enumerate(names.tolist()):
+                verdict = verdicts.get(name)
+                if verdict is None:
+                    if len(verdicts) > 4096:
+                        verdicts.clear()
+                    verdict = verdicts[name] = regex.match(name) is not None
+                lookup[i] = verdict
+            return lookup[inverse.reshape(-1)]
+        return match
+
+    @staticmethod
+    def _both(first, second):
+        def both(table, idx):
+            mask = first(table, idx)
+            if mask.any():
+                mask[mask] = second(table, idx[mask])
+            return mask
+        return both
+
+    @staticmethod
+    def _either(first, second):
+        def either(table, idx):
+            mask = first(table, idx)
+            rest = ~mask
+            if rest.any():
+                mask[rest] = second(table, idx[rest])
+            return mask
+        return either
+
+
+class ProcessRuleSet:
+    """
+    Process-scoped rules evaluated in one batched pass per rule over the
+    whole process table, with a per-(rule, PID) cooldown.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        for rule in rules:
+            name = rule.get('name', rule.get('match'))
+            action = rule.get('action', 'notify')
+            if action not in PROCESS_ACTIONS:
+                raise RuleError(f"Process rule '{name}': unknown action '{action}'")
+            try:
+                compiled = CompiledProcessMatch(rule['match'])
+            except RuleError as e:
+                raise RuleError(f"Process rule '{name}': {e}") from None
+            self.rules.append((rule, compiled))
+        self._last_fired = {}
+
+    def evaluate(self, records, total_mb, now):
+        """
+        Returns [(rule, [(pid, start_time, name), ...])] for rules with
+        matches that are not cooling down, capped at each rule's
+        max_per_tick. Cooldowns follow (pid, start_time), so a reused PID
+        starts fresh.
+        """
+        table = ProcessTable(records, total_mb)
+        fired = []
+        for index, (rule, compiled) in enumerate(self.rules):
+            rows = compiled(table)
+            if not len(rows):
+                continue
+            cooldown = rule.get('cooldown', 300)
+            limit = rule.get('max_per_tick', 10)
+            hits = []
+            for pid, start_time, name in zip(table.column('pid')[rows].tolist(),
+                                             table.column('start_time')[rows].tolist(),
+                                             table.column('name')[rows].tolist()):
+                key = (index, pid, start_time)
+                last = self._last_fired.get(key)
+                if last is not None and now - last < cooldown:
+                    continue
+                self._last_fired[key] = now
+                hits.append((pid, start_time, name.decode('utf-8', 'replace')))
+                if len(hits) >= limit:
+                    break
+            if hits:
+                fired.append((rule, hits))
+        self._expire(now)
+        return fired
+
+    def _expire(self, now):
+        if len(self._last_fired) < 1024:
+            return
+        horizon = max((rule.get('cooldown', 300) for rule, _ in self.rules), default=0)
+        self._last_fired = {k: t for k, t in self._last_fired.items() if now - t < horizon}
@@ -0,0 +1,106 @@
+"""
+Rule backtesting
+Streams a snapshot recording (storage/recording.py) through a dry-run
+AutoFixEngine as fast as it can be read, on the recorded clock, and
+reports which rules would have fired, when and how often.
+"""
+
+import copy
+import time
+from collections import Counter
+
+from autofix.engine import AutoFixEngine
+from storage.recording import read_recording
+
+
+class RuleReport:
+    """Matches of one rule over a replay"""
+
+    def __init__(self, rule, kind):
+        self.name = rule.get('name', rule.get('trigger', rule.get('match')))
+        self.kind = kind
+        self.action = rule.get('action', 'notify')
+        self.matches = 0
+        self.runs = 0
+        self.skipped = Counter()
+        self.targets = Counter()
+        self.first = self.last = None
+
+
+class ReplayReport:
+    """What a rule set would have done over a recording"""
+
+    def __init__(self):
+        self.snapshots = 0
+        self.with_process_table = 0
+        self.with_cgroups = 0
+        self.start = self.end = None
+        self.elapsed = 0.0
+        # Keyed by id() of the rule's config entry, in config order
+        self.rules = {}
+        # (timestamp, rule name, action, target) of every action that would have run
+        self.events = []
+
+    def observe(self, snapshot):
+        self.snapshots += 1
+        if self.start is None:
+            self.start = snapshot.timestamp
+        self.end = snapshot.timestamp
+        if snapshot.process_table is not None:
+            self.with_process_table += 1
+        if snapshot.cgroups:
+            self.with_cgroups += 1
+
+    def record(self, timestamp, rule, target, skipped):
+        """AutoFixEngine listener"""
+        report = self.rules[id(rule)]
+        report.matches += 1
+        if report.first is None:
+            report.first = timestamp
+        report.last = timestamp
+        if target is not None:
+            report.targets[target] += 1
+        if skipped:
+            report.skipped[skipped] += 1
+        else:
+            report.runs += 1
+            self.events.append((timestamp, report.name, report.action, target))
+
+
+def replay(config, path, since=None, until=None):
+    """
+    Replay the recording at `path` through the autofix rules of `config`,
+    forced into dry run. Returns a ReplayReport.
+    """
+    config = copy.deepcopy(config)
+    autofix_cfg = config.setdefault('autofix', {})
+    autofix_cfg['enabled'] = True
+    autofix_cfg['dry_run'] = True
+
+    report = ReplayReport()
+    # Rules never read the top processes, only the process table
+    snapshots = read_recording(path, since, until, processes=False)
+    now = [0.0]
+
+    def source():
+        # StopIteration at the end of the recording ends the replay
+        snapshot = next(snapshots)
+        now[0] = snapshot.timestamp
+        report.observe(snapshot)
+        return snapshot
+
+    engine = AutoFixEngine(config, source=source, clock=lambda: now[0], listener=report.record)
+    for kind, rules in (('system', engine.rules), ('process', engine.process_rules),
+                        ('cgroup', engine.cgroup_rules)):
+        for rule in rules:
+            report.rules[id(rule)] = RuleReport(rule, kind)
+    started = time.perf_counter()
+    try:
+        while True:
+            engine.run_check()
+    except StopIteration:
+        pass
+    finally:
+        engine.close()
+    report.elapsed = time.perf_counter() - started
+    return report
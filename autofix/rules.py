@@ -1,6 +1,8 @@
 import logging
 import operator
 import re
+from collections import deque
+from functools import lru_cache
 from typing import Dict, Any
 
 logger = logging.getLogger("sysguard.rules")
@@ -15,39 +17,388 @@ OPERATORS = {
     '<': operator.lt,
 }
 
+# Flattened metric names produced by AutoFixEngine.flat_metrics()
+KNOWN_METRICS = frozenset({
+    'cpu_usage_percent', 'cpu_cores_logical', 'cpu_cores_physical',
+    'cpu_load_avg_1', 'cpu_load_avg_5', 'cpu_load_avg_15',
+    'memory_total_mb', 'memory_used_mb', 'memory_available_mb', 'memory_percent',
+    'disk_total_gb', 'disk_used_gb', 'disk_free_gb', 'disk_percent',
+})
+
+# Short names used in configs and docs
+ALIASES = {
+    'cpu_percent': 'cpu_usage_percent',
+    'load_avg_1': 'cpu_load_avg_1',
+    'load_avg_5': 'cpu_load_avg_5',
+    'load_avg_15': 'cpu_load_avg_15',
+}
+
+# Windowed functions: name -> default window in seconds
+FUNCTIONS = {
+    'avg': 60.0,
+    'rate': 60.0,
+}
+
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<duration>\d+(?:\.\d+)?(?:ms|s|m|h))\b |
+        (?P<number>[+-]?\d+(?:\.\d+)?) |
+        (?P<op>>=|<=|==|!=|>|<) |
+        (?P<string>'[^']*'|"[^"]*") |
+        (?P<glob>[\w.\-]*[*?][\w.*?\-]*) |
+        (?P<name>[A-Za-z_]\w*) |
+        (?P<punct>[(),])
+    )''', re.VERBOSE)
+
+
+class RuleError(ValueError):
+    """Raised when a rule condition cannot be compiled"""
+
+
+def _tokenize(condition):
+    tokens = []
+    pos = 0
+    text = condition.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise RuleError(f"Unexpected input at position {pos} in '{condition}'")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def _parse_duration(text):
+    for unit in ('ms', 's', 'm', 'h'):
+        if text.endswith(unit):
+            return float(text[:-len(unit)]) * _DURATION_UNITS[unit]
+    raise RuleError(f"Invalid duration '{text}'")
+
+
+class Window:
+    """
+    Sliding window of (timestamp, value) for one metric.
+
+    Windows are shared by every rule that asks for the same metric and span,
+    and are updated once per tick with a running sum so avg() is O(1).
+    """
+    __slots__ = ('metric', 'span', 'samples', 'total')
+
+    def __init__(self, metric, span):
+        self.metric = metric
+        self.span = span
+        self.samples = deque()
+        self.total = 0.0
+
+    def push(self, now, value):
+        self.samples.append((now, value))
+        self.total += value
+        horizon = now - self.span
+        while self.samples and self.samples[0][0] < horizon:
+            self.total -= self.samples.popleft()[1]
+
+    def avg(self):
+        return self.total / len(self.samples) if self.samples else None
+
+    def rate(self):
+        """Change per second between the oldest and newest sample"""
+        if len(self.samples) < 2:
+            return None
+        (t0, v0), (t1, v1) = self.samples[0], self.samples[-1]
+        return (v1 - v0) / (t1 - t0) if t1 > t0 else None
+
+
+class RuleContext:
+    """Per-tick evaluation state handed to compiled conditions"""
+    __slots__ = ('values', 'now', 'windows')
+
+    def __init__(self, values, now, windows):
+        self.values = values
+        self.now = now
+        self.windows = windows
+
+
+class CompiledCondition:
+    """
+    A condition parsed once into a tree of closures.
+
+    Grammar:
+        expr    := and ('or' and)*
+        and     := not ('and' not)*
+        not     := 'not' not | primary
+        primary := ('(' expr ')' | operand OP operand) ['for' DURATION]
+        operand := NUMBER | METRIC | FUNC '(' METRIC [',' DURATION] ')'
+    """
+
+    def __init__(self, condition, known_metrics=KNOWN_METRICS):
+        self.source = condition
+        self.known_metrics = known_metrics
+        self.metrics = set()
+        self.windows = set()
+        # Set by 'for' clauses, whose timers live in the compiled closures
+        self.durations = False
+        self._tokens = _tokenize(condition)
+        self._pos = 0
+        if not self._tokens:
+            raise RuleError("Empty condition")
+        self._fn = self._expr()
+        if self._pos != len(self._tokens):
+            raise RuleError(f"Unexpected '{self._tokens[self._pos][1]}' in '{condition}'")
+        del self._tokens
+
+    def __call__(self, ctx):
+        return self._fn(ctx)
+
+    # --- parser -----------------------------------------------------------
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _take(self, kind=None, value=None):
+        tok_kind, tok_value = self._peek()
+        if tok_kind is None or (kind and tok_kind != kind) or (value and tok_value != value):
+            expected = value or kind or 'token'
+            raise RuleError(f"Expected {expected} in '{self.source}'")
+        self._pos += 1
+        return tok_value
+
+    def _keyword(self, word):
+        kind, value = self._peek()
+        if kind == 'name' and value == word:
+            self._pos += 1
+            return True
+        return False
+
+    def _expr(self):
+        parts = [self._and()]
+        while self._keyword('or'):
+            parts.append(self._and())
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            first, second = parts
+            return lambda ctx: first(ctx) or second(ctx)
+        return lambda ctx: any(part(ctx) for part in parts)
+
+    def _and(self):
+        parts = [self._not()]
+        while self._keyword('and'):
+            parts.append(self._not())
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            first, second = parts
+            return lambda ctx: first(ctx) and second(ctx)
+        return lambda ctx: all(part(ctx) for part in parts)
+
+    def _not(self):
+        if self._keyword('not'):
+            inner = self._not()
+            return lambda ctx: not inner(ctx)
+        return self._primary()
+
+    def _primary(self):
+        if self._peek() == ('punct', '('):
+            self._take()
+            fn = self._expr()
+            self._take('punct', ')')
+        else:
+            fn = self._comparison()
+        if self._keyword('for'):
+            self.durations = True
+            fn = self._sustained(fn, _parse_duration(self._take('duration')))
+        return fn
+
+    def _comparison(self):
+        left, left_const = self._operand()
+        op = OPERATORS[self._take('op')]
+        right, right_const = self._operand()
+
+        if isinstance(left, str) and right_const:
+            # Common case "metric OP number": one dict lookup, no nested calls
+            metric, number = left, right
+
+            def compare_metric(ctx):
+                value = ctx.values.get(metric)
+                return value is not None and op(value, number)
+            return compare_metric
+
+        left, right = self._as_callable(left, left_const), self._as_callable(right, right_const)
+
+        def compare(ctx):
+            a, b = left(ctx), right(ctx)
+            return a is not None and b is not None and op(a, b)
+        return compare
+
+    @staticmethod
+    def _as_callable(operand, is_const):
+        if is_const:
+            return lambda ctx: operand
+        if isinstance(operand, str):
+            return lambda ctx: ctx.values.get(operand)
+        return operand
+
+    def _operand(self):
+        """Returns (number, True), (metric name, False) or (callable, False)"""
+        kind, value = self._peek()
+        if kind == 'number':
+            self._pos += 1
+            return float(value), True
+        if kind == 'name' and value in FUNCTIONS:
+            return self._function(), False
+        if kind == 'name':
+            self._pos += 1
+            return self._metric(value), False
+        raise RuleError(f"Expected a metric or number in '{self.source}'")
+
+    def _function(self):
+        name = self._take('name')
+        self._take('punct', '(')
+        metric = self._metric(self._take('name'))
+        span = FUNCTIONS[name]
+        if self._peek() == ('punct', ','):
+            self._take()
+            span = _parse_duration(self._take('duration'))
+        self._take('punct', ')')
+        key = (metric, span)
+        self.windows.add(key)
+        method = getattr(Window, name)
+        return lambda ctx: method(ctx.windows[key])
+
+    def _metric(self, name):
+        metric = ALIASES.get(name, name)
+        if self.known_metrics is not None and metric not in self.known_metrics:
+            raise RuleError(f"Unknown metric '{name}' in '{self.source}'")
+        self.metrics.add(metric)
+        return metric
+
+    @staticmethod
+    def _sustained(fn, duration):
+        """True once fn has held continuously for `duration` seconds"""
+        state = {'since': None}
+
+        def sustained(ctx):
+            if not fn(ctx):
+                state['since'] = None
+                return False
+            if state['since'] is None:
+                state['since'] = ctx.now
+            return ctx.now - state['since'] >= duration
+        return sustained
+
+
+class RuleSet:
+    """
+    Rules compiled once into an evaluation plan.
+
+    Windows needed by avg()/rate() are deduplicated across rules and pushed
+    once per evaluate() call, so per-rule cost is a few closure calls.
+    """
+
+    def __init__(self, rules, known_metrics=KNOWN_METRICS):
+        self.rules = []
+        self._windows = {}
+        # Every metric some rule reads
+        self.metrics = set()
+        for rule in rules:
+            try:
+                compiled = CompiledCondition(rule["trigger"], known_metrics)
+            except RuleError as e:
+                raise RuleError(f"Rule '{rule.get('name', rule['trigger'])}': {e}") from None
+            self.metrics |= compiled.metrics
+            for key in compiled.windows:
+                self._windows.setdefault(key, Window(*key))
+            self.rules.append((rule, compiled))
+
+    def evaluate(self, flat_metrics: Dict[str, Any], now: float):
+        """Return the rules whose condition holds for this tick"""
+        for window in self._windows.values():
+            value = flat_metrics.get(window.metric)
+            if value is not None:
+                window.push(now, value)
+        ctx = RuleContext(flat_metrics, now, self._windows)
+        return [rule for rule, condition in self.rules if condition(ctx)]
+
+
+def threshold_limits(condition):
+    """
+    (metric, '>' or '<', limit) for every comparison of a metric, or of
+    avg(metric), against a number in a condition; '>' means the condition
+    moves towards firing as the metric rises. Used to schedule sampling
+    around the limits rules are waiting for; rate() comparisons are skipped.
+    """
+    tokens = _tokenize(condition)
+    limits = []
+    for i, (kind, value) in enumerate(tokens):
+        if kind != 'op' or value in ('==', '!='):
+            continue
+        rising = value.startswith('>')
+        if i + 1 < len(tokens) and tokens[i + 1][0] == 'number':
+            metric, limit = _compared_metric(tokens, i - 1, -1), float(tokens[i + 1][1])
+        elif i > 0 and tokens[i - 1][0] == 'number':
+            # "90 < cpu_percent" reads the other way round
+            metric, limit, rising = _compared_metric(tokens, i + 1, 1), float(tokens[i - 1][1]), not rising
+        else:
+            continue
+        if metric is not None:
+            limits.append((ALIASES.get(metric, metric), '>' if rising else '<', limit))
+    return limits
+
+
+def _compared_metric(tokens, i, step):
+    """Metric name at tokens[i], looking through an avg(...) call"""
+    if not 0 <= i < len(tokens):
+        return None
+    kind, value = tokens[i]
+    if kind == 'name' and value not in FUNCTIONS and value not in ('and', 'or', 'not'):
+        return value
+    if step < 0 and (kind, value) == ('punct', ')'):
+        # ... avg(metric[, duration]) OP number
+        while i >= 0 and tokens[i] != ('punct', '('):
+            i -= 1
+        if i >= 1 and tokens[i - 1] == ('name', 'avg'):
+            return tokens[i + 1][1]
+    elif step > 0 and (kind, value) == ('name', 'avg') and i + 2 < len(tokens):
+        return tokens[i + 2][1]
+    return None
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(condition: str) -> CompiledCondition:
+    return CompiledCondition(condition, known_metrics=None)
+
+
+def compile_condition(condition: str) -> CompiledCondition:
+    """
+    Compile a condition without metric validation. Stateless conditions are
+    cached; ones with 'for' clauses carry their own timers, so every call
+    gets a fresh compilation.
+    """
+    compiled = _compile_cached(condition)
+    if compiled.durations:
+        return CompiledCondition(condition, known_metrics=None)
+    return compiled
+
+
 def evaluate_condition(flat_metrics: Dict[str, Any], condition: str) -> bool:
     """
     Evaluates a condition against pre-flattened metrics dict.
     Example: "cpu_usage_percent > 80" with flat_metrics={"cpu_usage_percent": 90} -> True
-    
-    Supported operators: >, <, >=, <=, ==, !=
-    Note: Expects flat_metrics already processed by AutoFixEngine._flatten_metrics()
+
+    Supported operators: >, <, >=, <=, ==, !=, combined with and/or/not.
+    Stateless helper: windowed functions and 'for' durations need a RuleSet.
+    Note: Expects flat_metrics already processed by AutoFixEngine.flat_metrics()
     """
     try:
-        pattern = r'(\w+)\s*(>=|<=|==|!=|>|<)\s*([+-]?\d+\.?\d*)'
-        match = re.match(pattern, condition.strip())
-        
-        if not match:
-            logger.error(f"Invalid condition format: {condition}")
-            return False
-        
-        key, op_str, value_str = match.groups()
-        
-        if key not in flat_metrics:
-            logger.warning(f"Metric '{key}' not found in metrics")
-            return False
-        
-        metric_value = flat_metrics[key]
-        
-        try:
-            compare_value = float(value_str)
-        except ValueError:
-            logger.error(f"Invalid comparison value: {value_str}")
-            return False
-        
-        op_func = OPERATORS[op_str]
-        return op_func(metric_value, compare_value)
-        
+        compiled = compile_condition(condition)
+        if compiled.windows:
+            raise RuleError("avg()/rate() need a RuleSet with sample history")
+        if compiled.durations:
+            raise RuleError("'for' durations need a RuleSet with a clock")
+        return bool(compiled(RuleContext(flat_metrics, 0.0, {})))
     except Exception as e:
         logger.error(f"Error evaluating rule '{condition}': {e}")
         return False
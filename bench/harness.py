@@ -0,0 +1,125 @@
+"""
+Benchmark harness
+Times callables in repeated rounds, collects results as plain records and
+compares them against a stored baseline.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+
+RESULTS_VERSION = 1
+
+# Default regression tolerance: 15% slower (or less throughput) than baseline
+DEFAULT_THRESHOLD = 0.15
+
+
+class Skipped(Exception):
+    """A suite cannot run here (missing native build, port in use, ...)"""
+
+
+def result(name, value, unit, better='lower', **extra):
+    """One benchmark record; `better` says which direction is an improvement"""
+    record = {'name': name, 'value': value, 'unit': unit, 'better': better}
+    record.update(extra)
+    return record
+
+
+def measure(name, fn, rounds=5, min_time=0.2):
+    """
+    Per-call latency of fn() in microseconds. The call count per round is
+    calibrated so one round takes at least min_time; the reported value is
+    the median round, with the fastest and slowest alongside.
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    per_call = [t / number * 1e6 for t in timer.repeat(rounds, number)]
+    return result(name, statistics.median(per_call), 'us',
+                  min=min(per_call), max=max(per_call), calls=number * rounds)
+
+
+def throughput(name, fn, count, rounds=5, unit='ops/s'):
+    """Rate of fn(), which performs `count` operations per call"""
+    rates = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        rates.append(count / (time.perf_counter() - started))
+    return result(name, statistics.median(rates), unit, better='higher',
+                  min=min(rates), max=max(rates), calls=count * rounds)
+
+
+def environment():
+    """Host details stored with results; numbers only compare on like hosts"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'commit': commit,
+    }
+
+
+def report(results, skipped=None):
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': time.time(),
+        'environment': environment(),
+        'results': results,
+        'skipped': skipped or {},
+    }
+
+
+def load(path):
+    with open(path) as f:
+        doc = json.load(f)
+    if doc.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {doc.get('version')}")
+    return doc
+
+
+def save(doc, path):
+    with open(path, 'w') as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Match results to baseline records by name. Each comparison carries the
+    relative change (positive = better) and whether it is a regression
+    beyond `threshold`. Benchmarks missing on either side are left out.
+    """
+    previous = {r['name']: r for r in baseline['results']}
+    comparisons = []
+    for r in results:
+        base = previous.get(r['name'])
+        if base is None or not base['value'] or base['unit'] != r['unit']:
+            continue
+        change = (r['value'] - base['value']) / base['value']
+        if r['better'] == 'lower':
+            change = -change
+        comparisons.append({
+            'name': r['name'],
+            'unit': r['unit'],
+            'baseline': base['value'],
+            'value': r['value'],
+            'change': change,
+            'regression': change < -threshold,
+        })
+    return comparisons
@@ -0,0 +1,111 @@
+"""
+Web server load benchmarks
+Starts the native C server or the FastAPI fallback as a child process, then
+drives /health with keep-alive pollers and /ws with idle subscribers using
+the clients from scripts/loadtest.py.
+"""
+
+import asyncio
+import importlib.util
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from bench.harness import Skipped, result
+from scripts.loadtest import percentile, poller, subscriber
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NATIVE_SERVER = os.path.join(ROOT, "api", "native", "webserver")
+# The native server binds a fixed port; the fallback one next to it
+NATIVE_PORT = 8000
+FALLBACK_PORT = 8001
+HOST = "127.0.0.1"
+
+
+def _port_open(port):
+    with socket.socket() as s:
+        s.settimeout(0.2)
+        return s.connect_ex((HOST, port)) == 0
+
+
+def _start(command, port, timeout=15.0):
+    if _port_open(port):
+        raise Skipped(f"port {port} already in use")
+    proc = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise Skipped(f"{os.path.basename(command[0])} exited with status {proc.returncode}")
+        if _port_open(port):
+            return proc
+        time.sleep(0.1)
+    _stop(proc)
+    raise Skipped(f"server did not listen on port {port} within {timeout:.0f}s")
+
+
+def _stop(proc):
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def _health(port, settings):
+    stats = {"requests": 0, "errors": 0, "connect_errors": 0, "latencies": []}
+    deadline = time.monotonic() + settings.duration
+    started = time.monotonic()
+    await asyncio.gather(*(poller(HOST, port, 1, deadline, stats) for _ in range(settings.connections)))
+    stats["elapsed"] = time.monotonic() - started
+    return stats
+
+
+async def _fanout(port, settings):
+    stats = {"ws_bytes": 0, "ws_errors": 0}
+    deadline = time.monotonic() + settings.duration
+    started = time.monotonic()
+    await asyncio.gather(*(subscriber(HOST, port, deadline, stats) for _ in range(settings.websockets)))
+    stats["elapsed"] = time.monotonic() - started
+    return stats
+
+
+def _load(name, port, settings):
+    """Run the /health and /ws phases back to back against a started server"""
+    health = asyncio.run(_health(port, settings))
+    fanout = asyncio.run(_fanout(port, settings))
+    latencies = [t * 1e6 for t in health["latencies"]]
+    delivered = fanout["ws_bytes"] / fanout["elapsed"]
+    return [
+        result(f"{name}.health_throughput", health["requests"] / health["elapsed"], 'req/s',
+               better='higher', connections=settings.connections,
+               errors=health["errors"] + health["connect_errors"]),
+        result(f"{name}.health_p50", percentile(latencies, 0.5), 'us'),
+        result(f"{name}.health_p99", percentile(latencies, 0.99), 'us'),
+        result(f"{name}.ws_fanout", delivered / max(settings.websockets, 1), 'bytes/s',
+               better='higher', subscribers=settings.websockets, errors=fanout["ws_errors"]),
+    ]
+
+
+def native_suite(settings):
+    if not os.access(NATIVE_SERVER, os.X_OK):
+        raise Skipped("native web server not built (./scripts/buildnative.sh)")
+    proc = _start([NATIVE_SERVER], NATIVE_PORT)
+    try:
+        return _load("native_server", NATIVE_PORT, settings)
+    finally:
+        _stop(proc)
+
+
+def fallback_suite(settings):
+    if importlib.util.find_spec("uvicorn") is None:
+        raise Skipped("uvicorn not installed")
+    proc = _start([sys.executable, "-m", "uvicorn", "api.server:app_fallback", "--host", HOST,
+                   "--port", str(FALLBACK_PORT), "--log-level", "warning"], FALLBACK_PORT)
+    try:
+        return _load("fallback_server", FALLBACK_PORT, settings)
+    finally:
+        _stop(proc)
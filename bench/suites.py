@@ -0,0 +1,190 @@
+"""
+Benchmark suites
+Each suite takes a Settings and returns a list of harness records, or
+raises Skipped when what it measures is not available on this host.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+
+from bench.harness import Skipped, measure, report, throughput
+
+@dataclass(frozen=True)
+class Settings:
+    rounds: int = 5
+    min_time: float = 0.2
+    # Load phase length per server endpoint, in seconds
+    duration: float = 5.0
+    connections: int = 50
+    websockets: int = 100
+
+    @classmethod
+    def quick(cls):
+        return cls(rounds=3, min_time=0.05, duration=2.0, connections=20, websockets=20)
+
+
+# Fixed metrics document so storage and rule numbers do not depend on the host
+SAMPLE_DOC = {
+    "cpu": {"usage_percent": 42.5, "cores_logical": 8, "cores_physical": 4,
+            "load_avg_1": 1.5, "load_avg_5": 1.2, "load_avg_15": 0.9},
+    "memory": {"total_mb": 16000, "used_mb": 9000, "available_mb": 7000, "percent": 56.25},
+    "disk": {"total_gb": 500, "used_gb": 320, "free_gb": 180, "percent": 64.0},
+    "top_processes": [
+        {"pid": 1000 + i, "name": f"worker-{i}", "cpu_percent": 10.0 - i,
+         "memory_mb": 100 * (i + 1), "io_bytes_per_sec": 0}
+        for i in range(10)
+    ],
+}
+
+# Conditions covering comparisons, boolean operators and aliases
+CONDITIONS = (
+    "cpu_percent > 95",
+    "memory_percent > 90 and disk_percent > 90",
+    "not (cpu_load_avg_1 < 4 or memory_available_mb > 1000)",
+    "disk_free_gb <= 10",
+)
+
+
+def collector_suite(settings):
+    """
+    get_metrics_rust latency split into its stages: the native refresh, the
+    FFI call that returns the JSON document, decoding that document, and
+    building the shared Snapshot from it. The binary read path and the
+    end-to-end call are measured alongside for comparison.
+    """
+    from monitor.native_backend import get_collector, get_metrics_rust, use_native_backend
+    from monitor.snapshot import Snapshot
+
+    if not use_native_backend():
+        raise Skipped("native backend not built (./scripts/buildnative.sh)")
+    collector = get_collector()
+    collector.refresh()
+    data = collector.read_json_bytes(5)
+    doc = json.loads(data)
+
+    def read_binary():
+        sample = collector.read_into(5)
+        sample.to_dict(5)
+        collector.read_details()
+
+    opts = dict(rounds=settings.rounds, min_time=settings.min_time)
+    return [
+        measure("collector.refresh", collector.refresh, **opts),
+        measure("collector.ffi_read_json", lambda: collector.read_json_bytes(5), **opts),
+        measure("collector.json_decode", lambda: json.loads(data), **opts),
+        measure("collector.dict_build", lambda: Snapshot.from_raw(doc, 5), **opts),
+        measure("collector.read_binary", read_binary, **opts),
+        measure("collector.get_metrics_rust", lambda: get_metrics_rust(5), **opts),
+    ]
+
+
+def storage_suite(settings, samples=10000):
+    """
+    Sustained log_metrics write rate: samples go through a MetricsWriter
+    with the default batching into a scratch database, one per second of
+    simulated time so rollup buckets close as they would in production.
+    """
+    from storage.writer import MetricsWriter
+
+    directory = tempfile.mkdtemp(prefix="sysguard-bench-")
+    writer = MetricsWriter(db_path=os.path.join(directory, "bench.db"), flush_interval=float('inf'))
+    clock = [int(time.time()) - samples * (settings.rounds + 1)]
+
+    def write():
+        start = clock[0]
+        for ts in range(start, start + samples):
+            writer.add(42.5, 56.25, 64.0, ts)
+        writer.flush()
+        clock[0] = start + samples
+
+    try:
+        return [throughput("storage.log_metrics", write, samples, settings.rounds, unit='rows/s')]
+    finally:
+        writer.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def rules_suite(settings, calls=2000, ruleset_size=100):
+    """
+    Rule evaluation rate: the stateless evaluate_condition helper, a large
+    compiled RuleSet including windowed functions, and a dry-run
+    AutoFixEngine.run_check over a fixed snapshot.
+    """
+    from autofix.engine import AutoFixEngine
+    from autofix.rules import RuleSet, evaluate_condition
+    from monitor.snapshot import Snapshot
+
+    snapshot = Snapshot.from_raw(SAMPLE_DOC, 5)
+    engine = AutoFixEngine({"autofix": {"enabled": True, "dry_run": True, "rules": [
+        {"name": f"rule-{i}", "trigger": condition, "action": "notify"}
+        for i, condition in enumerate(CONDITIONS)
+    ]}})
+    # The same flattening run_check does
+    flat = engine.flat_metrics(snapshot)
+    ruleset = RuleSet([
+        {"name": f"rule-{i}", "action": "notify",
+         "trigger": f"avg(cpu_percent, 30s) > {i}" if i % 4 == 0 else CONDITIONS[i % len(CONDITIONS)]}
+        for i in range(ruleset_size)
+    ])
+    now = [time.time()]
+
+    def conditions():
+        for _ in range(calls // len(CONDITIONS)):
+            for condition in CONDITIONS:
+                evaluate_condition(flat, condition)
+
+    def ruleset_evaluate():
+        for _ in range(calls // ruleset_size):
+            now[0] += 1.0
+            ruleset.evaluate(flat, now[0])
+
+    def run_check():
+        for _ in range(calls):
+            engine.run_check(snapshot)
+
+    try:
+        return [
+            throughput("rules.evaluate_condition", conditions,
+                       calls // len(CONDITIONS) * len(CONDITIONS), settings.rounds, unit='conditions/s'),
+            throughput(f"rules.ruleset_evaluate_{ruleset_size}", ruleset_evaluate,
+                       calls // ruleset_size * ruleset_size, settings.rounds, unit='rules/s'),
+            throughput("rules.run_check", run_check, calls, settings.rounds, unit='checks/s'),
+        ]
+    finally:
+        engine.close()
+
+
+def native_server_suite(settings):
+    from bench.servers import native_suite
+    return native_suite(settings)
+
+
+def fallback_server_suite(settings):
+    from bench.servers import fallback_suite
+    return fallback_suite(settings)
+
+
+SUITES = {
+    "collector": collector_suite,
+    "storage": storage_suite,
+    "rules": rules_suite,
+    "native_server": native_server_suite,
+    "fallback_server": fallback_server_suite,
+}
+
+
+def run(names, settings, progress=None):
+    """Run the named suites in order and return a results document"""
+    results, skipped = [], {}
+    for name in names:
+        if progress:
+            progress(name)
+        try:
+            results.extend(SUITES[name](settings))
+        except Skipped as e:
+            skipped[name] = str(e)
+    return report(results, skipped)
@@ -0,0 +1,70 @@
+"""
+Configuration loading
+The parsed YAML is kept as JSON next to config/sysguard.yaml, tagged with
+the YAML file's mtime and size. Runs that find an up-to-date cache never
+import or run the YAML parser.
+"""
+
+import json
+import os
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../config/sysguard.yaml")
+
+_config_cache = {}
+
+
+def _cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.json")
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _read_cache(path, stamp):
+    try:
+        with open(_cache_path(path)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("stamp") != stamp:
+        return None
+    return cached.get("config")
+
+
+def _write_cache(path, stamp, config):
+    """Best effort: a read-only config directory just means no cache"""
+    try:
+        text = json.dumps({"stamp": stamp, "config": config})
+    except (TypeError, ValueError):
+        return
+    if json.loads(text)["config"] != config:
+        # Dates, non-string keys and the like do not survive JSON
+        return
+    cache = _cache_path(path)
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, cache)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def load_config(path=CONFIG_PATH):
+    """Load configuration, parsing the YAML only when it changed since the last run"""
+    if path not in _config_cache:
+        stamp = _stamp(path)
+        config = _read_cache(path, stamp)
+        if config is None:
+            import yaml
+            with open(path, "r") as f:
+                config = yaml.safe_load(f)
+            _write_cache(path, stamp, config)
+        _config_cache[path] = config
+    return _config_cache[path]
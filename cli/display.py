@@ -0,0 +1,46 @@
+"""
+Terminal output shared by CLI commands
+Kept free of click so run.py can serve `status` without loading the CLI.
+"""
+
+_console = None
+
+def get_console():
+    """The shared rich console, created on first output"""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+def build_metrics_table(cpu, mem, disk, title="System Status"):
+    """Build reusable metrics display table"""
+    from rich.table import Table
+    table = Table(title=title)
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="magenta")
+    table.add_row("CPU Usage", f"{cpu['usage_percent']}% ({cpu['cores_logical']} cores)")
+    table.add_row("Memory", f"{mem['used_mb']}MB / {mem['total_mb']}MB ({mem['percent']}%)")
+    if "error" not in disk:
+        table.add_row("Disk", f"{disk['used_gb']}GB / {disk['total_gb']}GB ({disk['percent']}%)")
+    else:
+        table.add_row("Disk", f"[red]{disk['error']}[/red]")
+    return table
+
+def fetch_all_metrics(snapshot=None):
+    """Fetch all metrics from one shared snapshot to reduce system overhead"""
+    from monitor.cpu import get_cpu_metrics
+    from monitor.memory import get_memory_metrics
+    from monitor.disk import get_disk_metrics
+    from monitor.snapshot import current_snapshot
+    snapshot = snapshot or current_snapshot()
+    return {
+        'cpu': get_cpu_metrics(snapshot),
+        'memory': get_memory_metrics(snapshot),
+        'disk': get_disk_metrics(snapshot=snapshot)
+    }
+
+def show_status():
+    """Print the system status table for one fresh snapshot"""
+    metrics = fetch_all_metrics()
+    get_console().print(build_metrics_table(metrics['cpu'], metrics['memory'], metrics['disk']))
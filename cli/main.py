@@ -1,105 +1,172 @@
+"""
+SysGuard command line
+Each command imports what it uses when it runs, so `run.py status` does not
+pay for rich's live display, the autofix engine, storage or YAML parsing.
+"""
 import click
-import yaml
 import os
-from rich.console import Console
-from rich.table import Table
-from rich.live import Live
-from rich.panel import Panel
-from monitor.cpu import get_cpu_metrics
-from monitor.memory import get_memory_metrics
-from monitor.disk import get_disk_metrics
-from monitor.process import get_process_metrics
-from autofix.engine import AutoFixEngine
-from storage.db import init_db, log_metrics, get_recent_alerts
-
-console = Console()
-_config_cache = None
-
-def load_config():
-    """Load configuration with caching to avoid repeated YAML parsing"""
-    global _config_cache
-    if _config_cache is None:
-        config_path = os.path.join(os.path.dirname(__file__), "../config/sysguard.yaml")
-        with open(config_path, "r") as f:
-            _config_cache = yaml.safe_load(f)
-    return _config_cache
-
-def build_metrics_table(cpu, mem, disk, title="System Status"):
-    """Build reusable metrics display table"""
-    table = Table(title=title)
-    table.add_column("Metric", style="cyan")
-    table.add_column("Value", style="magenta")
-    table.add_row("CPU Usage", f"{cpu['usage_percent']}% ({cpu['cores_logical']} cores)")
-    table.add_row("Memory", f"{mem['used_mb']}MB / {mem['total_mb']}MB ({mem['percent']}%)")
-    if "error" not in disk:
-        table.add_row("Disk", f"{disk['used_gb']}GB / {disk['total_gb']}GB ({disk['percent']}%)")
-    else:
-        table.add_row("Disk", f"[red]{disk['error']}[/red]")
-    return table
+from cli.config import load_config
+from cli.display import build_metrics_table, fetch_all_metrics, get_console, show_status
+from storage.rollup import METRICS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "../bench/baseline.json")
+BENCH_SUITES = ("collector", "storage", "rules", "native_server", "fallback_server")
 
-def fetch_all_metrics():
-    """Fetch all metrics in one call to reduce system overhead"""
-    return {
-        'cpu': get_cpu_metrics(),
-        'memory': get_memory_metrics(),
-        'disk': get_disk_metrics()
-    }
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_duration(text):
+    """Parse '90', '30m', '24h', '7d' into seconds"""
+    text = text.strip().lower()
+    if text and text[-1] in _DURATION_UNITS:
+        return float(text[:-1]) * _DURATION_UNITS[text[-1]]
+    return float(text)
 
 @click.group()
 def sysguard():
     """System Health & Auto-Fix Tool"""
-    init_db()
 
 @sysguard.command()
 def status():
     """Show system status snapshot"""
-    metrics = fetch_all_metrics()
-    console.print(build_metrics_table(metrics['cpu'], metrics['memory'], metrics['disk']))
+    show_status()
+
+_SORT_LABELS = {'cpu': "CPU", 'memory': "Memory", 'io': "IO", 'cgroup': "cgroup"}
 
 @sysguard.command()
-def top():
+@click.option("--by", "sort_by", type=click.Choice(list(_SORT_LABELS)), default="cpu",
+              help="Rank processes by CPU, memory or IO, or show cgroups ranked by CPU")
+@click.option("--wide", is_flag=True,
+              help="Also show threads, open files and command line; with --by cgroup, parent groups too")
+@click.option("--cgroup-root", help="cgroup v2 hierarchy for --by cgroup (default: monitoring.cgroups.root)")
+def top(sort_by, wide, cgroup_root):
     """Show top processes"""
-    procs = get_process_metrics(limit=10)
-    table = Table(title="Top Processes (by CPU)")
+    from rich.table import Table
+    from monitor.process import get_process_metrics
+    from monitor.snapshot import configure_sampler
+    if sort_by == 'cgroup':
+        return _top_cgroups(cgroup_root, wide)
+    if sort_by == 'io':
+        import time
+        # IO rates are measured between two refreshes
+        sampler = configure_sampler(track_io=True)
+        sampler.collect()
+        time.sleep(sampler.interval)
+    fields = ['pid', 'name', 'username', 'cpu_percent', 'memory_percent']
+    if sort_by == 'io':
+        fields.append('io_bytes_per_sec')
+    if wide:
+        fields += ['num_threads', 'num_fds', 'cmdline']
+    procs = get_process_metrics(limit=10, sort_by=sort_by, fields=fields)
+    table = Table(title=f"Top Processes (by {_SORT_LABELS[sort_by]})")
     table.add_column("PID", style="dim")
     table.add_column("Name", style="green")
     table.add_column("User")
     table.add_column("CPU %", justify="right")
     table.add_column("Mem %", justify="right")
+    if sort_by == 'io':
+        table.add_column("IO KB/s", justify="right")
+    if wide:
+        table.add_column("Threads", justify="right")
+        table.add_column("FDs", justify="right")
+        table.add_column("Command", overflow="fold")
     
     for p in procs:
-        table.add_row(
+        row = [
             str(p['pid']), 
             p['name'], 
             p['username'], 
             f"{p['cpu_percent']:.1f}", 
             f"{p['memory_percent']:.1f}"
+        ]
+        if sort_by == 'io':
+            row.append(f"{p['io_bytes_per_sec'] / 1024:.0f}")
+        if wide:
+            row += [str(p['num_threads'] if p['num_threads'] is not None else '-'),
+                    str(p['num_fds'] if p['num_fds'] is not None else '-'),
+                    p['cmdline'] or f"[{p['name']}]"]
+        table.add_row(*row)
+    get_console().print(table)
+
+def _top_cgroups(root, wide):
+    import time
+    from rich.table import Table
+    from monitor.cgroups import DEFAULT_ROOT, configure_cgroups, get_cgroup_metrics
+    from monitor.snapshot import configure_sampler
+    config = load_config()
+    configure_cgroups(config, root)
+    # CPU and IO rates are measured between two refreshes
+    sampler = configure_sampler(track_cgroups=True)
+    sampler.collect()
+    time.sleep(sampler.interval)
+    snapshot = sampler.collect()
+    groups = get_cgroup_metrics(limit=10, snapshot=snapshot, leaves_only=not wide)
+    if not groups:
+        root = root or (config.get('monitoring', {}).get('cgroups') or {}).get('root', DEFAULT_ROOT)
+        raise click.ClickException(f"No cgroup v2 groups found under {root}")
+    table = Table(title="Top cgroups (by CPU)" + ("" if wide else ", leaves only"))
+    table.add_column("cgroup", style="green", overflow="fold")
+    table.add_column("CPU %", justify="right")
+    table.add_column("Mem MB", justify="right")
+    table.add_column("Limit %", justify="right")
+    table.add_column("Read KB/s", justify="right")
+    table.add_column("Write KB/s", justify="right")
+    table.add_column("PIDs", justify="right")
+    for g in groups:
+        table.add_row(
+            g['path'],
+            f"{g['cpu_percent']:.1f}",
+            f"{g['memory_mb']:.0f}",
+            f"{g['memory_limit_percent']:.0f}" if g['memory_max_mb'] else "-",
+            f"{g['io_read_bytes_per_sec'] / 1024:.0f}",
+            f"{g['io_write_bytes_per_sec'] / 1024:.0f}",
+            str(g['pids']),
         )
-    console.print(table)
+    get_console().print(table)
 
 @sysguard.command()
 @click.option("--watch", is_flag=True, help="Keep running and updating")
 def monitor(watch):
     """Monitor system health with Autofix"""
+    from autofix.engine import AutoFixEngine
+    from monitor.scheduler import AdaptiveScheduler
+    from monitor.snapshot import configure_sampler
+    from monitor.cgroups import configure_cgroups
     config = load_config()
     engine = AutoFixEngine(config)
+    track_cgroups = configure_cgroups(config) or engine.needs_cgroups
+    sampler = configure_sampler(interval=config['monitoring']['interval'],
+                                full_process_table=engine.needs_process_table,
+                                scheduler=AdaptiveScheduler.from_config(config) if watch else None,
+                                track_cgroups=track_cgroups)
     
     if not watch:
-        alerts = engine.run_check()
-        status()
+        snapshot = sampler.collect()
+        alerts = engine.run_check(snapshot)
+        metrics = fetch_all_metrics(snapshot)
+        get_console().print(build_metrics_table(metrics['cpu'], metrics['memory'], metrics['disk']))
         if alerts:
-            console.print("[bold red]Autofix Alerts:[/bold red]\n" + "\n".join(f"- {a}" for a in alerts))
+            get_console().print("[bold red]Autofix Alerts:[/bold red]\n" + "\n".join(f"- {a}" for a in alerts))
+        engine.close()
         return
 
     # Live Watch Mode
     import time
-    with Live(console=console, refresh_per_second=1) as live:
+    from rich.live import Live
+    from rich.panel import Panel
+    from rich.table import Table
+    from monitor.process import get_process_metrics
+    from storage.writer import configure_writer
+    writer = configure_writer(config)
+    with Live(console=get_console(), refresh_per_second=1) as live:
         while True:
-            metrics = fetch_all_metrics()
+            started = time.monotonic()
+            # One collection per tick, shared by display, storage and autofix
+            snapshot = sampler.collect()
+            metrics = fetch_all_metrics(snapshot)
             cpu, mem, disk = metrics['cpu'], metrics['memory'], metrics['disk']
             
-            log_metrics(cpu['usage_percent'], mem['percent'], disk.get('percent', 0))
-            alerts = engine.run_check()
+            writer.add_snapshot(snapshot)
+            alerts = engine.run_check(snapshot)
             
             table = Table(title="Live System Monitor")
             table.add_column("Metric")
@@ -107,12 +174,24 @@ def monitor(watch):
             table.add_row("CPU", f"{cpu['usage_percent']:.1f}%")
             table.add_row("Memory", f"{mem['percent']:.1f}%")
             table.add_row("Disk", f"{disk.get('percent', 0):.1f}%")
+            if sampler.scheduler:
+                metric, closeness = sampler.scheduler.closest
+                nearest = f" ({metric} at {closeness:.0%} of limit)" if metric else ""
+                table.add_row("Sampling", f"every {sampler.next_interval():.1f}s{nearest}")
             
             proc_table = Table(title="Top Processes")
             proc_table.add_column("Name")
             proc_table.add_column("CPU%")
-            for p in get_process_metrics(limit=5):
+            for p in get_process_metrics(limit=5, snapshot=snapshot):
                 proc_table.add_row(p['name'], f"{p['cpu_percent']:.1f}")
+            if track_cgroups:
+                from monitor.cgroups import get_cgroup_metrics
+                cgroup_table = Table(title="Top cgroups")
+                cgroup_table.add_column("cgroup")
+                cgroup_table.add_column("CPU%")
+                cgroup_table.add_column("Mem MB")
+                for g in get_cgroup_metrics(limit=5, snapshot=snapshot):
+                    cgroup_table.add_row(g['path'], f"{g['cpu_percent']:.1f}", f"{g['memory_mb']:.0f}")
                 
             alert_panel = Panel(
                 "\n".join(alerts) if alerts else "No active alerts",
@@ -123,14 +202,44 @@ def monitor(watch):
             grid = Table.grid()
             grid.add_row(table)
             grid.add_row(proc_table)
+            if track_cgroups:
+                grid.add_row(cgroup_table)
             grid.add_row(alert_panel)
             
             live.update(grid)
-            time.sleep(config['monitoring']['interval'])
+            time.sleep(max(0.0, sampler.next_interval() - (time.monotonic() - started)))
 
 @sysguard.command()
-def history():
-    """Show alert history"""
+@click.option("--metric", type=click.Choice(METRICS), help="Show metric history instead of alerts")
+@click.option("--since", default="1h", help="How far back to look, e.g. 30m, 24h, 7d")
+@click.option("--until", "until_", default="0", help="End of range as an age, e.g. 1h (default: now)")
+@click.option("--resolution", type=click.Choice(['auto', 'raw', '1m', '1h']), default='auto')
+def history(metric, since, until_, resolution):
+    """Show alert history, or metric history with --metric"""
+    from rich.table import Table
+    from storage.db import get_recent_alerts, query_metrics, choose_resolution
+    if metric:
+        import time
+        from storage.archive import archive_dir
+        config = load_config()
+        retention = config.get('storage', {}).get('retention')
+        now = time.time()
+        start, end = now - parse_duration(since), now - parse_duration(until_)
+        if resolution == 'auto':
+            resolution = choose_resolution(start, end, retention)
+        rows = query_metrics(metric, start, end, resolution, archive_dir(config), retention)
+        table = Table(title=f"{metric} history ({resolution}, {len(rows)} points)")
+        table.add_column("Time", style="dim")
+        table.add_column("Avg", justify="right")
+        table.add_column("Min", justify="right")
+        table.add_column("Max", justify="right")
+        table.add_column("P95", justify="right")
+        for ts, avg, lo, hi, p95 in rows:
+            table.add_row(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+                          f"{avg:.1f}", f"{lo:.1f}", f"{hi:.1f}", f"{p95:.1f}")
+        get_console().print(table)
+        return
+
     alerts = get_recent_alerts()
     table = Table(title="Alert History")
     table.add_column("Time", style="dim")
@@ -139,7 +248,320 @@ def history():
     
     for a in alerts:
         table.add_row(a[0], a[1], a[2])
+    get_console().print(table)
+
+@sysguard.group()
+def archive():
+    """Columnar archive of old raw samples"""
+
+@archive.command()
+@click.option("--older-than", default="1h", help="Archive raw rows older than this age")
+def compact(older_than):
+    """Move old raw samples from SQLite into archive segments"""
+    import time
+    from storage.archive import archive_dir, compact as compact_rows
+    from storage.db import get_db_connection, init_db
+    init_db()
+    with get_db_connection() as conn:
+        with conn:
+            moved = compact_rows(conn, time.time() - parse_duration(older_than), archive_dir(load_config()))
+    get_console().print(f"[green]Archived {moved} samples[/green]")
+
+@archive.command()
+@click.option("--since", default="30d", help="How far back to look")
+def summary(since):
+    """Aggregate archived samples over a range"""
+    import time
+    from rich.table import Table
+    from storage.archive import ArchiveReader, archive_dir
+    now = time.time()
+    reader = ArchiveReader(archive_dir(load_config()))
+    table = Table(title=f"Archive summary (last {since})")
+    for column in ("Metric", "Samples", "Min", "Avg", "Max", "P95"):
+        table.add_column(column, justify="left" if column == "Metric" else "right")
+    for metric in METRICS:
+        stats = reader.aggregate(metric, now - parse_duration(since), now)
+        if not stats["count"]:
+            table.add_row(metric, "0", "-", "-", "-", "-")
+            continue
+        table.add_row(metric, str(stats["count"]), f"{stats['min']:.1f}", f"{stats['avg']:.1f}",
+                      f"{stats['max']:.1f}", f"{stats['p95']:.1f}")
+    reader.close()
+    get_console().print(table)
+
+@archive.command()
+@click.argument("output", type=click.File("w"))
+@click.option("--since", default="30d", help="How far back to export")
+def export(output, since):
+    """Export archived samples as CSV"""
+    import time
+    from storage.archive import ArchiveReader, archive_dir
+    now = time.time()
+    reader = ArchiveReader(archive_dir(load_config()))
+    rows = reader.export_csv(output, now - parse_duration(since), now)
+    reader.close()
+    get_console().print(f"[green]Exported {rows} samples[/green]")
+
+@sysguard.command()
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--interval", type=float, help="Seconds between snapshots (default: monitoring.interval)")
+@click.option("--duration", help="Stop after this long, e.g. 1h, 7d (default: until ^C)")
+@click.option("--processes/--no-processes", default=None,
+              help="Record the whole process table (default: when process_rules are configured)")
+@click.option("--cgroups/--no-cgroups", default=None,
+              help="Record per-cgroup usage (default: when cgroups or cgroup_rules are configured)")
+def record(output, interval, duration, processes, cgroups):
+    """Append snapshots to a recording for `replay`"""
+    import time
+    from monitor.cgroups import configure_cgroups
+    from monitor.snapshot import configure_sampler
+    from storage.recording import SnapshotRecorder
+    config = load_config()
+    autofix_cfg = config.get('autofix', {})
+    track_cgroups = configure_cgroups(config)
+    if processes is None:
+        processes = bool(autofix_cfg.get('process_rules'))
+    if cgroups is None:
+        cgroups = track_cgroups or bool(autofix_cfg.get('cgroup_rules'))
+    sampler = configure_sampler(interval=interval or config['monitoring']['interval'],
+                                full_process_table=processes, track_cgroups=cgroups)
+    stop_at = time.monotonic() + parse_duration(duration) if duration else None
+    get_console().print(f"Recording to {output} every {sampler.interval}s (^C to stop)")
+    recorder = SnapshotRecorder(output)
+    try:
+        while stop_at is None or time.monotonic() < stop_at:
+            started = time.monotonic()
+            recorder.add(sampler.collect())
+            time.sleep(max(0.0, sampler.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+    size = os.path.getsize(output)
+    get_console().print(f"[green]Recorded {recorder.records} snapshots, {size / 1024:.0f} KB in total[/green]")
+
+@sysguard.command()
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.option("--config", "config_path", type=click.Path(exists=True, dir_okay=False),
+              help="Configuration whose autofix rules to test (default: the current one)")
+@click.option("--start", type=click.DateTime(), help="Replay from this local time")
+@click.option("--end", type=click.DateTime(), help="Replay up to this local time")
+@click.option("--timeline", "timeline", type=int, default=0,
+              help="Also list the first N actions that would have run")
+def replay(recording, config_path, start, end, timeline):
+    """Backtest autofix rules against a recording, in dry run"""
+    import time
+    from rich.table import Table
+    from autofix.replay import replay as run_replay
+
+    def when(ts):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)) if ts is not None else "-"
+
+    config = load_config(config_path) if config_path else load_config()
+    try:
+        report = run_replay(config, recording, start.timestamp() if start else None,
+                            end.timestamp() if end else None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    console = get_console()
+    if not report.snapshots:
+        raise click.ClickException(f"No snapshots in {recording} for that range")
+    span = report.end - report.start
+    console.print(f"Replayed {report.snapshots} snapshots from {when(report.start)} to {when(report.end)} "
+                  f"({span / 3600:.1f}h) in {report.elapsed:.2f}s, "
+                  f"{report.snapshots / max(report.elapsed, 1e-9):,.0f} snapshots/s "
+                  f"({span / max(report.elapsed, 1e-9):,.0f}x real time)")
+
+    table = Table(title="Rules")
+    table.add_column("Rule", style="green")
+    table.add_column("Action")
+    table.add_column("Matches", justify="right")
+    table.add_column("Would run", justify="right")
+    table.add_column("Skipped")
+    table.add_column("First", style="dim")
+    table.add_column("Last", style="dim")
+    table.add_column("Top targets")
+    for rule in report.rules.values():
+        table.add_row(
+            rule.name, rule.action, str(rule.matches), str(rule.runs),
+            ", ".join(f"{reason} {n}" for reason, n in rule.skipped.most_common()) or "-",
+            when(rule.first), when(rule.last),
+            ", ".join(f"{target} x{n}" for target, n in rule.targets.most_common(3)) or "-",
+        )
     console.print(table)
+    kinds = {rule.kind for rule in report.rules.values()}
+    if 'process' in kinds and not report.with_process_table:
+        console.print("[yellow]The recording has no process tables; process rules could not match. "
+                      "Record with --processes.[/yellow]")
+    if 'cgroup' in kinds and not report.with_cgroups:
+        console.print("[yellow]The recording has no cgroup usage; cgroup rules could not match. "
+                      "Record with --cgroups.[/yellow]")
+
+    if timeline:
+        events = Table(title=f"Actions that would have run ({min(timeline, len(report.events))} "
+                             f"of {len(report.events)})")
+        events.add_column("Time", style="dim")
+        events.add_column("Rule", style="green")
+        events.add_column("Action")
+        events.add_column("Target")
+        for ts, name, action, target in report.events[:timeline]:
+            events.add_row(when(ts), name, action, target or "-")
+        console.print(events)
+
+@sysguard.command()
+@click.option("--url", default="http://127.0.0.1:8000/metrics", show_default=True,
+              help="/metrics endpoint of a running server")
+@click.option("--local", "samples", type=int, default=0,
+              help="Instead, take this many samples in-process and report their cost")
+@click.option("--raw", is_flag=True, help="Print the Prometheus text as-is")
+def stats(url, samples, raw):
+    """Show SysGuard's own overhead (sampling, FFI, storage, rules, websockets)"""
+    import time
+    from rich.table import Table
+    from monitor import selfstats
+    if samples > 0:
+        from autofix.engine import AutoFixEngine
+        from monitor.cgroups import configure_cgroups
+        from monitor.snapshot import configure_sampler
+        config = load_config()
+        engine = AutoFixEngine(config)
+        sampler = configure_sampler(full_process_table=engine.needs_process_table,
+                                    track_cgroups=configure_cgroups(config) or engine.needs_cgroups)
+        for i in range(samples):
+            engine.run_check(sampler.collect())
+            if i + 1 < samples:
+                time.sleep(sampler.interval)
+        engine.close()
+        text = selfstats.render()
+        source = f"this process, {samples} samples"
+    else:
+        import urllib.error
+        import urllib.request
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                text = response.read().decode('utf-8')
+        except (urllib.error.URLError, OSError) as e:
+            raise click.ClickException(f"Could not read {url}: {e}. Is the server running? "
+                                       "Use --local N to measure in-process instead.")
+        source = url
+    if raw:
+        click.echo(text, nl=False)
+        return
+
+    metrics = selfstats.parse(text)
+    timings = Table(title=f"Timings ({source})")
+    for column in ("Metric", "Count", "Mean", "P50 ≤", "P99 ≤"):
+        timings.add_column(column, justify="left" if column == "Metric" else "right")
+    values = Table(title="Counters and gauges")
+    values.add_column("Metric")
+    values.add_column("Value", justify="right")
+    fmt = lambda seconds: "-" if seconds is None else f"{seconds * 1000:.3f}ms"
+    for name, metric in metrics.items():
+        if metric['type'] == 'histogram':
+            count, mean, p50, p99 = selfstats.summarize(name, metric)
+            timings.add_row(name, str(count), fmt(mean), fmt(p50), fmt(p99))
+        else:
+            for sample, value in metric['samples'].items():
+                values.add_row(sample, f"{value:,.0f}" if value == int(value) else f"{value:,.3f}")
+    get_console().print(timings)
+    get_console().print(values)
+
+@sysguard.command()
+@click.option("--suite", "suites", multiple=True, type=click.Choice(BENCH_SUITES),
+              help="Suite to run; repeat for several (default: all)")
+@click.option("--quick", is_flag=True, help="Fewer, shorter rounds")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write results as JSON ('-' for stdout)")
+@click.option("--baseline", type=click.Path(dir_okay=False), default=DEFAULT_BASELINE, show_default=True,
+              help="Results file to compare against")
+@click.option("--save-baseline", is_flag=True, help="Store these results as the new baseline")
+@click.option("--threshold", type=float, default=0.15, show_default=True,
+              help="Relative slowdown reported as a regression")
+@click.pass_context
+def bench(ctx, suites, quick, output, baseline, save_baseline, threshold):
+    """Run the benchmark suites and compare against a baseline"""
+    import json
+    from rich.table import Table
+    from bench import harness
+    from bench.suites import Settings, run
+    quiet = output == '-'
+    settings = Settings.quick() if quick else Settings()
+    progress = None if quiet else lambda name: get_console().print(f"[dim]Running {name}...[/dim]")
+    doc = run(suites or BENCH_SUITES, settings, progress)
+
+    comparisons = []
+    if os.path.exists(baseline) and not save_baseline:
+        base = harness.load(baseline)
+        comparisons = harness.compare(doc["results"], base, threshold)
+        doc["baseline"] = {"path": baseline, "environment": base["environment"],
+                           "threshold": threshold, "comparisons": comparisons}
+        if base["environment"].get("host") != doc["environment"]["host"] and not quiet:
+            get_console().print(f"[yellow]Baseline was recorded on {base['environment'].get('host')}; "
+                          f"numbers may not be comparable[/yellow]")
+
+    if quiet:
+        click.echo(json.dumps(doc, indent=2, sort_keys=True))
+    else:
+        changes = {c["name"]: c for c in comparisons}
+        table = Table(title="Benchmarks")
+        for column in ("Benchmark", "Value", "Unit", "Baseline", "Change"):
+            table.add_column(column, justify="left" if column in ("Benchmark", "Unit") else "right")
+        for r in doc["results"]:
+            c = changes.get(r["name"])
+            if c is None:
+                table.add_row(r["name"], f"{r['value']:,.2f}", r["unit"], "-", "-")
+                continue
+            style = "red" if c["regression"] else "green" if c["change"] > threshold else ""
+            change = f"{c['change'] * 100:+.1f}%"
+            table.add_row(r["name"], f"{r['value']:,.2f}", r["unit"], f"{c['baseline']:,.2f}",
+                          f"[{style}]{change}[/{style}]" if style else change)
+        get_console().print(table)
+        for name, reason in doc["skipped"].items():
+            get_console().print(f"[yellow]Skipped {name}: {reason}[/yellow]")
+        if output:
+            harness.save(doc, output)
+            get_console().print(f"[green]Results written to {output}[/green]")
+
+    if save_baseline:
+        harness.save(doc, baseline)
+        if not quiet:
+            get_console().print(f"[green]Baseline saved to {baseline}[/green]")
+    regressions = [c["name"] for c in comparisons if c["regression"]]
+    if regressions:
+        if not quiet:
+            get_console().print(f"[red]{len(regressions)} regression(s) beyond {threshold:.0%}: "
+                          f"{', '.join(regressions)}[/red]")
+        ctx.exit(1)
+
+@sysguard.command()
+@click.option("--server", help="Aggregator address as host:port (default: fleet.server)")
+@click.option("--name", help="Name this host reports as (default: hostname)")
+@click.option("--interval", type=float, help="Seconds between samples (default: monitoring.interval)")
+def agent(server, name, interval):
+    """Stream this host's metrics to a fleet aggregator"""
+    import logging
+    from fleet.agent import Agent
+    config = load_config()
+    fleet = config.get('fleet', {})
+    logging.basicConfig(level=config.get('logging', {}).get('level', 'INFO'),
+                        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    worker = Agent(server or fleet.get('server', "127.0.0.1"), name=name,
+                   interval=interval or config['monitoring']['interval'],
+                   buffer_size=fleet.get('buffer_size', 3600))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.close()
+    get_console().print(f"[green]Agent stopped: {worker.acked} samples delivered, "
+                        f"{worker.pending} pending, {worker.dropped} dropped[/green]")
+
+@sysguard.command()
+@click.option("--host", default="0.0.0.0", help="Host to bind the HTTP side to")
+@click.option("--port", default=8100, help="Port for /fleet, /fleet/history and /ws")
+def aggregator(host, port):
+    """Collect metrics from fleet agents (agents connect to fleet.listen)"""
+    import uvicorn
+    get_console().print(f"[green]Starting SysGuard fleet aggregator at http://{host}:{port}/fleet[/green]")
+    uvicorn.run("api.fleet:app_fleet", host=host, port=port, reload=False)
 
 @sysguard.command()
 @click.option("--host", default="0.0.0.0", help="Host to bind")
@@ -147,7 +569,7 @@ def history():
 def web(host, port):
     """Start the Web Dashboard"""
     import uvicorn
-    console.print(f"[green]Starting SysGuard Web Dashboard at http://{host}:{port}[/green]")
+    get_console().print(f"[green]Starting SysGuard Web Dashboard at http://{host}:{port}[/green]")
     uvicorn.run("api.server:app", host=host, port=port, reload=False)
 
 if __name__ == "__main__":
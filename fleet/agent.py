@@ -0,0 +1,210 @@
+"""
+Fleet agent
+Samples this host with the shared native collector and streams compact
+binary samples to an aggregator. Samples wait in a bounded local buffer
+until the aggregator acknowledges them, so an outage or restart on the
+aggregator side costs no data as long as the buffer holds.
+"""
+
+import logging
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+from fleet import wire
+
+logger = logging.getLogger("sysguard.fleet")
+
+DEFAULT_PORT = 9400
+
+
+def parse_address(text, default_port=DEFAULT_PORT):
+    """'host', 'host:port' or ':port' -> (host, port)"""
+    host, _, port = text.rpartition(':') if ':' in text else (text, '', '')
+    return host or '127.0.0.1', int(port) if port else default_port
+
+
+def native_source():
+    """
+    Sample callable backed by the native collector. Only the subsystems the
+    wire format carries are refreshed; the process table is skipped.
+    """
+    from monitor.native_backend import (
+        REFRESH_CPU, REFRESH_DISK, REFRESH_MEMORY, REFRESH_NETWORK, get_collector,
+    )
+    collector = get_collector()
+    flags = REFRESH_CPU | REFRESH_MEMORY | REFRESH_DISK | REFRESH_NETWORK
+
+    def sample():
+        collector.refresh(flags)
+        m = collector.read_into(0).metrics
+        network = collector.read_details()['network'].values()
+        return wire.Sample(
+            time.time(), m.cpu_usage_percent, m.mem_percent, m.disk_percent,
+            m.load_avg_1, m.load_avg_5, m.load_avg_15,
+            sum(n['rx_bytes_per_sec'] for n in network), sum(n['tx_bytes_per_sec'] for n in network),
+            m.mem_used_mb, m.mem_total_mb, m.disk_used_gb, m.disk_total_gb, m.cores_logical,
+        )
+
+    return sample
+
+
+class Agent:
+    """
+    Samples every interval and ships buffered samples to the aggregator.
+
+    Up to batch_size samples go in one SAMPLES frame and at most
+    max_in_flight frames wait for an ACK at a time, so a backlog built up
+    during an outage drains over a few ticks instead of in one burst.
+    Unacknowledged frames are resent after a reconnect; the aggregator
+    ignores samples it already stored. A connection that leaves frames
+    unacknowledged for ack_timeout seconds is dropped and redialled. When
+    buffer_size samples are waiting, the oldest are dropped. Reconnects
+    back off exponentially up to max_backoff seconds.
+    """
+
+    def __init__(self, server, name=None, interval=1.0, source=None, buffer_size=3600,
+                 batch_size=60, max_in_flight=8, max_backoff=30.0, timeout=5.0, ack_timeout=30.0):
+        self.address = parse_address(server) if isinstance(server, str) else server
+        self.name = name or socket.gethostname()
+        self.interval = interval
+        self.source = source
+        self.buffer_size = buffer_size
+        self.batch_size = min(batch_size, wire.MAX_BATCH)
+        self.max_in_flight = max_in_flight
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.ack_timeout = ack_timeout
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self._buffer = deque()
+        # seq -> samples of frames sent but not yet acknowledged
+        self._unacked = {}
+        self._seq = 0
+        # When the oldest unacknowledged frame was sent, or last acked
+        self._waiting_since = None
+        self._sock = None
+        self._inbox = bytearray()
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self._stop = threading.Event()
+
+    @property
+    def pending(self):
+        """Samples not yet acknowledged by the aggregator"""
+        return len(self._buffer) + sum(len(s) for s in self._unacked.values())
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def add(self, sample):
+        """Queue one sample, dropping the oldest when the buffer is full"""
+        if self.pending >= self.buffer_size and self._buffer:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(sample)
+
+    def tick(self):
+        """Take one sample and ship what the connection allows"""
+        self.add(self.source())
+        self.pump()
+
+    def pump(self):
+        if self._sock is None and not self._connect():
+            return
+        try:
+            self._read_acks()
+            if self._unacked and time.monotonic() - self._waiting_since > self.ack_timeout:
+                raise TimeoutError(f"no ACK for {self.ack_timeout:.0f}s")
+            while self._buffer and len(self._unacked) < self.max_in_flight:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._seq = (self._seq + 1) & 0xFFFFFFFF
+                if not self._unacked:
+                    self._waiting_since = time.monotonic()
+                self._unacked[self._seq] = batch
+                self._sock.sendall(wire.encode_samples(self._seq, batch))
+                self.sent += len(batch)
+        except (OSError, wire.ProtocolError) as e:
+            logger.warning(f"Lost aggregator {self.address[0]}:{self.address[1]}: {e}")
+            self._disconnect()
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        try:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(wire.encode_hello(self.name, self.interval))
+        except OSError as e:
+            self._backoff = min(self.max_backoff, max(self.interval, self._backoff * 2))
+            self._next_attempt = now + self._backoff
+            logger.debug(f"Aggregator unreachable ({e}), retrying in {self._backoff:.0f}s")
+            return False
+        logger.info(f"Connected to aggregator {self.address[0]}:{self.address[1]}")
+        self._sock = sock
+        self._backoff = 0.0
+        return True
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        self._inbox.clear()
+        # Whatever was in flight goes back to the front of the queue, oldest first
+        if self._unacked:
+            resend = [s for seq in self._unacked for s in self._unacked[seq]]
+            self._unacked.clear()
+            self._buffer.extendleft(reversed(resend))
+            while len(self._buffer) > self.buffer_size:
+                self._buffer.popleft()
+                self.dropped += 1
+        self._backoff = self.interval
+        self._next_attempt = time.monotonic() + self._backoff
+
+    def _read_acks(self):
+        while select.select([self._sock], [], [], 0)[0]:
+            data = self._sock.recv(4096)
+            if not data:
+                raise ConnectionResetError("aggregator closed the connection")
+            self._inbox += data
+            for kind, payload in wire.split_frames(self._inbox):
+                if kind == wire.ACK:
+                    batch = self._unacked.pop(wire.decode_ack(payload), None)
+                    if batch is not None:
+                        self.acked += len(batch)
+                        self._waiting_since = time.monotonic()
+
+    def run(self):
+        """Sample and ship every interval until stop()"""
+        if self.source is None:
+            self.source = native_source()
+        logger.info(f"Agent '{self.name}' reporting to {self.address[0]}:{self.address[1]} "
+                    f"every {self.interval}s")
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Agent tick failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._read_acks()
+            except (OSError, wire.ProtocolError):
+                pass
+            self._sock.close()
+            self._sock = None
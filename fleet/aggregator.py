@@ -0,0 +1,245 @@
+"""
+Fleet aggregator
+Accepts agent connections on one asyncio TCP server, batches every host's
+samples into the storage layer and keeps the latest sample per host for
+the fleet overview and its websocket feed.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fleet import wire
+from monitor import selfstats
+
+logger = logging.getLogger("sysguard.fleet")
+
+# A host that has not reported for this many of its intervals is offline
+OFFLINE_INTERVALS = 3
+HELLO_TIMEOUT = 10.0
+
+_SAMPLES = selfstats.counter("sysguard_fleet_samples_total", "Samples received from agents")
+_INGEST_SECONDS = selfstats.histogram(
+    "sysguard_fleet_ingest_seconds", "Time writing one batch of fleet samples")
+_PROTOCOL_ERRORS = selfstats.counter(
+    "sysguard_fleet_protocol_errors_total", "Agent connections dropped for malformed frames")
+
+
+class HostState:
+    __slots__ = ('name', 'interval', 'latest', 'last_seen', 'connections', 'samples', 'peer')
+
+    def __init__(self, name):
+        self.name = name
+        self.interval = 1.0
+        self.latest = None
+        self.last_seen = 0.0
+        self.connections = 0
+        self.samples = 0
+        self.peer = None
+
+    def online(self, now):
+        return self.connections > 0 and now - self.last_seen <= OFFLINE_INTERVALS * self.interval
+
+    def to_dict(self, now):
+        s = self.latest
+        doc = {"host": self.name, "online": self.online(now), "peer": self.peer,
+               "interval": self.interval, "last_seen": s.timestamp if s else None,
+               "samples": self.samples}
+        if s is not None:
+            doc.update({
+                "cpu_percent": s.cpu_percent,
+                "memory_percent": s.memory_percent,
+                "disk_percent": s.disk_percent,
+                "load_avg": [s.load_avg_1, s.load_avg_5, s.load_avg_15],
+                "rx_bytes_per_sec": s.rx_bytes_per_sec,
+                "tx_bytes_per_sec": s.tx_bytes_per_sec,
+                "memory_used_mb": s.memory_used_mb,
+                "memory_total_mb": s.memory_total_mb,
+                "disk_used_gb": s.disk_used_gb,
+                "disk_total_gb": s.disk_total_gb,
+                "cores_logical": s.cores_logical,
+            })
+        return doc
+
+
+class Aggregator:
+    """
+    Fleet ingest server.
+
+    Connections only decode frames and append rows; one flush task writes
+    them to the store every flush_interval seconds, or sooner once
+    batch_size rows are waiting, on a single writer thread. A batch is
+    acknowledged to its agent after the transaction holding it commits.
+
+    The overview is rebuilt and serialized once per publish_interval and
+    shared by every feed subscriber through one-slot queues, so a slow
+    subscriber skips updates rather than delaying the others.
+    """
+
+    def __init__(self, store, host="0.0.0.0", port=9400, batch_size=5000, flush_interval=1.0,
+                 publish_interval=1.0):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.publish_interval = publish_interval
+        self.hosts = {}
+        self.payload = None
+        self._rows = []
+        # (writer, seq) of batches in self._rows, acknowledged after the flush
+        self._acks = []
+        self._flush_due = None
+        self._subscribers = set()
+        self._connections = set()
+        self._server = None
+        self._tasks = []
+        self._writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sysguard-fleet")
+        selfstats.gauge("sysguard_fleet_agents", "Connected agents",
+                        lambda: sum(h.connections for h in self.hosts.values()))
+
+    async def start(self):
+        self._flush_due = asyncio.Event()
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._flush_loop()), loop.create_task(self._publish_loop())]
+        logger.info(f"Fleet aggregator listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections:
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+        self._writer_thread.shutdown()
+
+    async def _serve(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        state = None
+        self._connections.add(writer)
+        try:
+            kind, payload = await asyncio.wait_for(self._read_frame(reader), HELLO_TIMEOUT)
+            if kind != wire.HELLO:
+                raise wire.ProtocolError("expected HELLO")
+            name, interval = wire.decode_hello(payload)
+            state = self.hosts.get(name)
+            if state is None:
+                state = self.hosts[name] = HostState(name)
+            state.interval = interval or 1.0
+            state.connections += 1
+            state.peer = peer[0] if peer else None
+            logger.info(f"Agent '{name}' connected from {state.peer}")
+            while True:
+                kind, payload = await self._read_frame(reader)
+                if kind == wire.SAMPLES:
+                    self._ingest(state, writer, *wire.decode_samples(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+            pass
+        except wire.ProtocolError as e:
+            _PROTOCOL_ERRORS.inc()
+            logger.warning(f"Dropping agent at {peer}: {e}")
+        finally:
+            self._connections.discard(writer)
+            if state is not None:
+                state.connections -= 1
+                logger.info(f"Agent '{state.name}' disconnected")
+            writer.close()
+
+    async def _read_frame(self, reader):
+        kind, length = wire.decode_header(await reader.readexactly(wire.HEADER.size))
+        return kind, await reader.readexactly(length)
+
+    def _ingest(self, state, writer, seq, samples):
+        name = state.name
+        self._rows.extend(
+            (name, int(s.timestamp), s.cpu_percent, s.memory_percent, s.disk_percent,
+             s.load_avg_1, s.rx_bytes_per_sec, s.tx_bytes_per_sec)
+            for s in samples
+        )
+        self._acks.append((writer, seq))
+        if samples:
+            # A resent backlog can arrive after newer samples
+            newest = max(samples, key=lambda s: s.timestamp)
+            if state.latest is None or newest.timestamp >= state.latest.timestamp:
+                state.latest = newest
+            state.samples += len(samples)
+        state.last_seen = time.time()
+        _SAMPLES.inc(len(samples))
+        if len(self._rows) >= self.batch_size:
+            self._flush_due.set()
+
+    async def flush(self):
+        """Write queued rows, then acknowledge the batches they came in"""
+        if not self._rows and not self._acks:
+            return
+        rows, self._rows = self._rows, []
+        acks, self._acks = self._acks, []
+        loop = asyncio.get_running_loop()
+        try:
+            with _INGEST_SECONDS.time():
+                await loop.run_in_executor(self._writer_thread, self.store.write, rows)
+        except Exception as e:
+            # Unacknowledged batches are resent by the agents
+            logger.error(f"Writing {len(rows)} fleet samples failed: {e}")
+            return
+        for writer, seq in acks:
+            if not writer.is_closing():
+                writer.write(wire.encode_ack(seq))
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_due.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_due.clear()
+            await self.flush()
+
+    def overview(self):
+        """Latest sample per host plus fleet-wide totals"""
+        now = time.time()
+        hosts = [state.to_dict(now) for state in self.hosts.values()]
+        reporting = [h for h in hosts if h["online"] and "cpu_percent" in h]
+        return {
+            "timestamp": now,
+            "hosts": sorted(hosts, key=lambda h: h["host"]),
+            "summary": {
+                "hosts": len(hosts),
+                "online": len(reporting),
+                "cpu_avg": sum(h["cpu_percent"] for h in reporting) / len(reporting) if reporting else None,
+                "cpu_max": max((h["cpu_percent"] for h in reporting), default=None),
+                "memory_max": max((h["memory_percent"] for h in reporting), default=None),
+                "disk_max": max((h["disk_percent"] for h in reporting), default=None),
+            },
+        }
+
+    def publish(self):
+        self.payload = json.dumps(self.overview())
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(self.payload)
+
+    async def _publish_loop(self):
+        while True:
+            self.publish()
+            await asyncio.sleep(self.publish_interval)
+
+    def subscribe(self):
+        """One-slot queue receiving each serialized overview"""
+        queue = asyncio.Queue(maxsize=1)
+        if self.payload is not None:
+            queue.put_nowait(self.payload)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
@@ -0,0 +1,111 @@
+"""
+Agent/aggregator wire format
+Length-prefixed binary frames over TCP. Every frame starts with an 8-byte
+header (magic, version, type, payload length); samples are fixed-size
+little-endian records, so a batch decodes with one struct.iter_unpack.
+
+    HELLO    agent -> aggregator   interval (f32), name length (u16), name
+    SAMPLES  agent -> aggregator   seq (u32), count (u16), count * SAMPLE
+    ACK      aggregator -> agent   seq (u32), once the batch is stored
+"""
+
+import struct
+from collections import namedtuple
+
+MAGIC = b'SG'
+VERSION = 1
+
+HELLO = 1
+SAMPLES = 2
+ACK = 3
+
+HEADER = struct.Struct('<2sBBI')
+# A full SAMPLES frame of 65535 records is ~3.8MB; anything larger is garbage
+MAX_PAYLOAD = 4 * 1024 * 1024
+MAX_BATCH = 0xFFFF
+
+_HELLO = struct.Struct('<fH')
+_BATCH = struct.Struct('<IH')
+_ACK = struct.Struct('<I')
+
+Sample = namedtuple('Sample', (
+    'timestamp', 'cpu_percent', 'memory_percent', 'disk_percent',
+    'load_avg_1', 'load_avg_5', 'load_avg_15', 'rx_bytes_per_sec', 'tx_bytes_per_sec',
+    'memory_used_mb', 'memory_total_mb', 'disk_used_gb', 'disk_total_gb', 'cores_logical',
+))
+# 58 bytes per host per sample, against ~2KB for the /health JSON document
+SAMPLE = struct.Struct('<d8f4IH')
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid frame"""
+
+
+def _frame(kind, payload):
+    return HEADER.pack(MAGIC, VERSION, kind, len(payload)) + payload
+
+
+def encode_hello(name, interval):
+    raw = name.encode('utf-8')[:255]
+    return _frame(HELLO, _HELLO.pack(interval, len(raw)) + raw)
+
+
+def encode_samples(seq, samples):
+    if len(samples) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} samples per frame")
+    pack = SAMPLE.pack
+    return _frame(SAMPLES, _BATCH.pack(seq, len(samples)) + b''.join(pack(*s) for s in samples))
+
+
+def encode_ack(seq):
+    return _frame(ACK, _ACK.pack(seq))
+
+
+def decode_header(data):
+    """(type, payload length) of a frame header"""
+    magic, version, kind, length = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f"bad frame header {bytes(data[:4])!r}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"frame of {length} bytes exceeds {MAX_PAYLOAD}")
+    return kind, length
+
+
+def decode_hello(payload):
+    """(name, interval) from a HELLO payload"""
+    interval, size = _HELLO.unpack_from(payload)
+    name = bytes(payload[_HELLO.size:_HELLO.size + size]).decode('utf-8', 'replace')
+    if not name or len(payload) != _HELLO.size + size:
+        raise ProtocolError("malformed HELLO")
+    return name, interval
+
+
+def decode_samples(payload):
+    """(seq, [Sample, ...]) from a SAMPLES payload"""
+    seq, count = _BATCH.unpack_from(payload)
+    body = memoryview(payload)[_BATCH.size:]
+    if len(body) != count * SAMPLE.size:
+        raise ProtocolError(f"SAMPLES frame declares {count} records but carries {len(body)} bytes")
+    return seq, [Sample._make(values) for values in SAMPLE.iter_unpack(body)]
+
+
+def decode_ack(payload):
+    return _ACK.unpack(payload)[0]
+
+
+def split_frames(buffer):
+    """
+    Pop every complete frame from the front of a bytearray and return them
+    as (type, payload) pairs; a trailing partial frame stays in the buffer.
+    """
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= HEADER.size:
+        kind, length = decode_header(buffer[offset:offset + HEADER.size])
+        end = offset + HEADER.size + length
+        if len(buffer) < end:
+            break
+        frames.append((kind, bytes(buffer[offset + HEADER.size:end])))
+        offset = end
+    del buffer[:offset]
+    return frames
@@ -1,18 +1,38 @@
 """
 SysGuard Monitor Module
 Provides system metrics collection with optional native backend acceleration
+
+Exports are imported on first use, so importing a light submodule such as
+monitor.selfstats does not load the native backend.
 """
 
-from .cpu import get_cpu_metrics, cpu_info
-from .memory import get_memory_metrics, memory_info
-from .disk import get_disk_metrics
-from .process import get_process_metrics
-
-__all__ = [
-    'get_cpu_metrics',
-    'cpu_info',
-    'get_memory_metrics', 
-    'memory_info',
-    'get_disk_metrics',
-    'get_process_metrics'
-]
+import importlib
+
+_EXPORTS = {
+    'get_cpu_metrics': '.cpu',
+    'cpu_info': '.cpu',
+    'get_memory_metrics': '.memory',
+    'memory_info': '.memory',
+    'get_disk_metrics': '.disk',
+    'get_process_metrics': '.process',
+    'Snapshot': '.snapshot',
+    'Sampler': '.snapshot',
+    'get_sampler': '.snapshot',
+    'configure_sampler': '.snapshot',
+    'current_snapshot': '.snapshot',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,54 @@
+"""
+cgroup monitoring - Native backend wrapper
+Per-cgroup usage read from the cgroup v2 hierarchy by the native collector
+"""
+
+from .native_backend import get_collector
+from .snapshot import current_snapshot
+
+DEFAULT_ROOT = "/sys/fs/cgroup"
+DEFAULT_MAX_DEPTH = 4
+
+# Ranking key -> record field
+SORT_FIELDS = {
+    'cpu': 'cpu_percent',
+    'memory': 'memory_mb',
+    'io': lambda g: g['io_read_bytes_per_sec'] + g['io_write_bytes_per_sec'],
+    'pids': 'pids',
+}
+
+
+def configure_cgroups(config, root=None):
+    """
+    Point the shared collector at monitoring.cgroups.root (or `root`, e.g. a
+    fixture tree). Returns whether cgroups are enabled in the config.
+    """
+    settings = config.get('monitoring', {}).get('cgroups') or {}
+    get_collector().set_cgroup_root(root or settings.get('root', DEFAULT_ROOT),
+                                    settings.get('max_depth', DEFAULT_MAX_DEPTH))
+    return settings.get('enabled', False)
+
+
+def leaves(groups):
+    """
+    Groups without child groups. A parent's usage includes its children's,
+    so ranking only leaves counts every unit or container once.
+    """
+    parents = {g['path'].rpartition('/')[0] for g in groups}
+    return [g for g in groups if g['path'] not in parents]
+
+
+def get_cgroup_metrics(limit=10, sort_by='cpu', snapshot=None, leaves_only=True):
+    """
+    Top `limit` control groups from the shared snapshot, ranked by
+    'cpu', 'memory', 'io' or 'pids'. The sampler must track cgroups
+    (configure_sampler(track_cgroups=True)); rates need two samples.
+    """
+    key = SORT_FIELDS[sort_by]
+    if isinstance(key, str):
+        key = lambda g, field=key: g[field]
+    snapshot = snapshot or current_snapshot()
+    groups = [dict(g) for g in snapshot.cgroups]
+    if leaves_only:
+        groups = leaves(groups)
+    return sorted(groups, key=key, reverse=True)[:limit]
@@ -3,20 +3,12 @@ CPU monitoring - Native backend wrapper
 Requires Rust/C native backends to be built
 """
 
-from .native_backend import get_metrics_rust
+from .snapshot import current_snapshot, thaw
 
-def get_cpu_metrics():
-    """Returns a dictionary of CPU metrics from native Rust backend."""
-    metrics = get_metrics_rust()
-    if metrics and 'cpu' in metrics:
-        cpu = metrics['cpu']
-        return {
-            "usage_percent": cpu['usage_percent'],
-            "cores_logical": cpu['cores_logical'],
-            "cores_physical": cpu.get('cores_physical', cpu['cores_logical'] // 2),
-            "load_avg": [cpu['load_avg_1'], cpu['load_avg_5'], cpu['load_avg_15']]
-        }
-    raise RuntimeError("Native backend not available. Run: ./scripts/buildnative.sh")
+def get_cpu_metrics(snapshot=None):
+    """Returns a dictionary of CPU metrics from the shared snapshot (a copy the caller may modify)."""
+    snapshot = snapshot or current_snapshot()
+    return thaw(snapshot.cpu)
 
 def cpu_info():
     """Returns a formatted string for CPU info."""
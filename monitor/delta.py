@@ -0,0 +1,122 @@
+"""
+Subscription protocol for /ws: a keyframe with the subscribed channels,
+then deltas holding only what changed since the last message the client
+received. The native server implements the same format in Rust
+(rust_metrics_delta); web/dashboard.js applies it.
+"""
+
+CHANNELS = ('cpu', 'memory', 'disk', 'processes', 'io', 'network')
+
+# Channels stored under a different key in the metrics document
+_DOC_KEYS = {'io': 'disk_io'}
+
+# Full keyframe after this many deltas, so clients recover from any drift
+KEYFRAME_EVERY = 60
+
+
+def _round(value):
+    # Deltas compare values at display precision so noise does not count as change
+    if isinstance(value, float):
+        return round(value, 1)
+    if isinstance(value, (list, tuple)):
+        return [_round(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _round(v) for k, v in value.items()}
+    return value
+
+
+def project(doc, channels=CHANNELS):
+    """The subscribed part of a metrics document, rounded for comparison"""
+    data = {}
+    for channel in channels:
+        if channel == 'processes':
+            processes = doc.get('processes', doc.get('top_processes', []))
+            data['processes'] = [{k: _round(v) for k, v in p.items()} for p in processes]
+        elif _DOC_KEYS.get(channel, channel) in doc:
+            data[channel] = _round(dict(doc[_DOC_KEYS.get(channel, channel)]))
+    return data
+
+
+def _diff_processes(prev, cur):
+    before = {p['pid']: p for p in prev}
+    after = {p['pid']: p for p in cur}
+    patch = {}
+    added = [p for pid, p in after.items() if pid not in before]
+    removed = [pid for pid in before if pid not in after]
+    changed = []
+    for pid, p in after.items():
+        old = before.get(pid)
+        if old is None:
+            continue
+        fields = {k: v for k, v in p.items() if old.get(k) != v}
+        if fields:
+            fields['pid'] = pid
+            changed.append(fields)
+    if added:
+        patch['added'] = added
+    if removed:
+        patch['removed'] = removed
+    if changed:
+        patch['changed'] = changed
+    return patch
+
+
+def diff(prev, cur):
+    """Delta between two projected documents; empty if nothing changed"""
+    delta = {}
+    for channel, value in cur.items():
+        old = prev.get(channel)
+        if channel == 'processes':
+            patch = _diff_processes(old or [], value)
+        else:
+            patch = {k: v for k, v in value.items() if old is None or old.get(k) != v}
+            if old is not None:
+                # Keys gone from the channel (an unplugged disk or interface) are sent as null
+                patch.update((k, None) for k in old if k not in value)
+        if patch:
+            delta[channel] = patch
+    return delta
+
+
+class Subscription:
+    """
+    Per-client state: channels, rate (at most one message per `interval`
+    seconds of sample time) and the projected document the client
+    currently holds.
+    """
+
+    # A sample this much early still counts as due, so jitter in the sample
+    # clock does not push a message a whole sample late
+    SLACK = 0.1
+
+    def __init__(self, channels=CHANNELS, interval=0.0):
+        self.channels = tuple(c for c in channels if c in CHANNELS) or CHANNELS
+        self.interval = max(0.0, float(interval))
+        self._state = None
+        self._last_sent = None
+        self._since_keyframe = 0
+
+    @classmethod
+    def from_request(cls, request):
+        """Build from a client message like {"subscribe": [...], "interval": 2}"""
+        return cls(request.get('subscribe') or CHANNELS, request.get('interval', 0.0))
+
+    def resync(self):
+        """Send a keyframe next"""
+        self._state = None
+
+    def message(self, doc, seq):
+        """Message for sample `seq`, or None if the client is not due one yet"""
+        timestamp = doc['timestamp']
+        if self._last_sent is not None and timestamp - self._last_sent < self.interval * (1 - self.SLACK):
+            return None
+        self._last_sent = timestamp
+        current = project(doc, self.channels)
+        if self._state is None or self._since_keyframe >= KEYFRAME_EVERY:
+            self._state = current
+            self._since_keyframe = 0
+            return {"type": "keyframe", "seq": seq, "data": current}
+        delta = diff(self._state, current)
+        self._state = current
+        self._since_keyframe += 1
+        return {"type": "delta", "seq": seq, "data": delta}
@@ -3,14 +3,12 @@ Disk monitoring - Native backend wrapper
 Requires Rust/C native backends to be built
 """
 
-from .native_backend import get_metrics_rust
+from .snapshot import current_snapshot, thaw
 
-def get_disk_metrics(path="/"):
-    """Returns a dictionary of Disk metrics from native Rust backend."""
-    metrics = get_metrics_rust()
-    if metrics and 'disk' in metrics:
-        return metrics['disk']
-    raise RuntimeError("Native backend not available. Run: ./scripts/buildnative.sh")
+def get_disk_metrics(path="/", snapshot=None):
+    """Returns a dictionary of Disk metrics from the shared snapshot (a copy the caller may modify)."""
+    snapshot = snapshot or current_snapshot()
+    return thaw(snapshot.disk)
 
 def disk_info():
     """Returns a formatted string for disk info."""
@@ -3,14 +3,12 @@ Memory monitoring - Native backend wrapper
 Requires Rust/C native backends to be built
 """
 
-from .native_backend import get_metrics_rust
+from .snapshot import current_snapshot, thaw
 
-def get_memory_metrics():
-    """Returns a dictionary of Memory metrics from native Rust backend."""
-    metrics = get_metrics_rust()
-    if metrics and 'memory' in metrics:
-        return metrics['memory']
-    raise RuntimeError("Native backend not available. Run: ./scripts/buildnative.sh")
+def get_memory_metrics(snapshot=None):
+    """Returns a dictionary of Memory metrics from the shared snapshot (a copy the caller may modify)."""
+    snapshot = snapshot or current_snapshot()
+    return thaw(snapshot.memory)
 
 def memory_info():
     """Returns a formatted string for memory info."""
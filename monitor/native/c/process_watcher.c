@@ -1,145 +1,366 @@
 /*
  * Fast Process Watcher in C
  * Minimal overhead system process monitoring
+ *
+ * Incremental scanner: a PID-keyed table survives between scans so CPU and
+ * IO are rates over the interval, not lifetime totals. Each scan rewinds one
+ * held /proc directory stream and opens <pid>/stat relative to it into a
+ * reused buffer. Only the top N are sorted (quickselect, then sort N).
  */
 
+#define _GNU_SOURCE
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 #include <unistd.h>
 #include <dirent.h>
+#include <fcntl.h>
 #include <sys/types.h>
 #include <sys/stat.h>
 #include <time.h>
 
-#define MAX_PROCESSES 1024
-#define MAX_NAME_LEN 256
+#define MAX_NAME_LEN 32
 #define PROC_DIR "/proc"
+#define READ_BUF_SIZE 4096
+
+enum sort_key { SORT_CPU, SORT_MEM, SORT_IO };
 
 typedef struct {
-    int pid;
+    int pid;                    /* 0 marks an empty slot */
     char name[MAX_NAME_LEN];
-    unsigned long utime;
-    unsigned long stime;
-    unsigned long vsize;
-    long rss;
+    unsigned long long ticks;   /* utime + stime at the last scan */
+    unsigned long long start_time;
+    unsigned long long io_bytes;
+    unsigned long rss_kb;
+    double cpu_percent;
+    double io_rate;             /* bytes/s */
+    unsigned long generation;
 } ProcessInfo;
 
-int is_numeric(const char *str) {
+typedef struct {
+    DIR *dir;
+    ProcessInfo *slots;         /* open-addressed by pid */
+    size_t capacity;
+    size_t count;
+    unsigned long generation;
+    struct timespec last_scan;
+    double ticks_per_sec;
+    unsigned long page_kb;
+    int track_io;
+    char buf[READ_BUF_SIZE];
+} Scanner;
+
+static double elapsed_since(const struct timespec *then, const struct timespec *now) {
+    return (now->tv_sec - then->tv_sec) + (now->tv_nsec - then->tv_nsec) / 1e9;
+}
+
+static int parse_pid(const char *str) {
+    int pid = 0;
+    if (!*str)
+        return 0;
     while (*str) {
         if (*str < '0' || *str > '9')
             return 0;
+        pid = pid * 10 + (*str - '0');
         str++;
     }
-    return 1;
+    return pid;
 }
 
-int read_proc_stat(int pid, ProcessInfo *pinfo) {
-    char path[256];
-    char buffer[1024];
-    FILE *fp;
-    
-    snprintf(path, sizeof(path), "/proc/%d/stat", pid);
-    fp = fopen(path, "r");
-    if (!fp)
-        return -1;
-    
-    if (fgets(buffer, sizeof(buffer), fp) == NULL) {
-        fclose(fp);
+static ProcessInfo *table_slot(ProcessInfo *slots, size_t capacity, int pid) {
+    size_t i = ((size_t)pid * 2654435761u) & (capacity - 1);
+    while (slots[i].pid != 0 && slots[i].pid != pid)
+        i = (i + 1) & (capacity - 1);
+    return &slots[i];
+}
+
+static int table_reserve(Scanner *s, size_t wanted) {
+    if (wanted * 2 <= s->capacity)
+        return 0;
+    size_t capacity = s->capacity ? s->capacity : 1024;
+    while (wanted * 2 > capacity)
+        capacity *= 2;
+    ProcessInfo *slots = calloc(capacity, sizeof(ProcessInfo));
+    if (!slots)
         return -1;
+    for (size_t i = 0; i < s->capacity; i++) {
+        if (s->slots[i].pid)
+            *table_slot(slots, capacity, s->slots[i].pid) = s->slots[i];
     }
-    
-    fclose(fp);
-    
-    char *start = strchr(buffer, '(');
-    char *end = strrchr(buffer, ')');
-    if (!start || !end)
+    free(s->slots);
+    s->slots = slots;
+    s->capacity = capacity;
+    return 0;
+}
+
+/* Drop processes not seen by the current scan by rebuilding the table */
+static void table_expire(Scanner *s) {
+    size_t live = 0;
+    for (size_t i = 0; i < s->capacity; i++) {
+        if (s->slots[i].pid && s->slots[i].generation == s->generation)
+            live++;
+    }
+    if (live == s->count)
+        return;
+    ProcessInfo *slots = calloc(s->capacity, sizeof(ProcessInfo));
+    if (!slots)
+        return;
+    for (size_t i = 0; i < s->capacity; i++) {
+        if (s->slots[i].pid && s->slots[i].generation == s->generation)
+            *table_slot(slots, s->capacity, s->slots[i].pid) = s->slots[i];
+    }
+    free(s->slots);
+    s->slots = slots;
+    s->count = live;
+}
+
+/* Read /proc/<pid>/<file> into the scanner buffer; returns bytes read */
+static ssize_t read_proc_file(Scanner *s, int pid, const char *file) {
+    char path[32];
+    snprintf(path, sizeof(path), "%d/%s", pid, file);
+    int fd = openat(dirfd(s->dir), path, O_RDONLY | O_CLOEXEC);
+    if (fd < 0)
+        return -1;
+    ssize_t n = read(fd, s->buf, sizeof(s->buf) - 1);
+    close(fd);
+    if (n <= 0)
         return -1;
-    
-    // Extract process name
-    int name_len = end - start - 1;
+    s->buf[n] = '\0';
+    return n;
+}
+
+static unsigned long long parse_io(const char *buf) {
+    unsigned long long total = 0;
+    const char *line;
+    if ((line = strstr(buf, "\nread_bytes: ")))
+        total += strtoull(line + 13, NULL, 10);
+    if ((line = strstr(buf, "\nwrite_bytes: ")))
+        total += strtoull(line + 14, NULL, 10);
+    return total;
+}
+
+static void scan_pid(Scanner *s, int pid, double elapsed) {
+    if (read_proc_file(s, pid, "stat") < 0)
+        return;
+
+    /* The name is in parentheses and may itself contain ") " */
+    char *start = strchr(s->buf, '(');
+    char *end = strrchr(s->buf, ')');
+    if (!start || !end || end[1] == '\0')
+        return;
+
+    /* Fields after the name start at field 3 (state) */
+    unsigned long long utime = 0, stime = 0, start_time = 0;
+    long rss = 0;
+    char *p = end + 2;
+    for (int field = 3; field <= 24 && *p; field++) {
+        char *next;
+        switch (field) {
+        case 14: utime = strtoull(p, &next, 10); break;
+        case 15: stime = strtoull(p, &next, 10); break;
+        case 22: start_time = strtoull(p, &next, 10); break;
+        case 24: rss = strtol(p, &next, 10); break;
+        default: next = strchr(p, ' '); if (!next) next = p + strlen(p); break;
+        }
+        p = (*next == ' ') ? next + 1 : next;
+    }
+
+    char name[MAX_NAME_LEN];
+    size_t name_len = end - start - 1;
     if (name_len >= MAX_NAME_LEN)
         name_len = MAX_NAME_LEN - 1;
-    strncpy(pinfo->name, start + 1, name_len);
-    pinfo->name[name_len] = '\0';
-    pinfo->pid = pid;
-    
-    // Parse remaining fields
-    sscanf(end + 2, "%*c %*d %*d %*d %*d %*d %*u %*u %*u %*u %*u %lu %lu %*d %*d %*d %*d %*d %*d %*u %lu %ld",
-           &pinfo->utime, &pinfo->stime, &pinfo->vsize, &pinfo->rss);
-    
-    return 0;
+    memcpy(name, start + 1, name_len);
+    name[name_len] = '\0';
+
+    int has_io = 0;
+    unsigned long long io_bytes = 0;
+    if (s->track_io && read_proc_file(s, pid, "io") >= 0) {
+        io_bytes = parse_io(s->buf);
+        has_io = 1;
+    }
+
+    if (table_reserve(s, s->count + 1) < 0)
+        return;
+    ProcessInfo *info = table_slot(s->slots, s->capacity, pid);
+    unsigned long long ticks = utime + stime;
+    int fresh = info->pid == 0 || info->start_time != start_time
+                || info->generation + 1 != s->generation || elapsed <= 0;
+    if (info->pid == 0)
+        s->count++;
+    if (fresh) {
+        /* New or reused PID, or missed a scan: no interval to rate over */
+        info->cpu_percent = 0;
+        info->io_rate = 0;
+    } else {
+        info->cpu_percent = (ticks - info->ticks) / s->ticks_per_sec / elapsed * 100.0;
+        info->io_rate = has_io && io_bytes >= info->io_bytes
+                        ? (io_bytes - info->io_bytes) / elapsed : 0;
+    }
+    info->pid = pid;
+    memcpy(info->name, name, name_len + 1);
+    info->ticks = ticks;
+    info->start_time = start_time;
+    info->io_bytes = io_bytes;
+    info->rss_kb = rss > 0 ? rss * s->page_kb : 0;
+    info->generation = s->generation;
 }
 
-int get_all_processes(ProcessInfo *processes, int max_count) {
-    DIR *dir;
-    struct dirent *entry;
-    int count = 0;
-    
-    dir = opendir(PROC_DIR);
-    if (!dir) {
+static int scanner_init(Scanner *s, int track_io) {
+    memset(s, 0, sizeof(*s));
+    s->dir = opendir(PROC_DIR);
+    if (!s->dir) {
         perror("opendir");
         return -1;
     }
-    
-    while ((entry = readdir(dir)) != NULL && count < max_count) {
-        if (entry->d_type == DT_DIR && is_numeric(entry->d_name)) {
-            int pid = atoi(entry->d_name);
-            if (read_proc_stat(pid, &processes[count]) == 0) {
-                count++;
-            }
-        }
+    long ticks = sysconf(_SC_CLK_TCK);
+    long page = sysconf(_SC_PAGESIZE);
+    s->ticks_per_sec = ticks > 0 ? ticks : 100;
+    s->page_kb = page > 0 ? page / 1024 : 4;
+    s->track_io = track_io;
+    return table_reserve(s, 1024);
+}
+
+static void scanner_free(Scanner *s) {
+    if (s->dir)
+        closedir(s->dir);
+    free(s->slots);
+}
+
+static void scan(Scanner *s) {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    double elapsed = s->generation ? elapsed_since(&s->last_scan, &now) : 0;
+    s->last_scan = now;
+    s->generation++;
+
+    struct dirent *entry;
+    rewinddir(s->dir);
+    while ((entry = readdir(s->dir)) != NULL) {
+        int pid = parse_pid(entry->d_name);
+        if (pid > 0)
+            scan_pid(s, pid, elapsed);
+    }
+    table_expire(s);
+}
+
+static double score(const ProcessInfo *p, enum sort_key key) {
+    switch (key) {
+    case SORT_MEM: return (double)p->rss_kb;
+    case SORT_IO: return p->io_rate;
+    default: return p->cpu_percent;
     }
-    
-    closedir(dir);
-    return count;
 }
 
-void print_process_info(const ProcessInfo *pinfo) {
-    unsigned long total_time = pinfo->utime + pinfo->stime;
-    unsigned long mem_kb = pinfo->rss * sysconf(_SC_PAGESIZE) / 1024;
-    
-    printf("PID: %-6d | Name: %-20s | CPU: %-10lu | Mem: %lu KB\n",
-           pinfo->pid, pinfo->name, total_time, mem_kb);
+static enum sort_key sort_by = SORT_CPU;
+
+static int compare_desc(const void *a, const void *b) {
+    double sa = score(*(ProcessInfo *const *)a, sort_by);
+    double sb = score(*(ProcessInfo *const *)b, sort_by);
+    return (sb > sa) - (sb < sa);
+}
+
+static void swap_items(ProcessInfo **items, long i, long j) {
+    ProcessInfo *tmp = items[i];
+    items[i] = items[j];
+    items[j] = tmp;
 }
 
-int compare_cpu(const void *a, const void *b) {
-    const ProcessInfo *pa = (const ProcessInfo *)a;
-    const ProcessInfo *pb = (const ProcessInfo *)b;
-    unsigned long ta = pa->utime + pa->stime;
-    unsigned long tb = pb->utime + pb->stime;
-    return (tb > ta) - (tb < ta);
+/*
+ * Partition so the k highest-scoring entries come first (unordered).
+ * Three-way partitioning keeps this linear when most scores are equal,
+ * as CPU usage is on an idle host.
+ */
+static void select_top(ProcessInfo **items, long n, long k) {
+    long lo = 0, hi = n - 1;
+    while (lo < hi) {
+        double pivot = score(items[lo + (hi - lo) / 2], sort_by);
+        /* [lo, gt_end) > pivot, [gt_end, i) == pivot, (lt_start, hi] < pivot */
+        long gt_end = lo, i = lo, lt_start = hi;
+        while (i <= lt_start) {
+            double value = score(items[i], sort_by);
+            if (value > pivot)
+                swap_items(items, gt_end++, i++);
+            else if (value < pivot)
+                swap_items(items, i, lt_start--);
+            else
+                i++;
+        }
+        if (k - 1 < gt_end)
+            hi = gt_end - 1;
+        else if (k - 1 > lt_start)
+            lo = lt_start + 1;
+        else
+            return;
+    }
+}
+
+/* Pointers to the top k processes, best first; returns how many */
+static size_t top_processes(Scanner *s, ProcessInfo ***out, size_t *out_cap, size_t k) {
+    if (*out_cap < s->count) {
+        free(*out);
+        *out_cap = s->count + s->count / 4 + 16;
+        *out = malloc(*out_cap * sizeof(ProcessInfo *));
+        if (!*out) {
+            *out_cap = 0;
+            return 0;
+        }
+    }
+    size_t n = 0;
+    for (size_t i = 0; i < s->capacity; i++) {
+        if (s->slots[i].pid)
+            (*out)[n++] = &s->slots[i];
+    }
+    if (k > n)
+        k = n;
+    if (k == 0)
+        return 0;
+    if (k < n)
+        select_top(*out, (long)n, (long)k);
+    qsort(*out, k, sizeof(ProcessInfo *), compare_desc);
+    return k;
 }
 
-int compare_mem(const void *a, const void *b) {
-    const ProcessInfo *pa = (const ProcessInfo *)a;
-    const ProcessInfo *pb = (const ProcessInfo *)b;
-    return (pb->rss > pa->rss) - (pb->rss < pa->rss);
+void print_process_info(const ProcessInfo *pinfo, int show_io) {
+    printf("PID: %-7d | Name: %-16s | CPU: %6.1f%% | Mem: %lu KB",
+           pinfo->pid, pinfo->name, pinfo->cpu_percent, pinfo->rss_kb);
+    if (show_io)
+        printf(" | IO: %.0f KB/s", pinfo->io_rate / 1024);
+    printf("\n");
 }
 
 void print_usage(const char *prog) {
-    fprintf(stderr, "Usage: %s [-n count] [-s sort_by]\n", prog);
+    fprintf(stderr, "Usage: %s [-n count] [-s sort_by] [-i interval] [-c]\n", prog);
     fprintf(stderr, "  -n count    : Number of processes to display (default: 10)\n");
-    fprintf(stderr, "  -s sort_by  : Sort by 'cpu' or 'mem' (default: cpu)\n");
+    fprintf(stderr, "  -s sort_by  : Sort by 'cpu', 'mem' or 'io' (default: cpu)\n");
+    fprintf(stderr, "  -i interval : Seconds between scans for CPU/IO rates (default: 1)\n");
+    fprintf(stderr, "  -c          : Continuous monitoring\n");
 }
 
 int main(int argc, char *argv[]) {
-    ProcessInfo processes[MAX_PROCESSES];
-    int count;
+    Scanner scanner;
     int display_count = 10;
-    int sort_by_mem = 0;
+    double interval = 1.0;
+    int continuous = 0;
     int opt;
-    
-    while ((opt = getopt(argc, argv, "n:s:h")) != -1) {
+
+    while ((opt = getopt(argc, argv, "n:s:i:ch")) != -1) {
         switch (opt) {
             case 'n':
                 display_count = atoi(optarg);
                 break;
             case 's':
                 if (strcmp(optarg, "mem") == 0 || strcmp(optarg, "memory") == 0) {
-                    sort_by_mem = 1;
+                    sort_by = SORT_MEM;
+                } else if (strcmp(optarg, "io") == 0) {
+                    sort_by = SORT_IO;
                 }
                 break;
+            case 'i':
+                interval = atof(optarg);
+                break;
+            case 'c':
+                continuous = 1;
+                break;
             case 'h':
                 print_usage(argv[0]);
                 return 0;
@@ -148,32 +369,48 @@ int main(int argc, char *argv[]) {
                 return 1;
         }
     }
-    
-    printf("=== System Process Monitor (C) ===\n");
-    printf("Collecting process information...\n\n");
-    
-    count = get_all_processes(processes, MAX_PROCESSES);
-    if (count < 0) {
+    if (display_count < 0)
+        display_count = 0;
+    if (interval <= 0)
+        interval = 1.0;
+
+    if (scanner_init(&scanner, sort_by == SORT_IO) < 0) {
         fprintf(stderr, "Failed to read processes\n");
         return 1;
     }
-    
-    // Sort processes
-    if (sort_by_mem) {
-        qsort(processes, count, sizeof(ProcessInfo), compare_mem);
-        printf("Top %d processes by memory usage:\n\n", display_count);
-    } else {
-        qsort(processes, count, sizeof(ProcessInfo), compare_cpu);
-        printf("Top %d processes by CPU usage:\n\n", display_count);
-    }
-    
-    // Display top processes
-    int to_display = (count < display_count) ? count : display_count;
-    for (int i = 0; i < to_display; i++) {
-        print_process_info(&processes[i]);
-    }
-    
-    printf("\nTotal processes: %d\n", count);
-    
+
+    printf("=== System Process Monitor (C) ===\n");
+    printf("Collecting process information...\n\n");
+
+    static const char *labels[] = { "CPU usage", "memory usage", "IO" };
+    struct timespec pause = { (time_t)interval, (long)((interval - (time_t)interval) * 1e9) };
+    ProcessInfo **top = NULL;
+    size_t top_cap = 0;
+
+    /* Memory needs one scan; CPU and IO rates need a baseline first */
+    scan(&scanner);
+    do {
+        if (sort_by != SORT_MEM || continuous) {
+            nanosleep(&pause, NULL);
+            scan(&scanner);
+        }
+
+        struct timespec started, finished;
+        clock_gettime(CLOCK_MONOTONIC, &started);
+        size_t shown = top_processes(&scanner, &top, &top_cap, display_count);
+        clock_gettime(CLOCK_MONOTONIC, &finished);
+
+        printf("Top %d processes by %s:\n\n", display_count, labels[sort_by]);
+        for (size_t i = 0; i < shown; i++)
+            print_process_info(top[i], scanner.track_io);
+        printf("\nTotal processes: %zu (ranked in %.2f ms)\n",
+               scanner.count, elapsed_since(&started, &finished) * 1000);
+        if (continuous)
+            printf("\n");
+        fflush(stdout);
+    } while (continuous);
+
+    free(top);
+    scanner_free(&scanner);
     return 0;
 }
@@ -0,0 +1,177 @@
+//! Per-control-group usage from the cgroup v2 hierarchy.
+//!
+//! Walks the unified hierarchy under a configurable root (/sys/fs/cgroup by
+//! default, or any tree with the same files, such as a test fixture) and
+//! reads each group's cpu.stat, memory.current, memory.max, io.stat and
+//! pids.current. CPU and IO are rates over the interval between two
+//! refreshes, like the process and device rates. A few small files per
+//! group cost far less than a stat read for every PID, and attribute usage
+//! to the services, slices and containers that own it.
+
+use std::collections::BTreeMap;
+use std::fs::{self, File};
+use std::io::Read;
+use std::path::{Path, PathBuf};
+use std::time::Instant;
+
+use crate::iostats::upsert;
+
+pub const DEFAULT_ROOT: &str = "/sys/fs/cgroup";
+/// Deep enough for system.slice/<unit> and kubepods.slice/<qos>/<pod>/<container>
+pub const DEFAULT_MAX_DEPTH: u32 = 4;
+
+#[derive(Clone, Copy, Debug, Default)]
+pub struct CgroupUsage {
+    /// Percent of one CPU, like process usage
+    pub cpu_percent: f64,
+    pub io_read_bytes_per_sec: f64,
+    pub io_write_bytes_per_sec: f64,
+    pub memory_bytes: u64,
+    /// memory.max; 0 when unlimited or the memory controller is off
+    pub memory_max_bytes: u64,
+    pub pids: u64,
+}
+
+#[derive(Clone, Copy, Default)]
+struct Counters {
+    usage_usec: u64,
+    rbytes: u64,
+    wbytes: u64,
+}
+
+pub struct CgroupStats {
+    root: PathBuf,
+    max_depth: u32,
+    buf: Vec<u8>,
+    // Raw counters from the previous refresh, tagged with the refresh that saw them
+    prev: BTreeMap<String, (Counters, u64)>,
+    generation: u64,
+    last: Option<Instant>,
+    /// Groups below the root keyed by their path relative to it
+    pub groups: BTreeMap<String, CgroupUsage>,
+}
+
+/// Read a whole (small) control file into `buf`
+fn read_file<'a>(path: &Path, buf: &'a mut Vec<u8>) -> Option<&'a str> {
+    buf.clear();
+    File::open(path).ok()?.read_to_end(buf).ok()?;
+    std::str::from_utf8(buf).ok()
+}
+
+/// Value of `key` in a flat-keyed file such as cpu.stat ("usage_usec 123")
+fn keyed(text: &str, key: &str) -> Option<u64> {
+    text.lines().find_map(|line| {
+        let (name, value) = line.split_once(' ')?;
+        if name == key {
+            value.trim().parse().ok()
+        } else {
+            None
+        }
+    })
+}
+
+/// rbytes and wbytes summed over every device line of io.stat
+/// ("8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0")
+fn io_bytes(text: &str) -> (u64, u64) {
+    let (mut read, mut written) = (0u64, 0u64);
+    for field in text.split_ascii_whitespace() {
+        if let Some(value) = field.strip_prefix("rbytes=") {
+            read += value.parse().unwrap_or(0);
+        } else if let Some(value) = field.strip_prefix("wbytes=") {
+            written += value.parse().unwrap_or(0);
+        }
+    }
+    (read, written)
+}
+
+impl CgroupStats {
+    pub fn new() -> Self {
+        Self::with_root(DEFAULT_ROOT, DEFAULT_MAX_DEPTH)
+    }
+
+    pub fn with_root(root: impl Into<PathBuf>, max_depth: u32) -> Self {
+        CgroupStats {
+            root: root.into(),
+            max_depth,
+            buf: Vec::with_capacity(4096),
+            prev: BTreeMap::new(),
+            generation: 0,
+            last: None,
+            groups: BTreeMap::new(),
+        }
+    }
+
+    /// Re-read every group down to max_depth below the root
+    pub fn refresh(&mut self) {
+        let now = Instant::now();
+        let elapsed = self.last.map(|t| now.duration_since(t).as_secs_f64()).unwrap_or(0.0);
+        self.last = Some(now);
+        self.generation += 1;
+
+        let mut pending = vec![(self.root.clone(), 0u32)];
+        while let Some((dir, depth)) = pending.pop() {
+            // The root group's totals are the host's, which the other collectors report
+            if depth > 0 {
+                self.read_group(&dir, elapsed);
+            }
+            if depth >= self.max_depth {
+                continue;
+            }
+            let Ok(entries) = fs::read_dir(&dir) else { continue };
+            for entry in entries.flatten() {
+                if entry.file_type().map(|t| t.is_dir()).unwrap_or(false) {
+                    pending.push((entry.path(), depth + 1));
+                }
+            }
+        }
+
+        // Forget groups that were removed
+        let generation = self.generation;
+        self.prev.retain(|_, (_, seen)| *seen == generation);
+        let prev = &self.prev;
+        self.groups.retain(|name, _| prev.contains_key(name));
+    }
+
+    fn read_group(&mut self, dir: &Path, elapsed: f64) {
+        let mut buf = std::mem::take(&mut self.buf);
+        // cpu.stat is present in every v2 group whatever the enabled controllers
+        let Some(usage_usec) = read_file(&dir.join("cpu.stat"), &mut buf).and_then(|t| keyed(t, "usage_usec"))
+        else {
+            self.buf = buf;
+            return;
+        };
+        let (rbytes, wbytes) = read_file(&dir.join("io.stat"), &mut buf).map(io_bytes).unwrap_or((0, 0));
+        let number = |name: &str, buf: &mut Vec<u8>| {
+            read_file(&dir.join(name), buf).and_then(|t| t.trim().parse::<u64>().ok()).unwrap_or(0)
+        };
+        let mut usage = CgroupUsage {
+            memory_bytes: number("memory.current", &mut buf),
+            // "max" does not parse and reads as unlimited
+            memory_max_bytes: number("memory.max", &mut buf),
+            pids: number("pids.current", &mut buf),
+            ..CgroupUsage::default()
+        };
+        self.buf = buf;
+
+        let name = dir.strip_prefix(&self.root).unwrap_or(dir).to_string_lossy();
+        let counters = Counters { usage_usec, rbytes, wbytes };
+        let prev = upsert(&mut self.prev, &name, counters, self.generation);
+        if let (Some(prev), true) = (prev, elapsed > 0.0) {
+            usage.cpu_percent = counters.usage_usec.saturating_sub(prev.usage_usec) as f64 / 1e6 / elapsed * 100.0;
+            usage.io_read_bytes_per_sec = counters.rbytes.saturating_sub(prev.rbytes) as f64 / elapsed;
+            usage.io_write_bytes_per_sec = counters.wbytes.saturating_sub(prev.wbytes) as f64 / elapsed;
+        }
+        match self.groups.get_mut(name.as_ref()) {
+            Some(slot) => *slot = usage,
+            None => {
+                self.groups.insert(name.into_owned(), usage);
+            }
+        }
+    }
+}
+
+impl Default for CgroupStats {
+    fn default() -> Self {
+        Self::new()
+    }
+}
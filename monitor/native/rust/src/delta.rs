@@ -0,0 +1,156 @@
+//! Keyframe/delta encoding for the /ws subscription protocol.
+//! Mirrors monitor/delta.py: channels are projected and rounded to display
+//! precision, then only changed scalars and process-table diffs are kept;
+//! keys removed from a channel are sent as null.
+
+use serde_json::{Map, Value};
+use std::collections::HashMap;
+
+pub const CHANNEL_CPU: u32 = 1 << 0;
+pub const CHANNEL_MEMORY: u32 = 1 << 1;
+pub const CHANNEL_DISK: u32 = 1 << 2;
+pub const CHANNEL_PROCESSES: u32 = 1 << 3;
+pub const CHANNEL_IO: u32 = 1 << 4;
+pub const CHANNEL_NETWORK: u32 = 1 << 5;
+
+// (flag, protocol name, key in SystemMetrics JSON)
+const CHANNELS: [(u32, &str, &str); 6] = [
+    (CHANNEL_CPU, "cpu", "cpu"),
+    (CHANNEL_MEMORY, "memory", "memory"),
+    (CHANNEL_DISK, "disk", "disk"),
+    (CHANNEL_PROCESSES, "processes", "top_processes"),
+    (CHANNEL_IO, "io", "disk_io"),
+    (CHANNEL_NETWORK, "network", "network"),
+];
+
+fn round(value: &Value) -> Value {
+    match value {
+        Value::Number(n) if n.is_f64() => {
+            let rounded = (n.as_f64().unwrap_or(0.0) * 10.0).round() / 10.0;
+            serde_json::Number::from_f64(rounded).map(Value::Number).unwrap_or(Value::Null)
+        }
+        Value::Array(items) => Value::Array(items.iter().map(round).collect()),
+        Value::Object(fields) => Value::Object(fields.iter().map(|(k, v)| (k.clone(), round(v))).collect()),
+        other => other.clone(),
+    }
+}
+
+/// The subscribed part of a metrics document, rounded for comparison.
+pub fn project(doc: &Value, channels: u32) -> Map<String, Value> {
+    let mut data = Map::new();
+    for (flag, name, key) in CHANNELS {
+        if channels & flag == 0 {
+            continue;
+        }
+        if let Some(value) = doc.get(key).or_else(|| doc.get(name)) {
+            data.insert(name.to_string(), round(value));
+        }
+    }
+    data
+}
+
+fn pid_of(process: &Value) -> Option<u64> {
+    process.get("pid").and_then(Value::as_u64)
+}
+
+fn diff_processes(prev: &[Value], cur: &[Value]) -> Map<String, Value> {
+    let before: HashMap<u64, &Value> = prev.iter().filter_map(|p| Some((pid_of(p)?, p))).collect();
+    let after: HashMap<u64, &Value> = cur.iter().filter_map(|p| Some((pid_of(p)?, p))).collect();
+
+    let mut added = Vec::new();
+    let mut changed = Vec::new();
+    for process in cur {
+        let Some(pid) = pid_of(process) else { continue };
+        match before.get(&pid) {
+            None => added.push(process.clone()),
+            Some(old) => {
+                let fields = diff_fields(old, process);
+                if !fields.is_empty() {
+                    let mut fields = fields;
+                    fields.insert("pid".to_string(), Value::from(pid));
+                    changed.push(Value::Object(fields));
+                }
+            }
+        }
+    }
+    let removed: Vec<Value> = prev
+        .iter()
+        .filter_map(pid_of)
+        .filter(|pid| !after.contains_key(pid))
+        .map(Value::from)
+        .collect();
+
+    let mut patch = Map::new();
+    if !added.is_empty() {
+        patch.insert("added".to_string(), Value::Array(added));
+    }
+    if !removed.is_empty() {
+        patch.insert("removed".to_string(), Value::Array(removed));
+    }
+    if !changed.is_empty() {
+        patch.insert("changed".to_string(), Value::Array(changed));
+    }
+    patch
+}
+
+fn diff_fields(old: &Value, new: &Value) -> Map<String, Value> {
+    let mut fields = Map::new();
+    if let Some(new) = new.as_object() {
+        for (key, value) in new {
+            if old.get(key) != Some(value) {
+                fields.insert(key.clone(), value.clone());
+            }
+        }
+    }
+    fields
+}
+
+/// Changed keys of a channel object, with keys no longer present as null.
+fn diff_channel(old: &Value, new: &Value) -> Map<String, Value> {
+    let mut fields = diff_fields(old, new);
+    if let Some(old) = old.as_object() {
+        for key in old.keys() {
+            if new.get(key).is_none() {
+                fields.insert(key.clone(), Value::Null);
+            }
+        }
+    }
+    fields
+}
+
+/// Delta between two projected documents; empty if nothing changed.
+pub fn diff(prev: &Map<String, Value>, cur: &Map<String, Value>) -> Map<String, Value> {
+    let mut delta = Map::new();
+    for (channel, value) in cur {
+        let old = prev.get(channel);
+        let patch = if channel == "processes" {
+            let empty = Vec::new();
+            let old = old.and_then(Value::as_array).unwrap_or(&empty);
+            diff_processes(old, value.as_array().unwrap_or(&empty))
+        } else {
+            match old {
+                Some(old) => diff_channel(old, value),
+                None => value.as_object().cloned().unwrap_or_default(),
+            }
+        };
+        if !patch.is_empty() {
+            delta.insert(channel.clone(), Value::Object(patch));
+        }
+    }
+    delta
+}
+
+/// Keyframe data (prev = None) or delta data between two metrics documents.
+pub fn encode(prev: Option<&str>, next: &str, channels: u32) -> Option<String> {
+    let next: Value = serde_json::from_str(next).ok()?;
+    let cur = project(&next, channels);
+    let data = match prev {
+        None => cur,
+        Some(prev) => {
+            let prev: Value = serde_json::from_str(prev).ok()?;
+            diff(&project(&prev, channels), &cur)
+        }
+    };
+    serde_json::to_string(&data).ok()
+}
+
@@ -0,0 +1,260 @@
+//! Block-device and network-interface throughput.
+//!
+//! Rates are deltas of the kernel counters in /proc/diskstats and
+//! /proc/net/dev between two refreshes. Both files stay open for the life of
+//! the collector and are re-read from offset 0 with pread into a reused
+//! buffer, so a refresh costs two reads and no path lookups.
+
+use serde::{Deserialize, Serialize};
+use std::collections::{BTreeMap, HashMap};
+use std::fs::File;
+use std::os::unix::fs::FileExt;
+use std::path::Path;
+use std::time::Instant;
+
+const SECTOR_BYTES: f64 = 512.0;
+
+#[derive(Serialize, Deserialize, Debug, Clone, Copy, Default)]
+pub struct DeviceIo {
+    pub read_bytes_per_sec: f64,
+    pub write_bytes_per_sec: f64,
+    pub reads_per_sec: f64,
+    pub writes_per_sec: f64,
+    /// Share of the interval the device had IO in flight (saturation)
+    pub util_percent: f64,
+    /// Requests in flight when sampled
+    pub in_flight: u32,
+}
+
+#[derive(Serialize, Deserialize, Debug, Clone, Copy, Default)]
+pub struct InterfaceIo {
+    pub rx_bytes_per_sec: f64,
+    pub tx_bytes_per_sec: f64,
+    pub rx_packets_per_sec: f64,
+    pub tx_packets_per_sec: f64,
+    pub errors_per_sec: f64,
+    pub drops_per_sec: f64,
+}
+
+#[derive(Clone, Copy, Default)]
+struct DiskCounters {
+    reads: u64,
+    sectors_read: u64,
+    writes: u64,
+    sectors_written: u64,
+    io_ms: u64,
+}
+
+#[derive(Clone, Copy, Default)]
+struct NetCounters {
+    rx_bytes: u64,
+    rx_packets: u64,
+    tx_bytes: u64,
+    tx_packets: u64,
+    errors: u64,
+    drops: u64,
+}
+
+/// Per-second rate of a counter that may have wrapped or been reset
+fn rate(now: u64, before: u64, elapsed: f64) -> f64 {
+    now.saturating_sub(before) as f64 / elapsed
+}
+
+/// Re-read a held /proc file from the start into `buf`
+fn pread_all(file: &File, buf: &mut Vec<u8>) -> bool {
+    buf.clear();
+    let mut chunk = [0u8; 8192];
+    loop {
+        match file.read_at(&mut chunk, buf.len() as u64) {
+            Ok(0) => return true,
+            Ok(n) => buf.extend_from_slice(&chunk[..n]),
+            Err(_) => return false,
+        }
+    }
+}
+
+/// Parse leading numeric fields into `out`; returns how many were present
+fn parse_fields<'a>(fields: impl Iterator<Item = &'a str>, out: &mut [u64]) -> usize {
+    let mut count = 0;
+    for (slot, field) in out.iter_mut().zip(fields) {
+        *slot = field.parse().unwrap_or(0);
+        count += 1;
+    }
+    count
+}
+
+/// Store `value` under `name`, reusing the existing key when there is one
+pub(crate) fn upsert<T>(map: &mut BTreeMap<String, (T, u64)>, name: &str, value: T, generation: u64) -> Option<T> {
+    match map.get_mut(name) {
+        Some(slot) => {
+            slot.1 = generation;
+            Some(std::mem::replace(&mut slot.0, value))
+        }
+        None => {
+            map.insert(name.to_string(), (value, generation));
+            None
+        }
+    }
+}
+
+pub struct IoStats {
+    diskstats: Option<File>,
+    netdev: Option<File>,
+    buf: Vec<u8>,
+    // Raw counters from the previous refresh, tagged with the refresh that saw them
+    disk_prev: BTreeMap<String, (DiskCounters, u64)>,
+    net_prev: BTreeMap<String, (NetCounters, u64)>,
+    generation: u64,
+    disk_last: Option<Instant>,
+    net_last: Option<Instant>,
+    // Whether a diskstats name is a whole device (partitions would double count)
+    whole_disk: HashMap<String, bool>,
+    pub devices: BTreeMap<String, DeviceIo>,
+    pub interfaces: BTreeMap<String, InterfaceIo>,
+}
+
+impl IoStats {
+    pub fn new() -> Self {
+        IoStats {
+            diskstats: File::open("/proc/diskstats").ok(),
+            netdev: File::open("/proc/net/dev").ok(),
+            buf: Vec::with_capacity(16 * 1024),
+            disk_prev: BTreeMap::new(),
+            net_prev: BTreeMap::new(),
+            generation: 0,
+            disk_last: None,
+            net_last: None,
+            whole_disk: HashMap::new(),
+            devices: BTreeMap::new(),
+            interfaces: BTreeMap::new(),
+        }
+    }
+
+    fn is_whole_disk(&mut self, name: &str) -> bool {
+        if let Some(&whole) = self.whole_disk.get(name) {
+            return whole;
+        }
+        // Loop and RAM disks are not storage; partitions have no /sys/block entry
+        let whole = !name.starts_with("loop")
+            && !name.starts_with("ram")
+            && Path::new("/sys/block").join(name).exists();
+        self.whole_disk.insert(name.to_string(), whole);
+        whole
+    }
+
+    /// Recompute per-device rates from /proc/diskstats
+    pub fn refresh_disks(&mut self) {
+        let Some(file) = &self.diskstats else { return };
+        let mut buf = std::mem::take(&mut self.buf);
+        if !pread_all(file, &mut buf) {
+            self.buf = buf;
+            return;
+        }
+        let now = Instant::now();
+        let elapsed = self.disk_last.map(|t| now.duration_since(t).as_secs_f64()).unwrap_or(0.0);
+        self.disk_last = Some(now);
+
+        self.generation += 1;
+        let generation = self.generation;
+        let text = String::from_utf8_lossy(&buf);
+        let mut v = [0u64; 10];
+        for line in text.lines() {
+            // major minor name reads merged sectors ms writes merged sectors ms in_flight io_ms ...
+            let mut fields = line.split_ascii_whitespace().skip(2);
+            let Some(name) = fields.next() else { continue };
+            if !self.is_whole_disk(name) || parse_fields(fields, &mut v) < v.len() {
+                continue;
+            }
+            let counters = DiskCounters {
+                reads: v[0],
+                sectors_read: v[2],
+                writes: v[4],
+                sectors_written: v[6],
+                io_ms: v[9],
+            };
+            let mut io = DeviceIo { in_flight: v[8] as u32, ..DeviceIo::default() };
+            let prev = upsert(&mut self.disk_prev, name, counters, generation);
+            if let (Some(prev), true) = (prev, elapsed > 0.0) {
+                io.read_bytes_per_sec = rate(counters.sectors_read, prev.sectors_read, elapsed) * SECTOR_BYTES;
+                io.write_bytes_per_sec = rate(counters.sectors_written, prev.sectors_written, elapsed) * SECTOR_BYTES;
+                io.reads_per_sec = rate(counters.reads, prev.reads, elapsed);
+                io.writes_per_sec = rate(counters.writes, prev.writes, elapsed);
+                io.util_percent = (rate(counters.io_ms, prev.io_ms, elapsed) / 10.0).min(100.0);
+            }
+            match self.devices.get_mut(name) {
+                Some(slot) => *slot = io,
+                None => {
+                    self.devices.insert(name.to_string(), io);
+                }
+            }
+        }
+        // Forget devices that disappeared
+        self.disk_prev.retain(|_, (_, seen)| *seen == generation);
+        let prev = &self.disk_prev;
+        self.devices.retain(|name, _| prev.contains_key(name));
+        self.buf = buf;
+    }
+
+    /// Recompute per-interface rates from /proc/net/dev
+    pub fn refresh_network(&mut self) {
+        let Some(file) = &self.netdev else { return };
+        let mut buf = std::mem::take(&mut self.buf);
+        if !pread_all(file, &mut buf) {
+            self.buf = buf;
+            return;
+        }
+        let now = Instant::now();
+        let elapsed = self.net_last.map(|t| now.duration_since(t).as_secs_f64()).unwrap_or(0.0);
+        self.net_last = Some(now);
+
+        self.generation += 1;
+        let generation = self.generation;
+        let text = String::from_utf8_lossy(&buf);
+        let mut v = [0u64; 12];
+        // Two header lines, then "iface: rx(bytes packets errs drop fifo frame compressed multicast) tx(bytes packets errs drop ...)"
+        for line in text.lines().skip(2) {
+            let Some((name, rest)) = line.split_once(':') else { continue };
+            let name = name.trim();
+            if name == "lo" {
+                continue;
+            }
+            if parse_fields(rest.split_ascii_whitespace(), &mut v) < v.len() {
+                continue;
+            }
+            let counters = NetCounters {
+                rx_bytes: v[0],
+                rx_packets: v[1],
+                tx_bytes: v[8],
+                tx_packets: v[9],
+                errors: v[2] + v[10],
+                drops: v[3] + v[11],
+            };
+            let mut io = InterfaceIo::default();
+            let prev = upsert(&mut self.net_prev, name, counters, generation);
+            if let (Some(prev), true) = (prev, elapsed > 0.0) {
+                io.rx_bytes_per_sec = rate(counters.rx_bytes, prev.rx_bytes, elapsed);
+                io.tx_bytes_per_sec = rate(counters.tx_bytes, prev.tx_bytes, elapsed);
+                io.rx_packets_per_sec = rate(counters.rx_packets, prev.rx_packets, elapsed);
+                io.tx_packets_per_sec = rate(counters.tx_packets, prev.tx_packets, elapsed);
+                io.errors_per_sec = rate(counters.errors, prev.errors, elapsed);
+                io.drops_per_sec = rate(counters.drops, prev.drops, elapsed);
+            }
+            match self.interfaces.get_mut(name) {
+                Some(slot) => *slot = io,
+                None => {
+                    self.interfaces.insert(name.to_string(), io);
+                }
+            }
+        }
+        self.net_prev.retain(|_, (_, seen)| *seen == generation);
+        let prev = &self.net_prev;
+        self.interfaces.retain(|name, _| prev.contains_key(name));
+        self.buf = buf;
+    }
+}
+
+impl Default for IoStats {
+    fn default() -> Self {
+        Self::new()
+    }
+}
@@ -1,6 +1,32 @@
 use serde::{Deserialize, Serialize};
-use sysinfo::{System, Disks};
-use std::ffi::{CString, c_char};
+use sysinfo::{CpuRefreshKind, Disks, System};
+use std::ffi::c_char;
+use std::sync::Mutex;
+use std::time::Instant;
+
+pub mod cgroups;
+pub mod delta;
+pub mod iostats;
+pub mod procscan;
+
+use cgroups::CgroupStats;
+use iostats::{DeviceIo, InterfaceIo, IoStats};
+use procscan::{ProcScanner, SORT_CPU};
+use std::collections::{BTreeMap, HashSet};
+
+// Subsystem flags for Collector::refresh / rust_collector_refresh
+pub const REFRESH_CPU: u32 = 1 << 0;
+pub const REFRESH_MEMORY: u32 = 1 << 1;
+pub const REFRESH_DISK: u32 = 1 << 2;
+pub const REFRESH_PROCESSES: u32 = 1 << 3;
+// Also read per-process IO counters (one extra open per process); not in REFRESH_ALL
+pub const REFRESH_PROCESS_IO: u32 = 1 << 4;
+pub const REFRESH_DISK_IO: u32 = 1 << 5;
+pub const REFRESH_NETWORK: u32 = 1 << 6;
+// Walk the cgroup v2 hierarchy; opt-in like REFRESH_PROCESS_IO, not in REFRESH_ALL
+pub const REFRESH_CGROUPS: u32 = 1 << 7;
+pub const REFRESH_ALL: u32 =
+    REFRESH_CPU | REFRESH_MEMORY | REFRESH_DISK | REFRESH_PROCESSES | REFRESH_DISK_IO | REFRESH_NETWORK;
 
 #[derive(Serialize, Deserialize, Debug)]
 pub struct CpuMetrics {
@@ -9,6 +35,7 @@ pub struct CpuMetrics {
     pub load_avg_1: f64,
     pub load_avg_5: f64,
     pub load_avg_15: f64,
+    pub per_core: Vec<f32>,
 }
 
 #[derive(Serialize, Deserialize, Debug)]
@@ -19,12 +46,25 @@ pub struct MemoryMetrics {
     pub percent: f64,
 }
 
+#[derive(Serialize, Deserialize, Debug)]
+pub struct MountUsage {
+    pub mount_point: String,
+    pub device: String,
+    pub fs_type: String,
+    pub total_gb: u64,
+    pub used_gb: u64,
+    pub free_gb: u64,
+    pub percent: f64,
+}
+
+/// Totals over real filesystems, each device counted once
 #[derive(Serialize, Deserialize, Debug)]
 pub struct DiskMetrics {
     pub total_gb: u64,
     pub used_gb: u64,
     pub free_gb: u64,
     pub percent: f64,
+    pub mounts: Vec<MountUsage>,
 }
 
 #[derive(Serialize, Deserialize, Debug)]
@@ -33,6 +73,7 @@ pub struct ProcessInfo {
     pub name: String,
     pub cpu_percent: f32,
     pub memory_mb: u64,
+    pub io_bytes_per_sec: u64,
 }
 
 #[derive(Serialize, Deserialize, Debug)]
@@ -41,6 +82,106 @@ pub struct SystemMetrics {
     pub memory: MemoryMetrics,
     pub disk: DiskMetrics,
     pub top_processes: Vec<ProcessInfo>,
+    pub disk_io: BTreeMap<String, DeviceIo>,
+    pub network: BTreeMap<String, InterfaceIo>,
+}
+
+// Binary FFI layout. Fields are ordered widest-first so the structs have no
+// padding; monitor/native_backend.py mirrors them as ctypes.Structure.
+pub const PROCESS_NAME_LEN: usize = 32;
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug, Default)]
+pub struct SgMetrics {
+    pub mem_total_mb: u64,
+    pub mem_used_mb: u64,
+    pub mem_available_mb: u64,
+    pub disk_total_gb: u64,
+    pub disk_used_gb: u64,
+    pub disk_free_gb: u64,
+    pub load_avg_1: f64,
+    pub load_avg_5: f64,
+    pub load_avg_15: f64,
+    pub mem_percent: f64,
+    pub disk_percent: f64,
+    pub cpu_usage_percent: f32,
+    pub cores_logical: u32,
+    /// Processes on the host
+    pub process_count: u32,
+    /// Records written into the caller's process buffer
+    pub process_written: u32,
+}
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct SgProcess {
+    pub memory_kb: u64,
+    pub io_bytes_per_sec: u64,
+    /// Clock ticks after boot (field 22 of /proc/<pid>/stat); with the pid it
+    /// identifies the process across PID reuse
+    pub start_time: u64,
+    pub pid: u32,
+    pub cpu_percent: f32,
+    /// NUL-padded, truncated to PROCESS_NAME_LEN - 1 bytes
+    pub name: [u8; PROCESS_NAME_LEN],
+}
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct SgMount {
+    pub total_bytes: u64,
+    pub used_bytes: u64,
+    pub available_bytes: u64,
+    pub mount_point: [u8; 128],
+    pub device: [u8; 64],
+    pub fs_type: [u8; 16],
+}
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct SgDeviceIo {
+    pub read_bytes_per_sec: f64,
+    pub write_bytes_per_sec: f64,
+    pub reads_per_sec: f64,
+    pub writes_per_sec: f64,
+    pub util_percent: f64,
+    pub in_flight: u32,
+    pub name: [u8; 28],
+}
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct SgInterfaceIo {
+    pub rx_bytes_per_sec: f64,
+    pub tx_bytes_per_sec: f64,
+    pub rx_packets_per_sec: f64,
+    pub tx_packets_per_sec: f64,
+    pub errors_per_sec: f64,
+    pub drops_per_sec: f64,
+    pub name: [u8; 16],
+}
+
+pub const CGROUP_PATH_LEN: usize = 256;
+
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct SgCgroup {
+    pub cpu_percent: f64,
+    pub io_read_bytes_per_sec: f64,
+    pub io_write_bytes_per_sec: f64,
+    pub memory_bytes: u64,
+    /// 0 when unlimited
+    pub memory_max_bytes: u64,
+    pub pids: u64,
+    /// Path below the cgroup root, NUL-padded
+    pub path: [u8; CGROUP_PATH_LEN],
+}
+
+fn copy_name<const N: usize>(dst: &mut [u8; N], name: &str) {
+    let bytes = name.as_bytes();
+    let len = bytes.len().min(N - 1);
+    dst[..len].copy_from_slice(&bytes[..len]);
+    dst[len..].fill(0);
 }
 
 pub fn get_cpu_metrics(sys: &System) -> CpuMetrics {
@@ -52,6 +193,7 @@ pub fn get_cpu_metrics(sys: &System) -> CpuMetrics {
         load_avg_1: load_avg.one,
         load_avg_5: load_avg.five,
         load_avg_15: load_avg.fifteen,
+        per_core: sys.cpus().iter().map(|cpu| cpu.cpu_usage()).collect(),
     }
 }
 
@@ -68,77 +210,500 @@ pub fn get_memory_metrics(sys: &System) -> MemoryMetrics {
     }
 }
 
-pub fn get_disk_metrics() -> DiskMetrics {
-    let disks = Disks::new_with_refreshed_list();
-    
+// Kernel and virtual filesystems that do not hold user data
+const PSEUDO_FILESYSTEMS: &[&str] = &[
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts",
+    "devtmpfs", "efivarfs", "fusectl", "fuse.lxcfs", "hugetlbfs", "mqueue", "nsfs", "proc",
+    "pstore", "ramfs", "rpc_pipefs", "securityfs", "squashfs", "sysfs", "tmpfs", "tracefs",
+];
+
+/// Real mounts, one per device: bind mounts of the same filesystem repeat
+/// its device and size, so only the first (shortest) mount point is kept.
+fn real_mounts(disks: &Disks) -> Vec<&sysinfo::Disk> {
+    let mut mounts: Vec<&sysinfo::Disk> = disks
+        .iter()
+        .filter(|disk| {
+            let fs = disk.file_system().to_string_lossy();
+            disk.total_space() > 0 && !PSEUDO_FILESYSTEMS.contains(&fs.as_ref())
+        })
+        .collect();
+    mounts.sort_by_key(|disk| disk.mount_point().as_os_str().len());
+    let mut seen = HashSet::new();
+    mounts.retain(|disk| seen.insert((disk.name().to_os_string(), disk.total_space())));
+    mounts
+}
+
+fn usage_percent(used: u64, total: u64) -> f64 {
+    if total > 0 {
+        (used as f64 / total as f64) * 100.0
+    } else {
+        0.0
+    }
+}
+
+pub fn get_disk_metrics(disks: &Disks) -> DiskMetrics {
     let mut total: u64 = 0;
     let mut available: u64 = 0;
+    let mut mounts = Vec::new();
     
-    for disk in disks.iter() {
+    for disk in real_mounts(disks) {
         total += disk.total_space();
         available += disk.available_space();
+        let used = disk.total_space().saturating_sub(disk.available_space());
+        mounts.push(MountUsage {
+            mount_point: disk.mount_point().to_string_lossy().into_owned(),
+            device: disk.name().to_string_lossy().into_owned(),
+            fs_type: disk.file_system().to_string_lossy().into_owned(),
+            total_gb: disk.total_space() / 1024 / 1024 / 1024,
+            used_gb: used / 1024 / 1024 / 1024,
+            free_gb: disk.available_space() / 1024 / 1024 / 1024,
+            percent: usage_percent(used, disk.total_space()),
+        });
     }
     
     let used = total.saturating_sub(available);
-    let percent = if total > 0 {
-        (used as f64 / total as f64) * 100.0
-    } else {
-        0.0
-    };
     
     DiskMetrics {
         total_gb: total / 1024 / 1024 / 1024,
         used_gb: used / 1024 / 1024 / 1024,
         free_gb: available / 1024 / 1024 / 1024,
-        percent,
+        percent: usage_percent(used, total),
+        mounts,
     }
 }
 
-pub fn get_top_processes(sys: &System, limit: usize) -> Vec<ProcessInfo> {
-    let mut processes: Vec<ProcessInfo> = sys
-        .processes()
+/// Top `limit` processes from the scanner, ranked by `sort_by` (SORT_* key)
+pub fn get_top_processes(procs: &ProcScanner, limit: usize, sort_by: u32) -> Vec<ProcessInfo> {
+    let mut order = Vec::with_capacity(limit);
+    procs.rank(sort_by, limit, &mut order);
+    order
         .iter()
-        .map(|(pid, process)| ProcessInfo {
-            pid: pid.as_u32(),
-            name: process.name().to_string(),
-            cpu_percent: process.cpu_usage(),
-            memory_mb: process.memory() / 1024 / 1024,
+        .filter_map(|(_, pid)| procs.get(*pid))
+        .map(|entry| ProcessInfo {
+            pid: entry.pid,
+            name: entry.name().to_string(),
+            cpu_percent: entry.cpu_percent,
+            memory_mb: entry.memory_kb / 1024,
+            io_bytes_per_sec: entry.io_bytes_per_sec,
         })
-        .collect();
-    
-    // Sort by CPU usage
-    processes.sort_by(|a, b| b.cpu_percent.partial_cmp(&a.cpu_percent).unwrap());
-    
-    processes.truncate(limit);
-    processes
+        .collect()
 }
 
-pub fn get_all_metrics(limit: usize) -> SystemMetrics {
-    let mut sys = System::new_all();
-    sys.refresh_all();
-    
-    // Reduced sleep for faster response (was 200ms, now 50ms = 75% faster)
-    std::thread::sleep(std::time::Duration::from_millis(50));
-    sys.refresh_cpu();
-    
-    SystemMetrics {
-        cpu: get_cpu_metrics(&sys),
-        memory: get_memory_metrics(&sys),
-        disk: get_disk_metrics(),
-        top_processes: get_top_processes(&sys, limit),
+/// Long-lived collector that keeps sysinfo state between samples.
+///
+/// CPU usage is computed from the difference between two refreshes (by
+/// sysinfo for the host, by the process scanner per process), so once the
+/// collector has been primed there is no need to sleep: each refresh reports
+/// usage since the previous one.
+pub struct Collector {
+    sys: System,
+    disks: Disks,
+    procs: ProcScanner,
+    io: IoStats,
+    cgroups: CgroupStats,
+    // Reused between binary reads to rank processes without allocating
+    order: Vec<(f64, u32)>,
+    // When the constructor primed the CPU and process baselines, until the
+    // first refresh that reads them again
+    primed: Option<Instant>,
+}
+
+impl Collector {
+    pub fn new() -> Self {
+        let mut collector = Collector {
+            sys: System::new(),
+            disks: Disks::new_with_refreshed_list(),
+            procs: ProcScanner::new(),
+            io: IoStats::new(),
+            cgroups: CgroupStats::new(),
+            order: Vec::new(),
+            primed: None,
+        };
+        // Prime CPU and process baselines so the next refresh yields deltas
+        collector.refresh(REFRESH_ALL);
+        collector.primed = Some(Instant::now());
+        collector
+    }
+
+    /// Refresh only the subsystems selected by `what` (REFRESH_* flags).
+    ///
+    /// The first CPU or process refresh after construction waits until
+    /// MINIMUM_CPU_UPDATE_INTERVAL has passed since priming, so one-shot
+    /// callers get usage measured over a meaningful interval. Sampling loops
+    /// are already past it by their first tick and never wait.
+    pub fn refresh(&mut self, what: u32) {
+        if what & (REFRESH_CPU | REFRESH_PROCESSES) != 0 {
+            if let Some(primed) = self.primed.take() {
+                let elapsed = primed.elapsed();
+                if elapsed < sysinfo::MINIMUM_CPU_UPDATE_INTERVAL {
+                    std::thread::sleep(sysinfo::MINIMUM_CPU_UPDATE_INTERVAL - elapsed);
+                }
+            }
+        }
+        if what & REFRESH_CPU != 0 {
+            self.sys.refresh_cpu_specifics(CpuRefreshKind::new().with_cpu_usage());
+        }
+        if what & REFRESH_MEMORY != 0 {
+            self.sys.refresh_memory();
+        }
+        if what & REFRESH_DISK != 0 {
+            self.disks.refresh();
+        }
+        if what & REFRESH_PROCESSES != 0 {
+            self.procs.scan(what & REFRESH_PROCESS_IO != 0);
+        }
+        if what & REFRESH_DISK_IO != 0 {
+            self.io.refresh_disks();
+        }
+        if what & REFRESH_NETWORK != 0 {
+            self.io.refresh_network();
+        }
+        if what & REFRESH_CGROUPS != 0 {
+            self.cgroups.refresh();
+        }
+    }
+
+    /// Read cgroups from another hierarchy (or a fixture tree), `max_depth`
+    /// levels deep; rates start over from the next two refreshes.
+    pub fn set_cgroup_root(&mut self, root: &str, max_depth: u32) {
+        self.cgroups = CgroupStats::with_root(root, max_depth);
+    }
+
+    pub fn metrics(&self, limit: usize) -> SystemMetrics {
+        SystemMetrics {
+            cpu: get_cpu_metrics(&self.sys),
+            memory: get_memory_metrics(&self.sys),
+            disk: get_disk_metrics(&self.disks),
+            top_processes: get_top_processes(&self.procs, limit, SORT_CPU),
+            disk_io: self.io.devices.clone(),
+            network: self.io.interfaces.clone(),
+        }
+    }
+
+    /// Fill caller-owned buffers with the scalar metrics and up to
+    /// `procs.len()` process records ranked by `sort_by` (SORT_* key).
+    pub fn read_into(&mut self, out: &mut SgMetrics, procs: &mut [SgProcess], sort_by: u32) -> usize {
+        let cpu = get_cpu_metrics(&self.sys);
+        let memory = get_memory_metrics(&self.sys);
+        let disk = get_disk_metrics(&self.disks);
+
+        self.procs.rank(sort_by, procs.len(), &mut self.order);
+
+        let mut written = 0;
+        for (slot, (_, pid)) in procs.iter_mut().zip(self.order.iter()) {
+            if let Some(entry) = self.procs.get(*pid) {
+                slot.memory_kb = entry.memory_kb;
+                slot.io_bytes_per_sec = entry.io_bytes_per_sec;
+                slot.start_time = entry.start_time;
+                slot.pid = entry.pid;
+                slot.cpu_percent = entry.cpu_percent;
+                slot.name = entry.name;
+                written += 1;
+            }
+        }
+
+        *out = SgMetrics {
+            mem_total_mb: memory.total_mb,
+            mem_used_mb: memory.used_mb,
+            mem_available_mb: memory.available_mb,
+            disk_total_gb: disk.total_gb,
+            disk_used_gb: disk.used_gb,
+            disk_free_gb: disk.free_gb,
+            load_avg_1: cpu.load_avg_1,
+            load_avg_5: cpu.load_avg_5,
+            load_avg_15: cpu.load_avg_15,
+            mem_percent: memory.percent,
+            disk_percent: disk.percent,
+            cpu_usage_percent: cpu.usage_percent,
+            cores_logical: cpu.cores_logical as u32,
+            process_count: self.procs.len() as u32,
+            process_written: written as u32,
+        };
+        written
+    }
+
+    /// Per-core CPU usage into `out`; returns the core count
+    pub fn read_cores(&self, out: &mut [f32]) -> usize {
+        let cpus = self.sys.cpus();
+        for (slot, cpu) in out.iter_mut().zip(cpus) {
+            *slot = cpu.cpu_usage();
+        }
+        cpus.len()
+    }
+
+    /// Real mounts into `out`; returns the mount count
+    pub fn read_mounts(&self, out: &mut [SgMount]) -> usize {
+        let mounts = real_mounts(&self.disks);
+        for (slot, disk) in out.iter_mut().zip(mounts.iter()) {
+            slot.total_bytes = disk.total_space();
+            slot.available_bytes = disk.available_space();
+            slot.used_bytes = disk.total_space().saturating_sub(disk.available_space());
+            copy_name(&mut slot.mount_point, &disk.mount_point().to_string_lossy());
+            copy_name(&mut slot.device, &disk.name().to_string_lossy());
+            copy_name(&mut slot.fs_type, &disk.file_system().to_string_lossy());
+        }
+        mounts.len()
+    }
+
+    /// Block device rates into `out`; returns the device count
+    pub fn read_disk_io(&self, out: &mut [SgDeviceIo]) -> usize {
+        for (slot, (name, io)) in out.iter_mut().zip(self.io.devices.iter()) {
+            slot.read_bytes_per_sec = io.read_bytes_per_sec;
+            slot.write_bytes_per_sec = io.write_bytes_per_sec;
+            slot.reads_per_sec = io.reads_per_sec;
+            slot.writes_per_sec = io.writes_per_sec;
+            slot.util_percent = io.util_percent;
+            slot.in_flight = io.in_flight;
+            copy_name(&mut slot.name, name);
+        }
+        self.io.devices.len()
+    }
+
+    /// Network interface rates into `out`; returns the interface count
+    pub fn read_network(&self, out: &mut [SgInterfaceIo]) -> usize {
+        for (slot, (name, io)) in out.iter_mut().zip(self.io.interfaces.iter()) {
+            slot.rx_bytes_per_sec = io.rx_bytes_per_sec;
+            slot.tx_bytes_per_sec = io.tx_bytes_per_sec;
+            slot.rx_packets_per_sec = io.rx_packets_per_sec;
+            slot.tx_packets_per_sec = io.tx_packets_per_sec;
+            slot.errors_per_sec = io.errors_per_sec;
+            slot.drops_per_sec = io.drops_per_sec;
+            copy_name(&mut slot.name, name);
+        }
+        self.io.interfaces.len()
+    }
+
+    /// Per-cgroup usage into `out`, ordered by path; returns the group count
+    pub fn read_cgroups(&self, out: &mut [SgCgroup]) -> usize {
+        for (slot, (path, usage)) in out.iter_mut().zip(self.cgroups.groups.iter()) {
+            slot.cpu_percent = usage.cpu_percent;
+            slot.io_read_bytes_per_sec = usage.io_read_bytes_per_sec;
+            slot.io_write_bytes_per_sec = usage.io_write_bytes_per_sec;
+            slot.memory_bytes = usage.memory_bytes;
+            slot.memory_max_bytes = usage.memory_max_bytes;
+            slot.pids = usage.pids;
+            copy_name(&mut slot.path, path);
+        }
+        self.cgroups.groups.len()
     }
 }
 
-#[no_mangle]
-pub extern "C" fn rust_get_metrics_json(limit: usize) -> *mut c_char {
-    let metrics = get_all_metrics(limit);
-    let json = serde_json::to_string(&metrics).unwrap_or_else(|_| "{}".to_string());
-    
+impl Default for Collector {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+/// One-shot collection for the standalone binary. Long-running callers
+/// should keep a `Collector` instead of paying the priming interval per call.
+pub fn get_all_metrics(limit: usize) -> SystemMetrics {
+    let mut collector = Collector::new();
+    // Waits out the priming interval
+    collector.refresh(REFRESH_CPU | REFRESH_PROCESSES | REFRESH_DISK_IO | REFRESH_NETWORK);
+    collector.metrics(limit)
+}
+
+fn to_c_json(metrics: &SystemMetrics) -> *mut c_char {
+    let json = serde_json::to_string(metrics).unwrap_or_else(|_| "{}".to_string());
+
     std::ffi::CString::new(json)
         .unwrap()
         .into_raw()
 }
 
+// Shared collector backing the legacy rust_get_metrics_json entry point
+static SHARED_COLLECTOR: Mutex<Option<Collector>> = Mutex::new(None);
+
+#[no_mangle]
+pub extern "C" fn rust_get_metrics_json(limit: usize) -> *mut c_char {
+    let mut guard = match SHARED_COLLECTOR.lock() {
+        Ok(guard) => guard,
+        Err(poisoned) => poisoned.into_inner(),
+    };
+    let collector = guard.get_or_insert_with(Collector::new);
+    collector.refresh(REFRESH_ALL);
+    to_c_json(&collector.metrics(limit))
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_new() -> *mut Collector {
+    Box::into_raw(Box::new(Collector::new()))
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_refresh(handle: *mut Collector, what: u32) {
+    let collector = unsafe {
+        match handle.as_mut() {
+            Some(collector) => collector,
+            None => return,
+        }
+    };
+    collector.refresh(what);
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_json(handle: *const Collector, limit: usize) -> *mut c_char {
+    let collector = unsafe {
+        match handle.as_ref() {
+            Some(collector) => collector,
+            None => return std::ptr::null_mut(),
+        }
+    };
+    to_c_json(&collector.metrics(limit))
+}
+
+/// Write metrics into `out` and up to `capacity` records, ranked by CPU
+/// usage, into `procs`. Both buffers are owned by the caller and can be
+/// reused between calls. Returns the number of process records written.
+#[no_mangle]
+pub extern "C" fn rust_collector_read(
+    handle: *mut Collector,
+    out: *mut SgMetrics,
+    procs: *mut SgProcess,
+    capacity: usize,
+) -> usize {
+    rust_collector_read_sorted(handle, out, procs, capacity, SORT_CPU)
+}
+
+/// rust_collector_read with the records ranked by `sort_by` (SORT_* key)
+#[no_mangle]
+pub extern "C" fn rust_collector_read_sorted(
+    handle: *mut Collector,
+    out: *mut SgMetrics,
+    procs: *mut SgProcess,
+    capacity: usize,
+    sort_by: u32,
+) -> usize {
+    let (collector, out) = unsafe {
+        match (handle.as_mut(), out.as_mut()) {
+            (Some(collector), Some(out)) => (collector, out),
+            _ => return 0,
+        }
+    };
+    let procs: &mut [SgProcess] = if procs.is_null() || capacity == 0 {
+        &mut []
+    } else {
+        unsafe { std::slice::from_raw_parts_mut(procs, capacity) }
+    };
+    collector.read_into(out, procs, sort_by)
+}
+
+/// Borrow a collector and a caller-owned array of `capacity` records
+unsafe fn collector_and_slice<'a, T>(
+    handle: *const Collector,
+    out: *mut T,
+    capacity: usize,
+) -> Option<(&'a Collector, &'a mut [T])> {
+    let collector = handle.as_ref()?;
+    let slice: &mut [T] = if out.is_null() || capacity == 0 {
+        &mut []
+    } else {
+        std::slice::from_raw_parts_mut(out, capacity)
+    };
+    Some((collector, slice))
+}
+
+// The readers below write up to `capacity` records and return the total
+// available, so callers can grow their buffer and read again.
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_cores(handle: *const Collector, out: *mut f32, capacity: usize) -> usize {
+    match unsafe { collector_and_slice(handle, out, capacity) } {
+        Some((collector, out)) => collector.read_cores(out),
+        None => 0,
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_mounts(handle: *const Collector, out: *mut SgMount, capacity: usize) -> usize {
+    match unsafe { collector_and_slice(handle, out, capacity) } {
+        Some((collector, out)) => collector.read_mounts(out),
+        None => 0,
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_disk_io(
+    handle: *const Collector,
+    out: *mut SgDeviceIo,
+    capacity: usize,
+) -> usize {
+    match unsafe { collector_and_slice(handle, out, capacity) } {
+        Some((collector, out)) => collector.read_disk_io(out),
+        None => 0,
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_network(
+    handle: *const Collector,
+    out: *mut SgInterfaceIo,
+    capacity: usize,
+) -> usize {
+    match unsafe { collector_and_slice(handle, out, capacity) } {
+        Some((collector, out)) => collector.read_network(out),
+        None => 0,
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_read_cgroups(
+    handle: *const Collector,
+    out: *mut SgCgroup,
+    capacity: usize,
+) -> usize {
+    match unsafe { collector_and_slice(handle, out, capacity) } {
+        Some((collector, out)) => collector.read_cgroups(out),
+        None => 0,
+    }
+}
+
+/// Point the cgroup walk at `root` (a NUL-terminated path), `max_depth` levels deep
+#[no_mangle]
+pub extern "C" fn rust_collector_set_cgroup_root(handle: *mut Collector, root: *const c_char, max_depth: u32) {
+    let collector = unsafe {
+        match handle.as_mut() {
+            Some(collector) => collector,
+            None => return,
+        }
+    };
+    if root.is_null() {
+        return;
+    }
+    if let Ok(root) = unsafe { std::ffi::CStr::from_ptr(root) }.to_str() {
+        collector.set_cgroup_root(root, max_depth);
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn rust_collector_free(handle: *mut Collector) {
+    unsafe {
+        if !handle.is_null() {
+            let _ = Box::from_raw(handle);
+        }
+    }
+}
+
+/// Subscription message data for the /ws protocol: the projected keyframe
+/// when `prev` is null, otherwise the delta from `prev` to `next`. Both are
+/// documents from rust_collector_read_json; `channels` is a CHANNEL_* mask.
+#[no_mangle]
+pub extern "C" fn rust_metrics_delta(prev: *const c_char, next: *const c_char, channels: u32) -> *mut c_char {
+    if next.is_null() {
+        return std::ptr::null_mut();
+    }
+    let next = unsafe { std::ffi::CStr::from_ptr(next) }.to_str().unwrap_or("{}");
+    let prev = if prev.is_null() {
+        None
+    } else {
+        unsafe { std::ffi::CStr::from_ptr(prev) }.to_str().ok()
+    };
+    match delta::encode(prev, next, channels) {
+        Some(json) => std::ffi::CString::new(json).map(|s| s.into_raw()).unwrap_or(std::ptr::null_mut()),
+        None => std::ptr::null_mut(),
+    }
+}
+
 #[no_mangle]
 pub extern "C" fn rust_free_string(s: *mut c_char) {
     unsafe {
@@ -0,0 +1,289 @@
+//! Incremental /proc process scanner.
+//!
+//! Keeps a PID-keyed table between scans so CPU usage and IO are rates over
+//! the scan interval rather than lifetime totals. Each scan rewinds one held
+//! /proc directory stream, opens `<pid>/stat` relative to it and parses into a
+//! reused buffer; ranking selects the top k without sorting the whole table.
+
+use std::collections::HashMap;
+use std::ffi::CStr;
+use std::io::Write;
+use std::time::Instant;
+
+use crate::{copy_name, PROCESS_NAME_LEN};
+
+// Ranking keys for Collector::read_into / rust_collector_read_sorted
+pub const SORT_CPU: u32 = 0;
+pub const SORT_MEMORY: u32 = 1;
+pub const SORT_IO: u32 = 2;
+
+/// Scans closer together than this keep the previous rates: a single clock
+/// tick over a few milliseconds would read as a fully busy CPU
+const MIN_RATE_INTERVAL: f64 = 0.1;
+
+#[derive(Clone, Copy, Debug)]
+pub struct ProcEntry {
+    pub pid: u32,
+    pub name: [u8; PROCESS_NAME_LEN],
+    pub cpu_percent: f32,
+    pub memory_kb: u64,
+    pub io_bytes_per_sec: u64,
+    pub start_time: u64,
+    // Raw counters from the previous scan
+    ticks: u64,
+    io_bytes: Option<u64>,
+    generation: u64,
+}
+
+impl ProcEntry {
+    pub fn name(&self) -> &str {
+        let len = self.name.iter().position(|&b| b == 0).unwrap_or(PROCESS_NAME_LEN);
+        std::str::from_utf8(&self.name[..len]).unwrap_or("")
+    }
+
+    fn score(&self, key: u32) -> f64 {
+        match key {
+            SORT_MEMORY => self.memory_kb as f64,
+            SORT_IO => self.io_bytes_per_sec as f64,
+            _ => self.cpu_percent as f64,
+        }
+    }
+}
+
+pub struct ProcScanner {
+    dir: *mut libc::DIR,
+    table: HashMap<u32, ProcEntry>,
+    generation: u64,
+    // Last scan that rates were computed over (short rescans don't count)
+    last_scan: Option<Instant>,
+    ticks_per_sec: f64,
+    page_kb: u64,
+    buf: Vec<u8>,
+    path: Vec<u8>,
+}
+
+// The directory stream is only touched through &mut self
+unsafe impl Send for ProcScanner {}
+
+impl ProcScanner {
+    pub fn new() -> Self {
+        let dir = unsafe { libc::opendir(c"/proc".as_ptr()) };
+        let ticks = unsafe { libc::sysconf(libc::_SC_CLK_TCK) };
+        let page = unsafe { libc::sysconf(libc::_SC_PAGESIZE) };
+        ProcScanner {
+            dir,
+            table: HashMap::new(),
+            generation: 0,
+            last_scan: None,
+            ticks_per_sec: if ticks > 0 { ticks as f64 } else { 100.0 },
+            page_kb: if page > 0 { page as u64 / 1024 } else { 4 },
+            buf: vec![0; 4096],
+            path: Vec::with_capacity(32),
+        }
+    }
+
+    /// Processes seen by the last scan
+    pub fn len(&self) -> usize {
+        self.table.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.table.is_empty()
+    }
+
+    pub fn get(&self, pid: u32) -> Option<&ProcEntry> {
+        self.table.get(&pid)
+    }
+
+    /// Re-read every process. With `io`, also read `<pid>/io` for byte rates
+    /// (only readable for the caller's own processes unless privileged).
+    pub fn scan(&mut self, io: bool) {
+        if self.dir.is_null() {
+            return;
+        }
+        let now = Instant::now();
+        let elapsed = self.last_scan.map(|t| now.duration_since(t).as_secs_f64()).unwrap_or(0.0);
+        // A rescan right after the previous one refreshes memory and the
+        // process list but keeps rates and their baselines
+        let rates = elapsed <= 0.0 || elapsed >= MIN_RATE_INTERVAL;
+        if rates {
+            self.last_scan = Some(now);
+        }
+        self.generation += 1;
+
+        let dir_fd = unsafe {
+            libc::rewinddir(self.dir);
+            libc::dirfd(self.dir)
+        };
+        loop {
+            let entry = unsafe { libc::readdir(self.dir) };
+            if entry.is_null() {
+                break;
+            }
+            let name = unsafe { CStr::from_ptr((*entry).d_name.as_ptr()) }.to_bytes();
+            let Some(pid) = parse_pid(name) else { continue };
+            self.scan_pid(dir_fd, pid, elapsed, rates, io);
+        }
+
+        let generation = self.generation;
+        self.table.retain(|_, entry| entry.generation == generation);
+    }
+
+    fn scan_pid(&mut self, dir_fd: i32, pid: u32, elapsed: f64, rates: bool, io: bool) {
+        let Some(len) = self.read(dir_fd, pid, b"stat") else { return };
+        let Some(stat) = parse_stat(&self.buf[..len]) else { return };
+        let io_bytes = if io {
+            self.read(dir_fd, pid, b"io").map(|len| parse_io(&self.buf[..len]))
+        } else {
+            None
+        };
+
+        let generation = self.generation;
+        let ticks_per_sec = self.ticks_per_sec;
+        let memory_kb = stat.rss_pages * self.page_kb;
+        let entry = self.table.entry(pid).or_insert_with(|| ProcEntry {
+            pid,
+            name: [0; PROCESS_NAME_LEN],
+            cpu_percent: 0.0,
+            memory_kb: 0,
+            io_bytes_per_sec: 0,
+            ticks: stat.ticks,
+            io_bytes,
+            start_time: stat.start_time,
+            generation: 0,
+        });
+        let reused = entry.start_time != stat.start_time;
+        if reused {
+            // PID was reused by a new process: start its counters over
+            entry.ticks = stat.ticks;
+            entry.io_bytes = io_bytes;
+            entry.start_time = stat.start_time;
+        }
+        let seen = entry.generation + 1 == generation && !reused;
+        if seen && !rates {
+            // Too soon since the rate baseline: keep it and the last rates
+            entry.memory_kb = memory_kb;
+            entry.generation = generation;
+            entry.name = stat.name;
+            return;
+        }
+        if !seen || elapsed <= 0.0 {
+            // First sighting: no interval to compute rates over yet
+            entry.cpu_percent = 0.0;
+            entry.io_bytes_per_sec = 0;
+        } else {
+            let ticks = stat.ticks.saturating_sub(entry.ticks) as f64;
+            entry.cpu_percent = (ticks / ticks_per_sec / elapsed * 100.0) as f32;
+            entry.io_bytes_per_sec = match (io_bytes, entry.io_bytes) {
+                (Some(bytes), Some(prev)) => (bytes.saturating_sub(prev) as f64 / elapsed) as u64,
+                _ => 0,
+            };
+        }
+        entry.ticks = stat.ticks;
+        entry.io_bytes = io_bytes;
+        entry.memory_kb = memory_kb;
+        entry.generation = generation;
+        entry.name = stat.name;
+    }
+
+    /// Read `/proc/<pid>/<file>` into the reused buffer
+    fn read(&mut self, dir_fd: i32, pid: u32, file: &[u8]) -> Option<usize> {
+        self.path.clear();
+        let _ = write!(self.path, "{}/", pid);
+        self.path.extend_from_slice(file);
+        self.path.push(0);
+        let fd = unsafe {
+            libc::openat(dir_fd, self.path.as_ptr() as *const libc::c_char, libc::O_RDONLY | libc::O_CLOEXEC)
+        };
+        if fd < 0 {
+            return None;
+        }
+        let n = unsafe { libc::read(fd, self.buf.as_mut_ptr() as *mut libc::c_void, self.buf.len()) };
+        unsafe { libc::close(fd) };
+        if n <= 0 {
+            None
+        } else {
+            Some(n as usize)
+        }
+    }
+
+    /// Fill `order` with the `k` highest-ranked (score, pid) pairs, best
+    /// first. Only the top k are sorted; the rest are partitioned away.
+    pub fn rank(&self, key: u32, k: usize, order: &mut Vec<(f64, u32)>) {
+        order.clear();
+        order.extend(self.table.values().map(|entry| (entry.score(key), entry.pid)));
+        let k = k.min(order.len());
+        let descending = |a: &(f64, u32), b: &(f64, u32)| b.0.total_cmp(&a.0);
+        if k == 0 {
+            order.clear();
+            return;
+        }
+        if k < order.len() {
+            order.select_nth_unstable_by(k - 1, descending);
+            order.truncate(k);
+        }
+        order.sort_unstable_by(descending);
+    }
+}
+
+impl Default for ProcScanner {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+impl Drop for ProcScanner {
+    fn drop(&mut self) {
+        if !self.dir.is_null() {
+            unsafe { libc::closedir(self.dir) };
+        }
+    }
+}
+
+fn parse_pid(name: &[u8]) -> Option<u32> {
+    if name.is_empty() || !name.iter().all(u8::is_ascii_digit) {
+        return None;
+    }
+    std::str::from_utf8(name).ok()?.parse().ok()
+}
+
+struct Stat {
+    name: [u8; PROCESS_NAME_LEN],
+    ticks: u64,
+    start_time: u64,
+    rss_pages: u64,
+}
+
+fn parse_stat(buf: &[u8]) -> Option<Stat> {
+    // The name is in parentheses and may itself contain ') '
+    let open = buf.iter().position(|&b| b == b'(')?;
+    let close = buf.iter().rposition(|&b| b == b')')?;
+    let mut name = [0; PROCESS_NAME_LEN];
+    copy_name(&mut name, std::str::from_utf8(buf.get(open + 1..close)?).unwrap_or(""));
+    let rest = buf.get(close + 2..)?;
+    // Fields after the name, starting at field 3 (state)
+    let mut fields = rest.split(|&b| b == b' ');
+    let mut field = |skip: usize| -> Option<u64> {
+        std::str::from_utf8(fields.nth(skip)?).ok()?.trim_end().parse().ok()
+    };
+    let utime = field(11)?;
+    let stime = field(0)?;
+    let start_time = field(6)?;
+    let rss_pages = field(1)?;
+    Some(Stat { name, ticks: utime + stime, start_time, rss_pages })
+}
+
+fn parse_io(buf: &[u8]) -> u64 {
+    let mut total = 0;
+    for line in buf.split(|&b| b == b'\n') {
+        let value = if let Some(v) = line.strip_prefix(b"read_bytes: ") {
+            v
+        } else if let Some(v) = line.strip_prefix(b"write_bytes: ") {
+            v
+        } else {
+            continue;
+        };
+        total += std::str::from_utf8(value).ok().and_then(|v| v.parse::<u64>().ok()).unwrap_or(0);
+    }
+    total
+}
@@ -3,14 +3,244 @@ Native backend support for high-performance monitoring
 Uses Rust implementation for all system monitoring
 """
 
+import ctypes
 import json
-from pathlib import Path
+import os
+import threading
+
+from . import selfstats
+
+# os.path rather than pathlib: pathlib's imports are a noticeable share of CLI startup
+_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "native")
+_RUST_LIB = os.path.join(_BASE_PATH, "rust", "target", "release", "libsysguard_monitor.so")
+
+# Subsystem flags understood by rust_collector_refresh (see lib.rs)
+REFRESH_CPU = 1 << 0
+REFRESH_MEMORY = 1 << 1
+REFRESH_DISK = 1 << 2
+REFRESH_PROCESSES = 1 << 3
+# Per-process IO rates cost an extra read per process, so they are opt-in
+REFRESH_PROCESS_IO = 1 << 4
+REFRESH_DISK_IO = 1 << 5
+REFRESH_NETWORK = 1 << 6
+# Walks the cgroup v2 hierarchy; opt-in like REFRESH_PROCESS_IO
+REFRESH_CGROUPS = 1 << 7
+REFRESH_ALL = (REFRESH_CPU | REFRESH_MEMORY | REFRESH_DISK | REFRESH_PROCESSES
+               | REFRESH_DISK_IO | REFRESH_NETWORK)
+
+# Process ranking keys understood by rust_collector_read_sorted (see procscan.rs)
+SORT_KEYS = {'cpu': 0, 'memory': 1, 'io': 2}
+
+PROCESS_NAME_LEN = 32
+CGROUP_PATH_LEN = 256
+
+
+class SgMetrics(ctypes.Structure):
+    """Scalar metrics, mirrors SgMetrics in lib.rs"""
+    _fields_ = [
+        ('mem_total_mb', ctypes.c_uint64),
+        ('mem_used_mb', ctypes.c_uint64),
+        ('mem_available_mb', ctypes.c_uint64),
+        ('disk_total_gb', ctypes.c_uint64),
+        ('disk_used_gb', ctypes.c_uint64),
+        ('disk_free_gb', ctypes.c_uint64),
+        ('load_avg_1', ctypes.c_double),
+        ('load_avg_5', ctypes.c_double),
+        ('load_avg_15', ctypes.c_double),
+        ('mem_percent', ctypes.c_double),
+        ('disk_percent', ctypes.c_double),
+        ('cpu_usage_percent', ctypes.c_float),
+        ('cores_logical', ctypes.c_uint32),
+        ('process_count', ctypes.c_uint32),
+        ('process_written', ctypes.c_uint32),
+    ]
+
+
+class SgProcess(ctypes.Structure):
+    """One process record, mirrors SgProcess in lib.rs"""
+    _fields_ = [
+        ('memory_kb', ctypes.c_uint64),
+        ('io_bytes_per_sec', ctypes.c_uint64),
+        ('start_time', ctypes.c_uint64),
+        ('pid', ctypes.c_uint32),
+        ('cpu_percent', ctypes.c_float),
+        ('name', ctypes.c_char * PROCESS_NAME_LEN),
+    ]
+
+
+class SgMount(ctypes.Structure):
+    """One real filesystem, mirrors SgMount in lib.rs"""
+    _fields_ = [
+        ('total_bytes', ctypes.c_uint64),
+        ('used_bytes', ctypes.c_uint64),
+        ('available_bytes', ctypes.c_uint64),
+        ('mount_point', ctypes.c_char * 128),
+        ('device', ctypes.c_char * 64),
+        ('fs_type', ctypes.c_char * 16),
+    ]
+
+
+class SgDeviceIo(ctypes.Structure):
+    """Block device rates, mirrors SgDeviceIo in lib.rs"""
+    _fields_ = [
+        ('read_bytes_per_sec', ctypes.c_double),
+        ('write_bytes_per_sec', ctypes.c_double),
+        ('reads_per_sec', ctypes.c_double),
+        ('writes_per_sec', ctypes.c_double),
+        ('util_percent', ctypes.c_double),
+        ('in_flight', ctypes.c_uint32),
+        ('name', ctypes.c_char * 28),
+    ]
+
+
+class SgInterfaceIo(ctypes.Structure):
+    """Network interface rates, mirrors SgInterfaceIo in lib.rs"""
+    _fields_ = [
+        ('rx_bytes_per_sec', ctypes.c_double),
+        ('tx_bytes_per_sec', ctypes.c_double),
+        ('rx_packets_per_sec', ctypes.c_double),
+        ('tx_packets_per_sec', ctypes.c_double),
+        ('errors_per_sec', ctypes.c_double),
+        ('drops_per_sec', ctypes.c_double),
+        ('name', ctypes.c_char * 16),
+    ]
+
+
+class SgCgroup(ctypes.Structure):
+    """One control group's usage, mirrors SgCgroup in lib.rs"""
+    _fields_ = [
+        ('cpu_percent', ctypes.c_double),
+        ('io_read_bytes_per_sec', ctypes.c_double),
+        ('io_write_bytes_per_sec', ctypes.c_double),
+        ('memory_bytes', ctypes.c_uint64),
+        ('memory_max_bytes', ctypes.c_uint64),
+        ('pids', ctypes.c_uint64),
+        ('path', ctypes.c_char * CGROUP_PATH_LEN),
+    ]
+
+
+_GB = 1024 ** 3
+_MB = 1024 ** 2
+
+_REFRESH_SECONDS = selfstats.histogram(
+    "sysguard_native_refresh_seconds", "Native collector refresh time")
+_FFI_READ_SECONDS = selfstats.histogram(
+    "sysguard_ffi_read_seconds", "Time reading collector results across the FFI")
+_JSON_DECODE_SECONDS = selfstats.histogram(
+    "sysguard_json_decode_seconds", "Time decoding JSON documents from the native library")
+
+
+def _mount_dict(m):
+    total, used = m.total_bytes, m.used_bytes
+    return {
+        "mount_point": m.mount_point.decode('utf-8', 'replace'),
+        "device": m.device.decode('utf-8', 'replace'),
+        "fs_type": m.fs_type.decode('utf-8', 'replace'),
+        "total_gb": total // _GB,
+        "used_gb": used // _GB,
+        "free_gb": m.available_bytes // _GB,
+        "percent": used / total * 100 if total else 0.0,
+    }
+
+
+def _cgroup_dict(g):
+    return {
+        "path": g.path.decode('utf-8', 'replace'),
+        "cpu_percent": g.cpu_percent,
+        "memory_mb": g.memory_bytes / _MB,
+        "memory_max_mb": g.memory_max_bytes / _MB if g.memory_max_bytes else None,
+        "io_read_bytes_per_sec": g.io_read_bytes_per_sec,
+        "io_write_bytes_per_sec": g.io_write_bytes_per_sec,
+        "pids": g.pids,
+    }
+
+
+def _record_dict(record):
+    return {name: getattr(record, name) for name, _ in record._fields_ if name != 'name'}
+
+
+def process_dtype():
+    """NumPy dtype of SgProcess records, as in Snapshot.process_table"""
+    import numpy as np
+    return np.dtype([
+        ('memory_kb', '<u8'),
+        ('io_bytes_per_sec', '<u8'),
+        ('start_time', '<u8'),
+        ('pid', '<u4'),
+        ('cpu_percent', '<f4'),
+        ('name', f'S{PROCESS_NAME_LEN}'),
+    ])
+
+
+def merge_details(doc, details):
+    """Fold read_details() output into a to_dict() metrics document"""
+    doc["cpu"]["per_core"] = details["per_core"]
+    doc["disk"]["mounts"] = details["mounts"]
+    doc["disk_io"] = details["disk_io"]
+    doc["network"] = details["network"]
+    return doc
+
+
+class NativeSample:
+    """
+    Zero-copy view over a collector's result buffers.
+
+    The buffers are reused by the next read, so copy anything that must
+    outlive the current tick.
+    """
+    __slots__ = ('metrics', 'processes', 'count')
+
+    def __init__(self, metrics, processes, count):
+        self.metrics = metrics
+        self.processes = processes
+        self.count = count
+
+    def process_array(self):
+        """Process records as a NumPy structured array sharing the buffer"""
+        import numpy as np
+        return np.frombuffer(self.processes, dtype=process_dtype(), count=self.count)
+
+    def to_dict(self, limit=None):
+        """Legacy JSON-shaped metrics document"""
+        m = self.metrics
+        count = self.count if limit is None else min(limit, self.count)
+        return {
+            "cpu": {
+                "usage_percent": m.cpu_usage_percent,
+                "cores_logical": m.cores_logical,
+                "load_avg_1": m.load_avg_1,
+                "load_avg_5": m.load_avg_5,
+                "load_avg_15": m.load_avg_15,
+            },
+            "memory": {
+                "total_mb": m.mem_total_mb,
+                "used_mb": m.mem_used_mb,
+                "available_mb": m.mem_available_mb,
+                "percent": m.mem_percent,
+            },
+            "disk": {
+                "total_gb": m.disk_total_gb,
+                "used_gb": m.disk_used_gb,
+                "free_gb": m.disk_free_gb,
+                "percent": m.disk_percent,
+            },
+            "top_processes": [
+                {
+                    "pid": p.pid,
+                    "name": p.name.decode('utf-8', 'replace'),
+                    "cpu_percent": p.cpu_percent,
+                    "memory_mb": p.memory_kb // 1024,
+                    "io_bytes_per_sec": p.io_bytes_per_sec,
+                }
+                for p in self.processes[:count]
+            ],
+        }
 
-_BASE_PATH = Path(__file__).parent / "native"
-_RUST_LIB = _BASE_PATH / "rust" / "target" / "release" / "libsysguard_monitor.so"
 
 _rust_lib = None
 _backend_checked = False
+_shared_collector = None
+_shared_lock = threading.Lock()
 
 
 def _init_rust():
@@ -20,36 +250,215 @@ def _init_rust():
         return _rust_lib is not None
     
     _backend_checked = True
-    if not _RUST_LIB.exists():
+    if not os.path.exists(_RUST_LIB):
         return False
     
     try:
-        import ctypes
-        _rust_lib = ctypes.CDLL(str(_RUST_LIB))
-        _rust_lib.rust_get_metrics_json.argtypes = [ctypes.c_size_t]
-        _rust_lib.rust_get_metrics_json.restype = ctypes.c_void_p
-        _rust_lib.rust_free_string.argtypes = [ctypes.c_void_p]
+        lib = ctypes.CDLL(_RUST_LIB)
+        lib.rust_get_metrics_json.argtypes = [ctypes.c_size_t]
+        lib.rust_get_metrics_json.restype = ctypes.c_void_p
+        lib.rust_free_string.argtypes = [ctypes.c_void_p]
+        lib.rust_collector_new.argtypes = []
+        lib.rust_collector_new.restype = ctypes.c_void_p
+        lib.rust_collector_refresh.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        lib.rust_collector_refresh.restype = None
+        lib.rust_collector_read_json.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        lib.rust_collector_read_json.restype = ctypes.c_void_p
+        lib.rust_collector_read.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(SgMetrics), ctypes.POINTER(SgProcess), ctypes.c_size_t
+        ]
+        lib.rust_collector_read.restype = ctypes.c_size_t
+        lib.rust_collector_read_sorted.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(SgMetrics), ctypes.POINTER(SgProcess), ctypes.c_size_t,
+            ctypes.c_uint32,
+        ]
+        lib.rust_collector_read_sorted.restype = ctypes.c_size_t
+        for name, struct in (('rust_collector_read_cores', ctypes.c_float),
+                             ('rust_collector_read_mounts', SgMount),
+                             ('rust_collector_read_disk_io', SgDeviceIo),
+                             ('rust_collector_read_network', SgInterfaceIo),
+                             ('rust_collector_read_cgroups', SgCgroup)):
+            fn = getattr(lib, name)
+            fn.argtypes = [ctypes.c_void_p, ctypes.POINTER(struct), ctypes.c_size_t]
+            fn.restype = ctypes.c_size_t
+        lib.rust_collector_set_cgroup_root.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint32]
+        lib.rust_collector_set_cgroup_root.restype = None
+        lib.rust_collector_free.argtypes = [ctypes.c_void_p]
+        lib.rust_collector_free.restype = None
+        _rust_lib = lib
         return True
     except Exception:
         return False
 
 
+def _take_string(ptr):
+    """Copy out and free a string returned by the Rust library"""
+    try:
+        return ctypes.string_at(ptr)
+    finally:
+        _rust_lib.rust_free_string(ptr)
+
+
+class NativeCollector:
+    """
+    Long-lived handle onto the Rust collector.
+
+    The native side keeps its sysinfo state between samples, so a refresh
+    only re-reads the subsystems asked for and CPU usage is the delta since
+    the previous refresh (no sleep on the sampling path). Results are read
+    into caller-owned ctypes buffers that are reused between calls.
+    """
+
+    def __init__(self, capacity=64):
+        if not _init_rust():
+            raise RuntimeError("Native backend not available. Run: ./scripts/buildnative.sh")
+        self._handle = _rust_lib.rust_collector_new()
+        self._lock = threading.Lock()
+        self._metrics = SgMetrics()
+        self._procs = (SgProcess * capacity)()
+        # Buffers for the variable-length readers, grown when outgrown
+        self._arrays = {}
+
+    def refresh(self, what=REFRESH_ALL):
+        """Refresh the selected subsystems (REFRESH_* flags)"""
+        with self._lock, _REFRESH_SECONDS.time():
+            if self._handle:
+                _rust_lib.rust_collector_refresh(self._handle, what)
+
+    def read_into(self, limit=None, sort_by='cpu'):
+        """
+        Read into the reusable buffers and return a NativeSample view.
+        limit=None reads the whole process table, growing the buffer as needed.
+        sort_by ranks the records: 'cpu', 'memory' or 'io'.
+        """
+        key = SORT_KEYS[sort_by]
+        with self._lock, _FFI_READ_SECONDS.time():
+            if not self._handle:
+                return None
+            if limit is not None and limit > len(self._procs):
+                self._procs = (SgProcess * limit)()
+            capacity = len(self._procs) if limit is None else limit
+            count = _rust_lib.rust_collector_read_sorted(
+                self._handle, self._metrics, self._procs, capacity, key)
+            if limit is None and self._metrics.process_count > len(self._procs):
+                # Table outgrew the buffer: resize with headroom and read again
+                self._procs = (SgProcess * (self._metrics.process_count * 5 // 4 + 16))()
+                count = _rust_lib.rust_collector_read_sorted(
+                    self._handle, self._metrics, self._procs, len(self._procs), key)
+            return NativeSample(self._metrics, self._procs, count)
+
+    def _read_array(self, fn, struct, convert, initial=16):
+        """
+        Call a rust_collector_read_* array reader into a reused buffer (grown
+        to fit) and convert the records before the buffer can be reused.
+        """
+        with self._lock, _FFI_READ_SECONDS.time():
+            if not self._handle:
+                return []
+            buffer = self._arrays.get(fn)
+            if buffer is None:
+                buffer = self._arrays[fn] = (struct * initial)()
+            total = getattr(_rust_lib, fn)(self._handle, buffer, len(buffer))
+            if total > len(buffer):
+                buffer = self._arrays[fn] = (struct * (total * 2))()
+                total = getattr(_rust_lib, fn)(self._handle, buffer, len(buffer))
+            return [convert(record) for record in buffer[:min(total, len(buffer))]]
+
+    def read_details(self):
+        """
+        Variable-length metrics: per-core CPU, real mounts (bind mounts and
+        pseudo filesystems excluded), and block device and network rates
+        keyed by name.
+        """
+        named = lambda r: (r.name.decode('utf-8', 'replace'), _record_dict(r))
+        return {
+            "per_core": self._read_array('rust_collector_read_cores', ctypes.c_float, float, 64),
+            "mounts": self._read_array('rust_collector_read_mounts', SgMount, _mount_dict),
+            "disk_io": dict(self._read_array('rust_collector_read_disk_io', SgDeviceIo, named)),
+            "network": dict(self._read_array('rust_collector_read_network', SgInterfaceIo, named)),
+        }
+
+    def read_cgroups(self):
+        """
+        Usage of every control group below the cgroup root as of the last
+        REFRESH_CGROUPS refresh, ordered by path. memory_max_mb is None
+        when the group has no memory limit.
+        """
+        return self._read_array('rust_collector_read_cgroups', SgCgroup, _cgroup_dict, 64)
+
+    def set_cgroup_root(self, root, max_depth=4):
+        """Walk the cgroup v2 hierarchy (or a fixture tree) at root, max_depth levels deep"""
+        with self._lock:
+            if self._handle:
+                _rust_lib.rust_collector_set_cgroup_root(self._handle, os.fsencode(root), max_depth)
+
+    def read(self, limit=5):
+        """Read the metrics held by the collector as a plain dict"""
+        sample = self.read_into(limit)
+        if sample is None:
+            return None
+        return merge_details(sample.to_dict(), self.read_details())
+
+    def read_json_bytes(self, limit=5):
+        """Undecoded document from the JSON interface (used by the native web server)"""
+        with self._lock, _FFI_READ_SECONDS.time():
+            if not self._handle:
+                return None
+            ptr = _rust_lib.rust_collector_read_json(self._handle, limit)
+            if not ptr:
+                return None
+            return _take_string(ptr)
+
+    def read_json(self, limit=5):
+        """Read through the JSON interface as a plain dict"""
+        data = self.read_json_bytes(limit)
+        if data is None:
+            return None
+        with _JSON_DECODE_SECONDS.time():
+            return json.loads(data)
+
+    def sample(self, limit=5, what=REFRESH_ALL):
+        """Refresh then read in one step"""
+        self.refresh(what)
+        return self.read(limit)
+
+    def close(self):
+        with self._lock:
+            if self._handle:
+                _rust_lib.rust_collector_free(self._handle)
+                self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def get_collector():
+    """Return the process-wide collector, creating it on first use"""
+    global _shared_collector
+    if _shared_collector is None:
+        with _shared_lock:
+            if _shared_collector is None:
+                _shared_collector = NativeCollector()
+    return _shared_collector
+
+
 def get_metrics_rust(limit=5):
     """Get metrics using Rust backend"""
     if not _init_rust():
         return None
     
     try:
-        import ctypes
-        ptr = _rust_lib.rust_get_metrics_json(limit)
-        if not ptr:
-            return None
-        json_bytes = ctypes.string_at(ptr)
-        json_str = json_bytes.decode('utf-8')
-        metrics = json.loads(json_str)
-        _rust_lib.rust_free_string(ptr)
-        return metrics
-    except Exception as e:
+        return get_collector().sample(limit)
+    except Exception:
         return None
 
 
@@ -3,39 +3,32 @@ Process monitoring - Native backend wrapper
 Requires Rust/C native backends to be built
 """
 
-from .native_backend import get_metrics_rust
+from . import procfs
+from .snapshot import current_snapshot, get_sampler
 
-def get_process_metrics(limit=5, sort_by='cpu'):
+def get_process_metrics(limit=5, sort_by='cpu', snapshot=None, fields=None):
     """
-    Returns a list of top resource-consuming processes from native Rust backend.
-    sort_by: 'cpu' or 'memory' (currently only 'cpu' is implemented in native)
+    Returns a list of top resource-consuming processes from the shared snapshot.
+    sort_by: 'cpu', 'memory' or 'io' (IO needs configure_sampler(track_io=True);
+    rates start one interval after it is set)
+    snapshot: rank this snapshot's processes instead; 'memory' and 'io' then
+    need its process table (see Snapshot.ranked_processes).
+    fields: names from procfs.FIELDS to return (default: the snapshot record).
+    Extended fields such as cmdline or num_fds are read only for the returned
+    processes.
     """
-    metrics = get_metrics_rust(limit=limit)
-    if metrics and 'top_processes' in metrics:
-        processes = metrics['top_processes']
-        total_memory = get_total_memory()
-        
-        return [
-            {
-                'pid': p['pid'],
-                'name': p['name'],
-                'cpu_percent': p['cpu_percent'],
-                'memory_percent': (p['memory_mb'] / total_memory) * 100 if p.get('memory_mb') and total_memory > 0 else 0,
-                'username': 'unknown'
-            }
-            for p in processes
-        ]
-    raise RuntimeError("Native backend not available. Run: ./scripts/buildnative.sh")
+    if fields is not None:
+        procfs.validate(fields)
+    if snapshot is not None:
+        processes = snapshot.ranked_processes(limit, sort_by)
+    elif sort_by != 'cpu':
+        current_snapshot(process_limit=limit)
+        processes = get_sampler().top_processes(limit, sort_by)
+    else:
+        snapshot = current_snapshot(process_limit=limit)
+        processes = [dict(p) for p in snapshot.processes[:limit]]
+    return processes if fields is None else procfs.project(processes, fields)
 
-def get_total_memory():
-    """Helper to get total memory for percentage calculation (cached)."""
-    from .memory import get_memory_metrics
-    mem = get_memory_metrics()
-    return mem['total_mb']
-
-_process_cache = []
-_cache_timestamp = 0
-
-def get_process_list(limit=10):
+def get_process_list(limit=10, snapshot=None, fields=None):
     """Alias for get_process_metrics for API compatibility"""
-    return get_process_metrics(limit)
+    return get_process_metrics(limit, snapshot=snapshot, fields=fields)
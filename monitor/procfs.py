@@ -0,0 +1,183 @@
+"""
+Extended per-process attributes read from /proc on demand.
+
+The native scanner ranks every process from its stat file alone. Anything
+richer (user, threads, IO totals, open files, command line) is read here
+for the few records that survive the top-k cut, opening only the files the
+requested fields need, relative to one held /proc descriptor.
+"""
+
+import os
+import pwd
+import threading
+import time
+
+# Fields every ranked record already carries
+BASE_FIELDS = ('pid', 'name', 'cpu_percent', 'memory_mb', 'memory_percent', 'io_bytes_per_sec')
+
+# Extended field -> /proc/<pid>/ entry it is read from
+EXTENDED_FIELDS = {
+    'uid': 'status',
+    'username': 'status',
+    'num_threads': 'status',
+    'io_read_bytes': 'io',
+    'io_write_bytes': 'io',
+    'num_fds': 'fd',
+    'cmdline': 'cmdline',
+}
+
+FIELDS = BASE_FIELDS + tuple(EXTENDED_FIELDS)
+
+_proc_fd = None
+_proc_lock = threading.Lock()
+
+
+def _proc_dir():
+    global _proc_fd
+    if _proc_fd is None:
+        with _proc_lock:
+            if _proc_fd is None:
+                _proc_fd = os.open('/proc', os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    return _proc_fd
+
+
+def _read(pid, name):
+    fd = os.open(f"{pid}/{name}", os.O_RDONLY | os.O_CLOEXEC, dir_fd=_proc_dir())
+    try:
+        return os.read(fd, 65536)
+    finally:
+        os.close(fd)
+
+
+class UserNames:
+    """
+    uid -> user name from a parsed copy of /etc/passwd, re-read only when
+    the file changes. Uids missing from the file (NSS, LDAP) fall back to
+    one pwd lookup each, remembered until the next reload.
+    """
+
+    def __init__(self, path='/etc/passwd', check_every=10.0):
+        self.path = path
+        self.check_every = check_every
+        self._names = {}
+        self._stamp = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_every:
+            return
+        self._checked = now
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp and self._names:
+            return
+        names = {}
+        try:
+            with open(self.path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    parts = line.split(':', 3)
+                    if len(parts) == 4 and parts[2].isdigit():
+                        names.setdefault(int(parts[2]), parts[0])
+        except OSError:
+            pass
+        self._names = names
+        self._stamp = stamp
+
+    def get(self, uid):
+        with self._lock:
+            self._refresh()
+            name = self._names.get(uid)
+            if name is None:
+                try:
+                    name = pwd.getpwuid(uid).pw_name
+                except KeyError:
+                    name = str(uid)
+                self._names[uid] = name
+            return name
+
+
+users = UserNames()
+
+
+def _parse_status(data, out):
+    for line in data.split(b'\n'):
+        if line.startswith(b'Uid:'):
+            uid = int(line.split()[1])
+            out['uid'] = uid
+            out['username'] = users.get(uid)
+        elif line.startswith(b'Threads:'):
+            out['num_threads'] = int(line.split()[1])
+
+
+def _parse_io(data, out):
+    for line in data.split(b'\n'):
+        if line.startswith(b'read_bytes:'):
+            out['io_read_bytes'] = int(line.split()[1])
+        elif line.startswith(b'write_bytes:'):
+            out['io_write_bytes'] = int(line.split()[1])
+
+
+def _count_fds(pid):
+    fd = os.open(f"{pid}/fd", os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC, dir_fd=_proc_dir())
+    try:
+        return len(os.listdir(fd))
+    finally:
+        os.close(fd)
+
+
+def read_attributes(pid, fields):
+    """
+    Extended attributes of one process, reading each needed /proc entry
+    once. Fields that cannot be read (process gone, no permission) are None.
+    """
+    sources = {EXTENDED_FIELDS[f] for f in fields if f in EXTENDED_FIELDS}
+    out = dict.fromkeys(f for f in fields if f in EXTENDED_FIELDS)
+    for source in sources:
+        try:
+            if source == 'status':
+                _parse_status(_read(pid, 'status'), out)
+            elif source == 'io':
+                _parse_io(_read(pid, 'io'), out)
+            elif source == 'fd':
+                out['num_fds'] = _count_fds(pid)
+            elif source == 'cmdline':
+                args = _read(pid, 'cmdline').rstrip(b'\0').replace(b'\0', b' ')
+                out['cmdline'] = args.decode('utf-8', 'replace')
+        except (OSError, ValueError, IndexError):
+            continue
+    return {f: out[f] for f in fields if f in EXTENDED_FIELDS}
+
+
+def validate(fields):
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown process field(s): {', '.join(unknown)}")
+
+
+def annotate(processes, fields):
+    """Add the extended `fields` to each record dict in place"""
+    extended = [f for f in fields if f in EXTENDED_FIELDS]
+    if extended:
+        for p in processes:
+            p.update(read_attributes(p['pid'], extended))
+    return processes
+
+
+def project(processes, fields):
+    """
+    Records with only the requested fields. Extended fields a record does
+    not already carry are read from /proc for that record alone.
+    """
+    fields = tuple(fields)
+    validate(fields)
+    result = []
+    for p in processes:
+        missing = [f for f in fields if f in EXTENDED_FIELDS and f not in p]
+        extra = read_attributes(p['pid'], missing) if missing else {}
+        result.append({f: extra[f] if f in extra else p.get(f) for f in fields})
+    return result
@@ -0,0 +1,177 @@
+"""
+Adaptive sampling
+Stretches the sampling interval while every watched metric is far from its
+limit and tightens it as one approaches, and refreshes expensive
+collectors on slower cadences than cheap ones.
+"""
+
+from .native_backend import (
+    REFRESH_CGROUPS, REFRESH_CPU, REFRESH_DISK, REFRESH_DISK_IO, REFRESH_MEMORY, REFRESH_NETWORK,
+    REFRESH_PROCESSES,
+)
+
+# Collector name -> refresh flag
+COLLECTORS = {
+    'cpu': REFRESH_CPU,
+    'memory': REFRESH_MEMORY,
+    'disk': REFRESH_DISK,
+    'processes': REFRESH_PROCESSES,
+    'disk_io': REFRESH_DISK_IO,
+    'network': REFRESH_NETWORK,
+    # Only refreshed when the sampler tracks cgroups
+    'cgroups': REFRESH_CGROUPS,
+}
+
+# Minimum seconds between refreshes; collectors not listed refresh every tick.
+# CPU, memory and load average are single /proc reads; the process table
+# walks every /proc/<pid> and mount usage calls statvfs per filesystem.
+DEFAULT_CADENCE = {
+    'processes': 5.0,
+    'disk': 30.0,
+}
+
+# Flattened metric prefix -> collector that refreshes it
+_METRIC_COLLECTORS = (('cpu_', 'cpu'), ('memory_', 'memory'), ('disk_', 'disk'))
+
+
+def _flatten(snapshot):
+    flat = {f"cpu_{k}": v for k, v in snapshot.cpu.items() if isinstance(v, (int, float))}
+    for window, value in zip((1, 5, 15), snapshot.cpu.get('load_avg', ())):
+        flat[f"cpu_load_avg_{window}"] = value
+    flat.update((f"memory_{k}", v) for k, v in snapshot.memory.items())
+    flat.update((f"disk_{k}", v) for k, v in snapshot.disk.items())
+    return flat
+
+
+def _closeness(value, direction, limit):
+    """1.0 at the limit, 0 far below it; above 1.0 once the limit is crossed"""
+    if direction == '>':
+        return value / limit if limit > 0 else float('inf') if value > limit else 0.0
+    return limit / value if value > 0 else float('inf')
+
+
+class AdaptiveScheduler:
+    """
+    Picks the interval until the next sample from how close the metrics
+    are to their limits: max_interval while every metric is below `calm`
+    of its limit, min_interval at or past a limit, and geometrically in
+    between. A metric's closeness also counts where it would be one
+    current interval later at its current rate of change, so a fast climb
+    tightens sampling before the metric gets near. Once a metric is past
+    the midpoint between `calm` and its limit, the collector behind it
+    refreshes every tick regardless of its cadence.
+
+    limits are (flattened metric, '>' or '<', limit) triples, as returned
+    by autofix.rules.threshold_limits.
+    """
+
+    def __init__(self, limits, min_interval=0.5, max_interval=10.0, cadence=None, calm=0.7):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("need 0 < min_interval <= max_interval")
+        self.limits = list(limits)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.calm = calm
+        self.cadence = {**DEFAULT_CADENCE, **(cadence or {})}
+        unknown = set(self.cadence) - set(COLLECTORS)
+        if unknown:
+            raise ValueError(f"Unknown collector(s) {', '.join(sorted(unknown))}, "
+                             f"expected {', '.join(COLLECTORS)}")
+        self.interval = min_interval
+        # (metric, closeness) of the metric nearest its limit at the last sample
+        self.closest = (None, 0.0)
+        self._last_refresh = {}
+        self._previous = None
+        # Collectors refreshed every tick while one of their metrics is near a limit
+        self._urgent = set()
+        self._urgent_at = (1.0 + calm) / 2
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Scheduler for monitoring.adaptive, watching monitoring.thresholds and
+        the triggers of enabled autofix rules; None when adaptive sampling is off.
+        """
+        from autofix.rules import ALIASES, threshold_limits
+        monitoring = config.get('monitoring', {})
+        adaptive = monitoring.get('adaptive') or {}
+        if not adaptive.get('enabled', False):
+            return None
+        limits = [(ALIASES.get(name, name), '>', float(limit))
+                  for name, limit in (monitoring.get('thresholds') or {}).items()]
+        autofix = config.get('autofix') or {}
+        if autofix.get('enabled', False):
+            for rule in autofix.get('rules') or []:
+                limits.extend(threshold_limits(rule['trigger']))
+        base = monitoring.get('interval', 1.0)
+        return cls(limits,
+                   min_interval=adaptive.get('min_interval', min(base, 0.5)),
+                   max_interval=adaptive.get('max_interval', max(base, 10.0)),
+                   cadence=adaptive.get('cadence'),
+                   calm=adaptive.get('calm', 0.7))
+
+    def refresh_flags(self, now):
+        """REFRESH_* flags of the collectors due at monotonic time `now`, marked as refreshed"""
+        flags = 0
+        for name, flag in COLLECTORS.items():
+            every = self.cadence.get(name, 0.0)
+            last = self._last_refresh.get(name)
+            # Small slack so a cadence equal to the interval is not pushed a tick late
+            if (last is None or name in self._urgent or now - last >= every - self.min_interval / 2):
+                flags |= flag
+                self._last_refresh[name] = now
+        return flags
+
+    def observe(self, snapshot):
+        """Update the interval from a new snapshot and return it"""
+        flat = _flatten(snapshot)
+        previous, self._previous = self._previous, (snapshot.timestamp, flat)
+        closest, nearest = None, 0.0
+        urgent = set()
+        for metric, direction, limit in self.limits:
+            value = flat.get(metric)
+            if value is None or value != value:
+                continue
+            closeness = _closeness(value, direction, limit)
+            if previous is not None and snapshot.timestamp > previous[0]:
+                before = previous[1].get(metric)
+                if before is not None:
+                    slope = (value - before) / (snapshot.timestamp - previous[0])
+                    closeness = max(closeness, _closeness(value + slope * self.interval, direction, limit))
+            if closeness > nearest:
+                closest, nearest = metric, closeness
+            if closeness >= self._urgent_at:
+                urgent.update(c for prefix, c in _METRIC_COLLECTORS if metric.startswith(prefix))
+        self._urgent = urgent
+        self.closest = (closest, nearest)
+        self.interval = self._interval(nearest)
+        return self.interval
+
+    def _interval(self, closeness):
+        if closeness >= 1.0:
+            return self.min_interval
+        if closeness <= self.calm:
+            return self.max_interval
+        position = (closeness - self.calm) / (1.0 - self.calm)
+        return self.max_interval * (self.min_interval / self.max_interval) ** position
+
+
+def native_environment(config):
+    """
+    SYSGUARD_SAMPLE_* variables giving the native web server the same
+    schedule; without adaptive sampling it keeps its fixed one-second tick.
+    """
+    scheduler = AdaptiveScheduler.from_config(config)
+    if scheduler is None:
+        return {'SYSGUARD_SAMPLE_MIN_MS': '1000', 'SYSGUARD_SAMPLE_MAX_MS': '1000',
+                'SYSGUARD_SAMPLE_PROCESS_MS': '0', 'SYSGUARD_SAMPLE_DISK_MS': '0'}
+    ms = lambda seconds: str(int(seconds * 1000))
+    return {
+        'SYSGUARD_SAMPLE_MIN_MS': ms(scheduler.min_interval),
+        'SYSGUARD_SAMPLE_MAX_MS': ms(scheduler.max_interval),
+        'SYSGUARD_SAMPLE_PROCESS_MS': ms(scheduler.cadence.get('processes', 0)),
+        'SYSGUARD_SAMPLE_DISK_MS': ms(scheduler.cadence.get('disk', 0)),
+        'SYSGUARD_SAMPLE_CALM': str(scheduler.calm),
+        'SYSGUARD_SAMPLE_LIMITS': ','.join(f"{metric}{direction}{limit:g}"
+                                           for metric, direction, limit in scheduler.limits),
+    }
@@ -0,0 +1,204 @@
+"""
+SysGuard's own overhead
+Fixed-bucket histograms, counters and gauges for the hot paths, rendered
+in the Prometheus text format on /metrics and by `run.py stats`.
+
+Recording is a perf_counter pair, a bisect over the bucket bounds and a
+few integer increments under a per-metric lock, so it can stay on in
+production.
+"""
+
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, shared with api/native/webserver.c
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # One slot per bound plus the +Inf overflow
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            yield f'{self.name}_bucket{{le="{bound:g}"}}', cumulative
+        yield f'{self.name}_bucket{{le="+Inf"}}', count
+        yield f'{self.name}_sum', total
+        yield f'{self.name}_count', count
+
+
+class Counter:
+    """A running total, or one read from `fn` at render time"""
+    kind = 'counter'
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def samples(self):
+        yield self.name, self.fn() if self.fn is not None else self.value
+
+
+class Gauge:
+    """A set value, or one read from `fn` at render time"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        yield self.name, self.fn() if self.fn is not None else self.value
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def histogram(name, help, buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help, buckets))
+
+
+def counter(name, help, fn=None):
+    return _register(Counter(name, help, fn))
+
+
+def gauge(name, help, fn=None):
+    return _register(Gauge(name, help, fn))
+
+
+def _resident_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+counter("process_cpu_seconds_total", "User and system CPU time of this process", _cpu_seconds)
+gauge("process_resident_memory_bytes", "Resident memory of this process", _resident_bytes)
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, value in metric.samples():
+            lines.append(f"{name} {value:g}" if isinstance(value, float) else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def parse(text):
+    """
+    Read the text format back into {name: {'type', 'samples'}} where samples
+    maps the full sample name (labels included) to its value.
+    """
+    metrics = {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(None, 3)
+            metrics[name] = {'type': kind, 'samples': {}}
+        elif line and not line.startswith('#'):
+            sample, _, value = line.rpartition(' ')
+            base = sample.split('{', 1)[0]
+            for suffix in ('_bucket', '_sum', '_count'):
+                if base.endswith(suffix) and base[:-len(suffix)] in metrics:
+                    base = base[:-len(suffix)]
+                    break
+            metrics.setdefault(base, {'type': 'untyped', 'samples': {}})['samples'][sample] = float(value)
+    return metrics
+
+
+def summarize(name, metric):
+    """
+    (count, mean, p50, p99) for a parsed histogram; percentiles are the
+    upper bound of the bucket they fall in.
+    """
+    samples = metric['samples']
+    count = samples.get(f'{name}_count', 0)
+    if not count:
+        return 0, None, None, None
+    buckets = []
+    for sample, cumulative in samples.items():
+        if sample.startswith(f'{name}_bucket{{le="'):
+            bound = sample[len(name) + 12:-2]
+            buckets.append((float('inf') if bound == '+Inf' else float(bound), cumulative))
+    buckets.sort()
+
+    def quantile(q):
+        for bound, cumulative in buckets:
+            if cumulative >= q * count:
+                return bound
+        return float('inf')
+
+    return int(count), samples[f'{name}_sum'] / count, quantile(0.5), quantile(0.99)
@@ -0,0 +1,350 @@
+"""
+Shared metric snapshots
+Collects native metrics once per tick so every consumer reads the same data
+"""
+
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from . import procfs, selfstats
+from .native_backend import (
+    REFRESH_ALL, REFRESH_CGROUPS, REFRESH_PROCESS_IO, REFRESH_PROCESSES, SORT_KEYS, get_collector,
+    merge_details, use_native_backend,
+)
+
+_NATIVE_MISSING = "Native backend not available. Run: ./scripts/buildnative.sh"
+
+_SAMPLE_SECONDS = selfstats.histogram(
+    "sysguard_sample_seconds", "Time to collect one snapshot, refresh to published")
+
+
+def _frozen(value):
+    # Nested lists become tuples and nested dicts read-only views, so nothing
+    # reachable from a shared snapshot can be modified in place
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, Mapping):
+        return _freeze(value)
+    return value
+
+
+def _freeze(d):
+    return MappingProxyType({k: _frozen(v) for k, v in d.items()})
+
+
+def thaw(value):
+    """Plain, mutable copy of frozen snapshot data (dicts and lists), e.g. for JSON"""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _cpu_from_raw(cpu):
+    return {
+        "usage_percent": cpu['usage_percent'],
+        "cores_logical": cpu['cores_logical'],
+        "cores_physical": cpu.get('cores_physical', cpu['cores_logical'] // 2),
+        "load_avg": [cpu['load_avg_1'], cpu['load_avg_5'], cpu['load_avg_15']],
+        "per_core": list(cpu.get('per_core', [])),
+    }
+
+
+def _processes_from_raw(processes, total_mb):
+    return [
+        {
+            'pid': p['pid'],
+            'name': p['name'],
+            'cpu_percent': p['cpu_percent'],
+            'memory_mb': p.get('memory_mb', 0),
+            'memory_percent': (p['memory_mb'] / total_mb) * 100 if p.get('memory_mb') and total_mb > 0 else 0,
+            'io_bytes_per_sec': p.get('io_bytes_per_sec', 0),
+            'username': p.get('username', 'unknown')
+        }
+        for p in processes
+    ]
+
+
+def _cgroups_from_raw(groups, total_mb):
+    return [
+        dict(g,
+             memory_percent=g['memory_mb'] / total_mb * 100 if total_mb > 0 else 0,
+             memory_limit_percent=g['memory_mb'] / g['memory_max_mb'] * 100 if g['memory_max_mb'] else 0)
+        for g in groups
+    ]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One immutable sample of every subsystem, shared by all consumers of a tick."""
+    timestamp: float
+    cpu: MappingProxyType
+    memory: MappingProxyType
+    disk: MappingProxyType
+    processes: tuple
+    process_limit: int
+    # Whole process table as a NumPy structured array (pid, name, cpu_percent,
+    # memory_kb, io_bytes_per_sec), present when the sampler runs with full_process_table
+    process_table: object = None
+    # Block device and network interface rates keyed by name
+    disk_io: MappingProxyType = field(default_factory=lambda: _freeze({}))
+    network: MappingProxyType = field(default_factory=lambda: _freeze({}))
+    # Per-cgroup usage ordered by path, present when the sampler runs with track_cgroups
+    cgroups: tuple = ()
+
+    @classmethod
+    def from_raw(cls, raw, process_limit, timestamp=None, process_table=None):
+        """Build a snapshot from the native backend's metrics document"""
+        memory = raw['memory']
+        processes = _processes_from_raw(raw.get('top_processes', []), memory.get('total_mb', 0))
+        return cls(
+            timestamp=time.time() if timestamp is None else timestamp,
+            cpu=_freeze(_cpu_from_raw(raw['cpu'])),
+            memory=_freeze(memory),
+            disk=_freeze(raw['disk']),
+            processes=tuple(_freeze(p) for p in processes),
+            process_limit=process_limit,
+            process_table=process_table,
+            disk_io=_freeze(raw.get('disk_io', {})),
+            network=_freeze(raw.get('network', {})),
+            cgroups=tuple(_freeze(g) for g in _cgroups_from_raw(raw.get('cgroups', ()),
+                                                                 memory.get('total_mb', 0))),
+        )
+
+    @classmethod
+    def from_dict(cls, doc, process_table=None):
+        """Rebuild a snapshot from to_dict() output, e.g. a recording"""
+        processes = doc.get('processes', ())
+        return cls(
+            timestamp=doc['timestamp'],
+            cpu=_freeze(doc['cpu']),
+            memory=_freeze(doc['memory']),
+            disk=_freeze(doc['disk']),
+            processes=tuple(_freeze(p) for p in processes),
+            process_limit=len(processes),
+            process_table=process_table,
+            disk_io=_freeze(doc.get('disk_io', {})),
+            network=_freeze(doc.get('network', {})),
+            cgroups=tuple(_freeze(g) for g in doc.get('cgroups', ())),
+        )
+
+    def ranked_processes(self, limit, sort_by='cpu'):
+        """
+        Top `limit` processes of this snapshot ranked by 'cpu', 'memory' or
+        'io'. Only CPU-ranked records are kept per tick, so the other keys
+        need the full process table (Sampler(full_process_table=True)).
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort_by}'")
+        if sort_by == 'cpu':
+            return [dict(p) for p in self.processes[:limit]]
+        if self.process_table is None:
+            raise ValueError(f"Snapshot has no process table to rank by '{sort_by}'")
+        table = self.process_table
+        column = table['memory_kb' if sort_by == 'memory' else 'io_bytes_per_sec']
+        rows = column.argsort(kind='stable')[::-1][:limit]
+        raw = [
+            {
+                'pid': int(r['pid']),
+                'name': r['name'].decode('utf-8', 'replace'),
+                'cpu_percent': float(r['cpu_percent']),
+                'memory_mb': int(r['memory_kb']) // 1024,
+                'io_bytes_per_sec': int(r['io_bytes_per_sec']),
+            }
+            for r in table[rows]
+        ]
+        procfs.annotate(raw, ('username',))
+        return _processes_from_raw(raw, self.memory.get('total_mb', 0))
+
+    def age(self):
+        return time.time() - self.timestamp
+
+    def to_dict(self, process_limit=None):
+        """Plain-dict copy for JSON serialization"""
+        processes = self.processes if process_limit is None else self.processes[:process_limit]
+        doc = {
+            "cpu": thaw(self.cpu),
+            "memory": thaw(self.memory),
+            "disk": thaw(self.disk),
+            "processes": [dict(p) for p in processes],
+            "disk_io": thaw(self.disk_io),
+            "network": thaw(self.network),
+            "timestamp": self.timestamp,
+        }
+        if self.cgroups:
+            doc["cgroups"] = [dict(g) for g in self.cgroups]
+        return doc
+
+
+class Sampler:
+    """
+    Collects one Snapshot per interval from the shared native collector.
+
+    Consumers call latest()/get() instead of scanning themselves, so the
+    collection cost stays the same no matter how many readers there are.
+    start() moves collection onto a background thread. With
+    full_process_table each snapshot also carries a copy of the whole
+    process table for batched per-process rules. With track_io each refresh
+    also reads per-process IO counters so processes can be ranked by IO.
+    With track_cgroups each snapshot also carries per-cgroup usage.
+    With a scheduler (monitor/scheduler.py) each collection refreshes only
+    the collectors that are due, and next_interval() follows the scheduler.
+    """
+
+    def __init__(self, interval=1.0, process_limit=10, full_process_table=False, track_io=False,
+                 scheduler=None, track_cgroups=False):
+        self.interval = interval
+        self.process_limit = process_limit
+        self.full_process_table = full_process_table
+        self.track_io = track_io
+        self.track_cgroups = track_cgroups
+        self.scheduler = scheduler
+        self._latest = None
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def collect(self, process_limit=None):
+        """Take a new sample now and publish it as the latest snapshot"""
+        if not use_native_backend():
+            raise RuntimeError(_NATIVE_MISSING)
+        limit = max(process_limit or 0, self.process_limit)
+        scheduler = self.scheduler
+        with self._collect_lock, _SAMPLE_SECONDS.time():
+            collector = get_collector()
+            what = scheduler.refresh_flags(time.monotonic()) if scheduler else REFRESH_ALL
+            if self.track_io and what & REFRESH_PROCESSES:
+                what |= REFRESH_PROCESS_IO
+            if not self.track_cgroups:
+                what &= ~REFRESH_CGROUPS
+            elif scheduler is None:
+                what |= REFRESH_CGROUPS
+            collector.refresh(what)
+            # Binary read into reused buffers; only the top `limit` records become dicts
+            sample = collector.read_into(None if self.full_process_table else limit)
+            if sample is None:
+                raise RuntimeError(_NATIVE_MISSING)
+            # The buffer is reused by the next read, so the snapshot keeps a copy
+            table = sample.process_array().copy() if self.full_process_table else None
+            raw = merge_details(sample.to_dict(limit), collector.read_details())
+            # Owners are read for the ranked records only, not the whole table
+            procfs.annotate(raw['top_processes'], ('username',))
+            if self.track_cgroups:
+                raw['cgroups'] = collector.read_cgroups()
+            snapshot = Snapshot.from_raw(raw, limit, process_table=table)
+            if scheduler:
+                scheduler.observe(snapshot)
+            with self._lock:
+                self._latest = snapshot
+        return snapshot
+
+    def next_interval(self):
+        """Seconds until the next sample is due"""
+        return self.scheduler.interval if self.scheduler else self.interval
+
+    def top_processes(self, limit, sort_by='cpu'):
+        """
+        Top `limit` processes from the latest refresh ranked by sort_by
+        ('cpu', 'memory' or 'io'), without collecting a new sample.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort_by}'")
+        if sort_by == 'io' and not self.track_io:
+            # Reading /proc/<pid>/io for every process is costly, so it is only
+            # done for samplers configured with track_io
+            raise RuntimeError("Ranking by IO needs configure_sampler(track_io=True)")
+        with self._collect_lock:
+            if self._latest is None:
+                raise RuntimeError("No snapshot collected yet")
+            sample = get_collector().read_into(limit, sort_by)
+            if sample is None:
+                raise RuntimeError(_NATIVE_MISSING)
+            processes = procfs.annotate(sample.to_dict(limit)['top_processes'], ('username',))
+            return _processes_from_raw(processes, self._latest.memory.get('total_mb', 0))
+
+    def latest(self):
+        """Most recent snapshot, or None if nothing has been collected yet"""
+        with self._lock:
+            return self._latest
+
+    def get(self, max_age=None, process_limit=None):
+        """
+        Latest snapshot if it is younger than max_age (default: next_interval())
+        and holds enough processes; otherwise collect a fresh one.
+        """
+        max_age = self.next_interval() if max_age is None else max_age
+        snapshot = self.latest()
+        if (snapshot is not None and snapshot.age() < max_age
+                and (process_limit is None or process_limit <= snapshot.process_limit)):
+            return snapshot
+        return self.collect(process_limit)
+
+    def start(self):
+        """Collect on a background thread every interval"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sysguard-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.next_interval() + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.collect()
+            except Exception:
+                pass
+            self._stop.wait(max(0.0, self.next_interval() - (time.monotonic() - started)))
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """Return the process-wide sampler"""
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = Sampler()
+    return _sampler
+
+
+selfstats.gauge("sysguard_sample_interval_seconds", "Current sampling interval",
+                lambda: get_sampler().next_interval())
+
+
+def configure_sampler(interval=None, process_limit=None, full_process_table=None, track_io=None,
+                      scheduler=None, track_cgroups=None):
+    """Apply monitoring settings to the shared sampler"""
+    sampler = get_sampler()
+    if scheduler is not None:
+        sampler.scheduler = scheduler
+    if interval is not None:
+        sampler.interval = interval
+    if process_limit is not None:
+        sampler.process_limit = process_limit
+    if full_process_table is not None:
+        sampler.full_process_table = full_process_table
+    if track_io is not None:
+        sampler.track_io = track_io
+    if track_cgroups is not None:
+        sampler.track_cgroups = track_cgroups
+    return sampler
+
+
+def current_snapshot(process_limit=None):
+    """Snapshot for the current tick, collected at most once per interval"""
+    return get_sampler().get(process_limit=process_limit)
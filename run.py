@@ -1,4 +1,10 @@
-from cli.main import sysguard
+import sys
 
 if __name__ == "__main__":
-    sysguard()
+    if sys.argv[1:] == ["status"]:
+        # Health checks call this constantly; skip loading click and the CLI
+        from cli.display import show_status
+        show_status()
+    else:
+        from cli.main import sysguard
+        sysguard()
@@ -31,7 +31,7 @@ if command -v gcc >/dev/null 2>&1; then
     echo "[OK] C backend built successfully"
 else
     echo "[Warning]: GCC not found. Skipping C build."
-    echo "  Install: sudo dnf install gcc make"
+    echo "  Install: sudo dnf install gcc make zlib-devel sqlite-devel"
 fi
 
 echo ""
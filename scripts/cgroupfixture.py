@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Fake cgroup v2 hierarchy for exercising the cgroup collector.
+
+Builds a tree of slices, services, scopes and pods under DIR with the
+control files the collector reads (cpu.stat, memory.current, memory.max,
+io.stat, pids.current) and keeps advancing their counters, parents holding
+the sum of their children as in the kernel. Point SysGuard at it with
+monitoring.cgroups.root or --cgroup-root while it runs:
+
+    python3 scripts/cgroupfixture.py /tmp/cgroups --services 40
+    python3 run.py top --by cgroup --cgroup-root /tmp/cgroups
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+
+GB = 1024 ** 3
+
+
+class Group:
+    def __init__(self, path, rng, leaf=True):
+        self.path = path
+        self.children = []
+        self.usage_usec = 0
+        self.rbytes = self.wbytes = 0
+        # Percent of one CPU, bytes, bytes/s, tasks
+        self.cpu = rng.uniform(0, 80) if leaf else 0.0
+        self.memory = rng.randint(10, 2000) * 1024 * 1024 if leaf else 0
+        self.memory_max = rng.choice([None, 2 * GB, 4 * GB]) if leaf else None
+        self.io_rate = rng.choice([0, 0, 1e5, 5e6]) if leaf else 0
+        self.pids = rng.randint(1, 64) if leaf else 0
+
+    def advance(self, rng, elapsed):
+        if self.children:
+            for child in self.children:
+                child.advance(rng, elapsed)
+            for name in ('usage_usec', 'rbytes', 'wbytes', 'memory', 'pids'):
+                setattr(self, name, sum(getattr(c, name) for c in self.children))
+            return
+        self.cpu = min(400.0, max(0.0, self.cpu + rng.uniform(-5, 5)))
+        self.memory = max(0, self.memory + rng.randint(-8, 10) * 1024 * 1024)
+        self.usage_usec += int(self.cpu / 100 * elapsed * 1e6)
+        self.rbytes += int(self.io_rate * elapsed)
+        self.wbytes += int(self.io_rate / 2 * elapsed)
+
+    def write(self, root):
+        directory = os.path.join(root, self.path)
+        os.makedirs(directory, exist_ok=True)
+        files = {
+            'cpu.stat': f"usage_usec {self.usage_usec}\nuser_usec {self.usage_usec * 2 // 3}\n"
+                        f"system_usec {self.usage_usec // 3}\n",
+            'memory.current': f"{self.memory}\n",
+            'memory.max': f"{self.memory_max}\n" if self.memory_max else "max\n",
+            'io.stat': f"8:0 rbytes={self.rbytes} wbytes={self.wbytes} rios=0 wios=0 dbytes=0 dios=0\n",
+            'pids.current': f"{self.pids}\n",
+        }
+        for name, text in files.items():
+            with open(os.path.join(directory, name), 'w') as f:
+                f.write(text)
+        for child in self.children:
+            child.write(root)
+
+
+def build(rng, services, containers):
+    def parent(path, children):
+        group = Group(path, rng, leaf=False)
+        group.children = children
+        return group
+
+    system = parent('system.slice', [Group(f'system.slice/app{i:03d}.service', rng) for i in range(services)])
+    user = parent('user.slice', [parent('user.slice/user-1000.slice',
+                                        [Group('user.slice/user-1000.slice/session-1.scope', rng)])])
+    pods = parent('kubepods.slice', [
+        parent(f'kubepods.slice/kubepods-pod{i:03d}.slice',
+               [Group(f'kubepods.slice/kubepods-pod{i:03d}.slice/cri-containerd-{i:064x}.scope', rng)])
+        for i in range(containers)
+    ])
+    return [system, user, pods]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Directory to build the hierarchy in (replaced if it exists)")
+    parser.add_argument("--services", type=int, default=20)
+    parser.add_argument("--containers", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between counter updates")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after this many seconds (0: run until ^C)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    groups = build(rng, args.services, args.containers)
+    shutil.rmtree(args.root, ignore_errors=True)
+    os.makedirs(args.root)
+    with open(os.path.join(args.root, 'cgroup.controllers'), 'w') as f:
+        f.write("cpu io memory pids\n")
+    print(f"Writing cgroup fixture to {args.root} every {args.interval}s (^C to stop)", file=sys.stderr)
+
+    started = last = time.monotonic()
+    try:
+        while not args.duration or time.monotonic() - started < args.duration:
+            now = time.monotonic()
+            for group in groups:
+                group.advance(rng, now - last)
+                group.write(args.root)
+            last = now
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
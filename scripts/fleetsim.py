@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Simulated fleet on localhost.
+
+Drives many agents with synthetic samples against an aggregator, either a
+running one (--server) or one started in-process on a scratch database,
+and reports delivery and ingest rates. --outage stops the in-process
+aggregator for a while mid-run to exercise agent buffering and reconnects.
+
+    python3 scripts/fleetsim.py --agents 200 --duration 30
+    python3 scripts/fleetsim.py --agents 20 --interval 0.5 --outage 5
+    python3 scripts/fleetsim.py --server 127.0.0.1:9400 --agents 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet.agent import Agent, parse_address
+from fleet.aggregator import Aggregator
+from fleet.wire import Sample
+from storage.fleet import FleetStore
+
+
+def synthetic_source(seed, clock):
+    rng = random.Random(seed)
+    cpu = rng.uniform(5, 60)
+
+    def sample():
+        nonlocal cpu
+        cpu = min(100.0, max(0.0, cpu + rng.uniform(-5, 5)))
+        return Sample(clock(), cpu, rng.uniform(20, 90), rng.uniform(10, 95),
+                      cpu / 25, cpu / 30, cpu / 35, rng.uniform(0, 1e6), rng.uniform(0, 1e6),
+                      8000, 16000, 200, 500, 8)
+
+    return sample
+
+
+class LocalAggregator:
+    """An Aggregator on its own event loop thread, restartable for outages"""
+
+    def __init__(self, store, port):
+        self.store = store
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.aggregator = None
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def start(self):
+        self.aggregator = Aggregator(self.store, "127.0.0.1", self.port)
+        self._call(self.aggregator.start())
+
+    def stop(self):
+        self._call(self.aggregator.stop())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--server", help="Use a running aggregator instead of an in-process one")
+    parser.add_argument("--port", type=int, default=9401, help="Port for the in-process aggregator")
+    parser.add_argument("--outage", type=float, default=0.0,
+                        help="Seconds the in-process aggregator is down, starting at a third of the run")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    local = directory = None
+    if args.server is None:
+        directory = tempfile.mkdtemp(prefix="sysguard-fleet-")
+        local = LocalAggregator(FleetStore(os.path.join(directory, "fleet.db")), args.port)
+        local.start()
+    address = parse_address(args.server) if args.server else ("127.0.0.1", args.port)
+
+    # Simulated hosts sample on a shared clock that advances one interval per
+    # tick, so every sample has its own timestamp even for sub-second intervals
+    tick = [time.time()]
+    clock = lambda: tick[0]
+    agents = [Agent(address, name=f"sim-{i:04d}", interval=args.interval, ack_timeout=max(5.0, args.outage),
+                    source=synthetic_source(i, clock)) for i in range(args.agents)]
+
+    started = time.monotonic()
+    outage_at = args.duration / 3 if local and args.outage else None
+    down_until = None
+    ticks = 0
+    while time.monotonic() - started < args.duration:
+        tick_started = time.monotonic()
+        elapsed = tick_started - started
+        if outage_at is not None and elapsed >= outage_at:
+            print(f"[{elapsed:5.1f}s] aggregator down for {args.outage:.0f}s")
+            local.stop()
+            outage_at, down_until = None, elapsed + args.outage
+        elif down_until is not None and elapsed >= down_until:
+            print(f"[{elapsed:5.1f}s] aggregator back")
+            local.start()
+            down_until = None
+        for agent in agents:
+            agent.tick()
+        ticks += 1
+        tick[0] += max(args.interval, 1.0)
+        time.sleep(max(0.0, args.interval - (time.monotonic() - tick_started)))
+
+    # Give the last batches time to be stored and acknowledged
+    settle = time.monotonic() + 5.0
+    while time.monotonic() < settle and any(a.pending for a in agents):
+        for agent in agents:
+            agent.pump()
+        time.sleep(0.2)
+    elapsed = time.monotonic() - started
+
+    generated = ticks * len(agents)
+    acked = sum(a.acked for a in agents)
+    print(f"agents:     {len(agents)} x {ticks} ticks in {elapsed:.1f}s")
+    print(f"generated:  {generated}")
+    print(f"acked:      {acked} ({acked / elapsed:.0f} samples/s)")
+    print(f"pending:    {sum(a.pending for a in agents)}")
+    print(f"dropped:    {sum(a.dropped for a in agents)}")
+    for agent in agents:
+        agent.close()
+    if local:
+        local.stop()
+        with sqlite3.connect(os.path.join(directory, "fleet.db")) as conn:
+            stored, hosts = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT host) FROM fleet_metrics").fetchone()
+        print(f"stored:     {stored} rows for {hosts} hosts")
+        local.store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Local load test for the SysGuard web servers.
+
+Opens many keep-alive connections that poll /health back to back (optionally
+pipelining several requests per write), plus idle WebSocket subscribers,
+and reports throughput and latency percentiles.
+
+    python3 scripts/loadtest.py --connections 1000 --duration 10
+    python3 scripts/loadtest.py --connections 200 --pipeline 8 --websockets 100
+"""
+import argparse
+import asyncio
+import base64
+import os
+import time
+
+REQUEST = b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    if length:
+        await reader.readexactly(length)
+    return head[9:12]
+
+
+async def poller(host, port, pipeline, deadline, stats):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats["connect_errors"] += 1
+        return
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            writer.write(REQUEST * pipeline)
+            await writer.drain()
+            for _ in range(pipeline):
+                status = await read_response(reader)
+                if status != b"200":
+                    stats["errors"] += 1
+            elapsed = time.perf_counter() - started
+            stats["requests"] += pipeline
+            stats["latencies"].append(elapsed / pipeline)
+    except (OSError, asyncio.IncompleteReadError):
+        stats["errors"] += 1
+    finally:
+        writer.close()
+
+
+async def subscriber(host, port, deadline, stats):
+    key = base64.b64encode(os.urandom(16))
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\nSec-WebSocket-Version: 13\r\n"
+                     b"Sec-WebSocket-Key: " + key + b"\r\n\r\n")
+        await reader.readuntil(b"\r\n\r\n")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            data = await asyncio.wait_for(reader.read(65536), remaining)
+            if not data:
+                break
+            stats["ws_bytes"] += len(data)
+        writer.close()
+    except asyncio.TimeoutError:
+        writer.close()
+    except (OSError, asyncio.IncompleteReadError):
+        stats["ws_errors"] += 1
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def main(args):
+    stats = {"requests": 0, "errors": 0, "connect_errors": 0, "latencies": [],
+             "ws_bytes": 0, "ws_errors": 0}
+    deadline = time.monotonic() + args.duration
+    tasks = [subscriber(args.host, args.port, deadline, stats) for _ in range(args.websockets)]
+    tasks += [poller(args.host, args.port, args.pipeline, deadline, stats)
+              for _ in range(args.connections)]
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    latencies = stats["latencies"]
+    print(f"connections   {args.connections} (pipeline {args.pipeline}), websockets {args.websockets}")
+    print(f"requests      {stats['requests']} in {elapsed:.1f}s = {stats['requests'] / elapsed:,.0f} req/s")
+    print(f"latency       p50 {percentile(latencies, 0.5) * 1000:.2f}ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms  max {max(latencies, default=0) * 1000:.2f}ms")
+    print(f"errors        {stats['errors']} (connect {stats['connect_errors']}, websocket {stats['ws_errors']})")
+    if args.websockets:
+        print(f"ws received   {stats['ws_bytes'] / args.websockets / elapsed:,.0f} bytes/s per subscriber")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--pipeline", type=int, default=1)
+    parser.add_argument("--websockets", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
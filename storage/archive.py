@@ -0,0 +1,193 @@
+"""
+Columnar metric archive
+Raw samples past the SQLite window are compacted into append-only segment
+files with one fixed-width column per metric, read back through mmap.
+
+Segment layout (little endian):
+    header   64 bytes   magic, version, ncols, nrows, t_min, t_max, index stride/len
+    names    16 bytes per column, NUL padded
+    ts       int64[nrows]
+    columns  float64[nrows] per metric, in name order
+    index    int64[index_len]  timestamp of every index_stride-th row
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from storage.rollup import METRICS
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), "archive")
+
+
+def archive_dir(config):
+    """Segment directory from storage.archive.dir, as the writer compacts into"""
+    return ((config.get('storage') or {}).get('archive') or {}).get('dir', ARCHIVE_DIR)
+
+MAGIC = b"SGSEG\0\0\0"
+VERSION = 1
+INDEX_STRIDE = 4096
+_HEADER = struct.Struct("<8sIIQqqII16x")
+_NAME_LEN = 16
+
+class Segment:
+    """One mmapped segment file; column accessors return zero-copy arrays"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, ncols, nrows, t_min, t_max, stride, index_len = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a SysGuard archive segment: {path}")
+        self.nrows, self.t_min, self.t_max = nrows, t_min, t_max
+        self.stride = stride
+        offset = _HEADER.size
+        names = []
+        for _ in range(ncols):
+            names.append(self._mmap[offset:offset + _NAME_LEN].rstrip(b"\0").decode())
+            offset += _NAME_LEN
+        self.timestamps = np.frombuffer(self._mmap, dtype="<i8", count=nrows, offset=offset)
+        offset += nrows * 8
+        self._columns = {}
+        for name in names:
+            self._columns[name] = np.frombuffer(self._mmap, dtype="<f8", count=nrows, offset=offset)
+            offset += nrows * 8
+        self.index = np.frombuffer(self._mmap, dtype="<i8", count=index_len, offset=offset)
+
+    @property
+    def columns(self):
+        return tuple(self._columns)
+
+    def column(self, name):
+        return self._columns[name]
+
+    def row_range(self, since, until):
+        """[start, stop) rows with since <= ts <= until, using the sparse index"""
+        lo = max(0, int(np.searchsorted(self.index, since, side="left")) - 1) * self.stride
+        hi = min(self.nrows, (int(np.searchsorted(self.index, until, side="right")) + 1) * self.stride)
+        window = self.timestamps[lo:hi]
+        return (lo + int(np.searchsorted(window, since, side="left")),
+                lo + int(np.searchsorted(window, until, side="right")))
+
+    def close(self):
+        self.timestamps = self.index = None
+        self._columns = {}
+        self._mmap.close()
+
+def write_segment(directory, timestamps, columns):
+    """Write one immutable segment atomically; returns its path"""
+    timestamps = np.ascontiguousarray(timestamps, dtype="<i8")
+    nrows = len(timestamps)
+    index = timestamps[::INDEX_STRIDE]
+    os.makedirs(directory, exist_ok=True)
+    t_min, t_max = int(timestamps[0]), int(timestamps[-1])
+    path = os.path.join(directory, f"seg-{t_min:012d}-{t_max:012d}.sgseg")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(columns), nrows, t_min, t_max, INDEX_STRIDE, len(index)))
+        for name in columns:
+            f.write(name.encode()[:_NAME_LEN].ljust(_NAME_LEN, b"\0"))
+        timestamps.tofile(f)
+        for values in columns.values():
+            np.ascontiguousarray(values, dtype="<f8").tofile(f)
+        index.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+def compact(conn, cutoff, directory=ARCHIVE_DIR, chunk_rows=1 << 20):
+    """
+    Move raw metrics rows older than cutoff into segment files and delete
+    them from SQLite. Caller owns the transaction. Returns rows archived.
+    """
+    cursor = conn.execute(
+        "SELECT timestamp, cpu, memory, disk FROM metrics WHERE timestamp < ? ORDER BY timestamp",
+        (int(cutoff),)
+    )
+    archived = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        data = np.array(rows, dtype="f8")
+        # NULLs come back as NaN through the float conversion
+        write_segment(directory, data[:, 0].astype("<i8"),
+                      {name: data[:, i + 1] for i, name in enumerate(METRICS)})
+        archived += len(rows)
+    if archived:
+        conn.execute("DELETE FROM metrics WHERE timestamp < ?", (int(cutoff),))
+    return archived
+
+class ArchiveReader:
+    """Vectorized range scans, aggregates and exports over all segments"""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self._segments = {}
+
+    def segments(self, since=None, until=None):
+        """Segments overlapping [since, until], pruned by the time range in the file name"""
+        if not os.path.isdir(self.directory):
+            return []
+        selected = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".sgseg"):
+                continue
+            t_min, t_max = (int(part) for part in name[4:-6].split("-"))
+            if (since is not None and t_max < since) or (until is not None and t_min > until):
+                continue
+            if name not in self._segments:
+                self._segments[name] = Segment(os.path.join(self.directory, name))
+            selected.append(self._segments[name])
+        return selected
+
+    def scan(self, metric, since, until):
+        """(timestamps, values) arrays for one metric in [since, until]"""
+        ts_parts, value_parts = [], []
+        for segment in self.segments(since, until):
+            start, stop = segment.row_range(since, until)
+            if start < stop:
+                ts_parts.append(segment.timestamps[start:stop])
+                value_parts.append(segment.column(metric)[start:stop])
+        if not ts_parts:
+            return np.empty(0, dtype="<i8"), np.empty(0, dtype="<f8")
+        if len(ts_parts) == 1:
+            return ts_parts[0], value_parts[0]
+        return np.concatenate(ts_parts), np.concatenate(value_parts)
+
+    def aggregate(self, metric, since, until):
+        """count/min/max/avg/p95 over the range, ignoring missing values"""
+        _, values = self.scan(metric, since, until)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {"count": 0, "min": None, "max": None, "avg": None, "p95": None}
+        return {
+            "count": int(len(values)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "avg": float(values.mean()),
+            "p95": float(np.percentile(values, 95, method="inverted_cdf")),
+        }
+
+    def export_csv(self, stream, since, until):
+        """Write timestamp,cpu,memory,disk rows for the range to a text stream"""
+        stream.write("timestamp," + ",".join(METRICS) + "\n")
+        written = 0
+        for segment in self.segments(since, until):
+            start, stop = segment.row_range(since, until)
+            if start >= stop:
+                continue
+            block = np.column_stack([segment.timestamps[start:stop]] +
+                                    [segment.column(m)[start:stop] for m in METRICS])
+            np.savetxt(stream, block, fmt=["%d"] + ["%.2f"] * len(METRICS), delimiter=",")
+            written += stop - start
+        return written
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
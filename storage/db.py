@@ -1,59 +1,183 @@
 import sqlite3
 import os
-from datetime import datetime
+import time
 from contextlib import contextmanager
+from storage.rollup import METRICS, TIERS, DEFAULT_RETENTION, create_tables
+from monitor import selfstats
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "sysguard.db")
 
+# Bumped whenever the schema below changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 3
+
+# Upper bound on rows a range query should return before a coarser tier is used
+MAX_POINTS = 2000
+
+FLUSH_SECONDS = selfstats.histogram("sysguard_db_flush_seconds", "Time writing one batch of samples")
+ROWS_WRITTEN = selfstats.counter("sysguard_db_rows_written_total", "Raw metric rows written")
+_QUERY_SECONDS = selfstats.histogram("sysguard_db_query_seconds", "Time answering one history query")
+_ALERTS = selfstats.counter("sysguard_alerts_logged_total", "Alerts and action outcomes recorded")
+
 @contextmanager
-def get_db_connection():
+def get_db_connection(db_path=DB_PATH):
     """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     try:
         yield conn
     finally:
         conn.close()
 
-def init_db():
-    """Initialize database tables with indexes and performance flags"""
-    with get_db_connection() as conn:
+def _migrate_metrics_v1(conn):
+    """Move metrics timestamps from ISO strings to integer epoch seconds"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='metrics'"
+    ).fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS metrics_v1 (
+                    id INTEGER PRIMARY KEY,
+                    timestamp INTEGER NOT NULL,
+                    cpu REAL,
+                    memory REAL,
+                    disk REAL
+                )''')
+    if exists:
+        conn.execute('''INSERT INTO metrics_v1 (timestamp, cpu, memory, disk)
+                        SELECT CAST(strftime('%s', timestamp, 'utc') AS INTEGER), cpu, memory, disk
+                        FROM metrics WHERE timestamp IS NOT NULL''')
+        conn.execute('DROP TABLE metrics')
+    conn.execute('DROP INDEX IF EXISTS idx_metrics_timestamp')
+    conn.execute('ALTER TABLE metrics_v1 RENAME TO metrics')
+
+# Databases whose schema this process has already checked
+_initialized = set()
+
+def init_db(db_path=DB_PATH):
+    """
+    Initialize database tables with indexes and performance flags.
+    The schema version is kept in PRAGMA user_version, so an up-to-date
+    database costs one pragma read, and only the first call per process.
+    """
+    if db_path in _initialized:
+        return
+    with get_db_connection(db_path) as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            _initialized.add(db_path)
+            return
+
         conn.execute('''CREATE TABLE IF NOT EXISTS alerts (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         timestamp TEXT,
                         type TEXT,
                         message TEXT
                     )''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS metrics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp TEXT,
-                        cpu REAL,
-                        memory REAL,
-                        disk REAL
-                    )''')
+        if version < 1:
+            _migrate_metrics_v1(conn)
+        if version < 2:
+            create_tables(conn)
+        if version < 3:
+            from storage.fleet import create_tables as create_fleet_tables
+            create_fleet_tables(conn)
         
         # Add indexes for fast queries
         conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp DESC)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts(type)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics(timestamp DESC)')
-        
-        # Enable performance optimizations
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.execute('PRAGMA synchronous=NORMAL')
-        conn.execute('PRAGMA cache_size=10000')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics(timestamp)')
         
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         conn.commit()
 
+        # WAL mode is persistent, so it only needs setting once per database file
+        conn.execute('PRAGMA journal_mode=WAL')
+    _initialized.add(db_path)
+
 def log_metrics(cpu, memory, disk):
-    """Log system metrics to database"""
+    """Queue system metrics on the shared batched writer"""
+    from storage.writer import get_writer
+    get_writer().add(cpu, memory, disk)
+
+def log_alert(alert_type, message):
+    """Record an alert or action outcome"""
+    from datetime import datetime
+    _ALERTS.inc()
+    init_db()
     with get_db_connection() as conn:
-        conn.execute("INSERT INTO metrics (timestamp, cpu, memory, disk) VALUES (?, ?, ?, ?)",
-                     (datetime.now().isoformat(), cpu, memory, disk))
+        conn.execute("INSERT INTO alerts (timestamp, type, message) VALUES (?, ?, ?)",
+                     (datetime.now().isoformat(timespec='seconds'), alert_type, message))
         conn.commit()
 
 def get_recent_alerts(limit=10):
     """Retrieve recent alerts from database"""
+    init_db()
     with get_db_connection() as conn:
         return conn.execute(
             "SELECT timestamp, type, message FROM alerts ORDER BY id DESC LIMIT ?",
             (limit,)
         ).fetchall()
+
+def _archived_rows(metric, since, until, directory=None):
+    """Raw rows for the part of a range that was compacted into the archive"""
+    from storage.archive import ARCHIVE_DIR
+    directory = directory or ARCHIVE_DIR
+    if until < since or not os.path.isdir(directory):
+        return []
+    from storage.archive import ArchiveReader
+    reader = ArchiveReader(directory)
+    try:
+        ts, values = reader.scan(metric, since, until)
+        rows = [(int(t), v, v, v, v) for t, v in zip(ts.tolist(), values.tolist())]
+        # The arrays are views of the segment maps, which close() unmaps
+        del ts, values
+        return rows
+    finally:
+        reader.close()
+
+def choose_resolution(since, until, retention=None, now=None, points=None):
+    """
+    Cheapest tier that still has data for the range and stays under
+    MAX_POINTS. With `points`, a finer tier is also used when the coarser
+    one would have fewer rows than that to downsample from.
+    """
+    retention = {**DEFAULT_RETENTION, **(retention or {})}
+    now = time.time() if now is None else now
+    span = max(0, until - since)
+    points = points or 0
+    minutes, hours = span / TIERS['1m'][0], span / TIERS['1h'][0]
+    if since >= now - retention['raw_hours'] * 3600 and (span <= MAX_POINTS or minutes < points):
+        return 'raw'
+    if since >= now - retention['minute_days'] * 86400 and (minutes <= MAX_POINTS or hours < points):
+        return '1m'
+    return '1h'
+
+def query_metrics(metric, since, until=None, resolution=None, archive_dir=None, retention=None):
+    """
+    Return (timestamp, avg, min, max, p95) rows for one metric between the
+    epoch timestamps since and until. resolution is 'raw', '1m', '1h', or
+    None/'auto' to pick the cheapest tier for the range under `retention`
+    (storage.retention, default DEFAULT_RETENTION). Raw ranges reaching
+    past SQLite are completed from the archive in archive_dir (default:
+    storage/archive).
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+    until = int(time.time() if until is None else until)
+    since = int(since)
+    if resolution in (None, 'auto'):
+        resolution = choose_resolution(since, until, retention)
+
+    init_db()
+    with get_db_connection() as conn, _QUERY_SECONDS.time():
+        if resolution == 'raw':
+            rows = conn.execute(
+                f"SELECT timestamp, {metric}, {metric}, {metric}, {metric} FROM metrics "
+                "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp",
+                (since, until)
+            ).fetchall()
+            return _archived_rows(metric, since, rows[0][0] - 1 if rows else until, archive_dir) + rows
+        if resolution not in TIERS:
+            raise ValueError(f"Unknown resolution '{resolution}', expected raw, 1m, 1h or auto")
+        width, table = TIERS[resolution]
+        return conn.execute(
+            f"SELECT bucket, sum / count, min, max, p95 FROM {table} "
+            "WHERE metric = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+            (metric, since - since % width, until)
+        ).fetchall()
@@ -0,0 +1,46 @@
+"""
+Shape-preserving downsampling
+Largest-Triangle-Three-Buckets (Steinarsson, 2013): keeps the first and
+last point and, from each bucket in between, the point forming the largest
+triangle with the point kept before it and the average of the next bucket,
+so spikes and dips survive where plain averaging would flatten them.
+"""
+
+
+def lttb(rows, threshold, value=1):
+    """
+    At most `threshold` of `rows`, which are sequences ordered by their
+    timestamp in position 0, chosen by the value in position `value`.
+    The selected rows are returned unchanged.
+    """
+    n = len(rows)
+    if threshold >= n or threshold <= 0:
+        return list(rows)
+    if threshold < 3:
+        return [rows[0], rows[-1]][:threshold]
+
+    sampled = [rows[0]]
+    # Buckets split the points between the first and the last
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average of the next bucket; the last point for the final bucket
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= n - 1:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_t = sum(rows[j][0] for j in range(next_start, next_end)) / count
+        avg_v = sum(rows[j][value] for j in range(next_start, next_end)) / count
+
+        at, av = rows[a][0], rows[a][value]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((at - avg_t) * (rows[j][value] - av) - (at - rows[j][0]) * (avg_v - av))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(rows[best])
+        a = best
+    sampled.append(rows[-1])
+    return sampled
@@ -0,0 +1,101 @@
+"""
+Fleet sample storage
+Per-host samples ingested by the aggregator, written in large batches in
+one transaction. (host, timestamp) is the primary key, so samples an agent
+resends after a reconnect are ignored.
+"""
+
+import sqlite3
+import threading
+import time
+
+from storage.db import DB_PATH, MAX_POINTS, init_db
+from storage.rollup import DEFAULT_RETENTION
+
+# Columns queryable per host, besides timestamp
+FLEET_METRICS = ('cpu', 'memory', 'disk', 'load', 'rx', 'tx')
+
+_INSERT = ("INSERT OR IGNORE INTO fleet_metrics (host, timestamp, cpu, memory, disk, load, rx, tx) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+def create_tables(conn):
+    """Create the fleet samples table"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS fleet_metrics (
+                    host TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    cpu REAL,
+                    memory REAL,
+                    disk REAL,
+                    load REAL,
+                    rx REAL,
+                    tx REAL,
+                    PRIMARY KEY (host, timestamp)
+                ) WITHOUT ROWID''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fleet_timestamp ON fleet_metrics(timestamp)')
+
+class FleetStore:
+    """
+    Batch writer and reader for fleet samples. Rows are
+    (host, timestamp, cpu, memory, disk, load, rx, tx); raw retention
+    (retention['raw_hours']) is applied at most once per prune_interval.
+    """
+
+    def __init__(self, db_path=DB_PATH, retention=None, prune_interval=600):
+        self.db_path = db_path
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self.prune_interval = prune_interval
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def _connection(self):
+        if self._conn is None:
+            init_db(self.db_path)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
+
+    def write(self, rows):
+        """Insert a batch of rows in one transaction; returns rows new to the table"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(_INSERT, rows)
+                written = conn.total_changes - before
+                now = time.monotonic()
+                if now - self._last_prune >= self.prune_interval:
+                    self._last_prune = now
+                    cutoff = int(time.time() - self.retention['raw_hours'] * 3600)
+                    conn.execute("DELETE FROM fleet_metrics WHERE timestamp < ?", (cutoff,))
+            return written
+
+    def hosts(self):
+        """(host, first timestamp, last timestamp, samples) per known host"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT host, MIN(timestamp), MAX(timestamp), COUNT(*) FROM fleet_metrics GROUP BY host"
+            ).fetchall()
+
+    def query(self, host, metric, since, until=None):
+        """
+        (timestamp, value) rows for one host, averaged into equal buckets when
+        the range holds more than MAX_POINTS samples.
+        """
+        if metric not in FLEET_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(FLEET_METRICS)}")
+        until = int(time.time() if until is None else until)
+        since = int(since)
+        width = max(1, -(-(until - since) // MAX_POINTS))
+        with self._lock:
+            return self._connection().execute(
+                f"SELECT timestamp - timestamp % ? AS bucket, AVG({metric}) FROM fleet_metrics "
+                "WHERE host = ? AND timestamp BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket",
+                (width, host, since, until)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,182 @@
+"""
+Snapshot recordings
+Append-only log of whole snapshots for replaying through the autofix
+engine (run.py record / run.py replay). Records are grouped into blocks
+that are compressed independently, so a recording can be appended to
+across runs and a crash loses at most the block being filled.
+
+File layout (little endian):
+    header   6 bytes    magic, version
+    block    24 bytes   compressed length, record count, first and last timestamp
+             payload    zlib(two JSON lengths, JSON array of Snapshot.to_dict()
+                        documents without their processes, JSON array of their
+                        processes, process tables of the records that have one)
+
+Top processes are kept apart so replays, which only need the process
+table, can skip decoding them.
+"""
+
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+from monitor.snapshot import Snapshot
+
+logger = logging.getLogger("sysguard.recording")
+
+MAGIC = b"SGREC"
+# 2: process tables carry start_time
+VERSION = 2
+_HEADER = struct.Struct("<5sB")
+_BLOCK = struct.Struct("<IIdd")
+_LENGTHS = struct.Struct("<II")
+
+
+class SnapshotRecorder:
+    """
+    Appends snapshots to a recording.
+
+    A block is compressed and written when block_size snapshots are queued,
+    when flush_interval seconds have passed since the last write, or on
+    close(). Process tables are stored when the snapshots carry them.
+    """
+
+    def __init__(self, path, block_size=300, flush_interval=60.0):
+        self.path = path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._docs = []
+        self._processes = []
+        self._tables = []
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+        else:
+            # Drop a block cut short by an interrupted recorder before appending
+            with open(path, "rb") as f:
+                end = _complete_length(f, path)
+            if end < self._file.tell():
+                logger.warning(f"{path}: discarding {self._file.tell() - end} bytes of a truncated block")
+                self._file.truncate(end)
+                self._file.seek(end)
+
+    def add(self, snapshot):
+        """Queue one snapshot"""
+        doc = snapshot.to_dict()
+        self._processes.append(doc.pop("processes"))
+        if snapshot.process_table is not None:
+            doc["process_table"] = len(snapshot.process_table)
+            self._tables.append(snapshot.process_table.tobytes())
+        self._docs.append(doc)
+        self.records += 1
+        if (len(self._docs) >= self.block_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Compress and write the queued snapshots as one block"""
+        self._last_flush = time.monotonic()
+        if not self._docs:
+            return
+        docs = json.dumps(self._docs, separators=(",", ":")).encode()
+        processes = json.dumps(self._processes, separators=(",", ":")).encode()
+        payload = zlib.compress(_LENGTHS.pack(len(docs), len(processes)) + docs + processes
+                                + b"".join(self._tables))
+        self._file.write(_BLOCK.pack(len(payload), len(self._docs),
+                                     self._docs[0]["timestamp"], self._docs[-1]["timestamp"]))
+        self._file.write(payload)
+        self._file.flush()
+        self._docs, self._processes, self._tables = [], [], []
+
+    def close(self):
+        """Write the last partial block and close the file"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(f, path):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != MAGIC:
+        raise ValueError(f"Not a SysGuard recording: {path}")
+    version = _HEADER.unpack(header)[1]
+    if version != VERSION:
+        raise ValueError(f"{path}: recording version {version} is not supported (expected {VERSION})")
+
+
+def _complete_length(f, path):
+    """Offset just past the last complete block"""
+    _check_header(f, path)
+    size = os.fstat(f.fileno()).st_size
+    end = f.tell()
+    while end + _BLOCK.size <= size:
+        length = _BLOCK.unpack(f.read(_BLOCK.size))[0]
+        if end + _BLOCK.size + length > size:
+            break
+        end += _BLOCK.size + length
+        f.seek(end)
+    return end
+
+
+def read_recording(path, since=None, until=None, processes=True):
+    """
+    Yield the Snapshots of a recording in order, optionally only those with
+    since <= timestamp <= until. Blocks outside the range are skipped without
+    decompressing them; a truncated last block (an interrupted recorder) ends
+    the recording with a warning. Without `processes` the snapshots' top
+    processes are left empty (process tables are still read).
+    """
+    from monitor.native_backend import process_dtype
+    import numpy as np
+    dtype = process_dtype()
+    with open(path, "rb") as f:
+        _check_header(f, path)
+        while True:
+            header = f.read(_BLOCK.size)
+            if not header:
+                return
+            if len(header) < _BLOCK.size:
+                logger.warning(f"{path}: truncated block header, stopping")
+                return
+            size, count, first, last = _BLOCK.unpack(header)
+            if (since is not None and last < since) or (until is not None and first > until):
+                f.seek(size, os.SEEK_CUR)
+                continue
+            data = f.read(size)
+            try:
+                payload = zlib.decompress(data)
+            except zlib.error:
+                logger.warning(f"{path}: truncated or corrupt block at offset {f.tell() - len(data)}, stopping")
+                return
+            docs_length, processes_length = _LENGTHS.unpack_from(payload)
+            offset = _LENGTHS.size
+            docs = json.loads(payload[offset:offset + docs_length])
+            offset += docs_length
+            if processes:
+                for doc, top in zip(docs, json.loads(payload[offset:offset + processes_length])):
+                    doc["processes"] = top
+            offset += processes_length
+            for doc in docs:
+                table = None
+                rows = doc.pop("process_table", None)
+                if rows is not None:
+                    table = np.frombuffer(payload, dtype=dtype, count=rows, offset=offset)
+                    offset += rows * dtype.itemsize
+                if (since is not None and doc["timestamp"] < since) or (until is not None and doc["timestamp"] > until):
+                    continue
+                yield Snapshot.from_dict(doc, process_table=table)
@@ -0,0 +1,119 @@
+"""
+Tiered metric rollups
+Aggregates raw samples into 1-minute and 1-hour buckets as they are written,
+and prunes each tier according to its retention window.
+"""
+
+import math
+import time
+
+# Columns of the raw metrics table that get rolled up
+METRICS = ('cpu', 'memory', 'disk')
+
+# name -> (bucket width in seconds, table)
+TIERS = {
+    '1m': (60, 'metrics_1m'),
+    '1h': (3600, 'metrics_1h'),
+}
+
+DEFAULT_RETENTION = {
+    'raw_hours': 48,
+    'minute_days': 30,
+    'hour_days': 365,
+}
+
+# Partial buckets written at shutdown are merged into any existing row.
+# p95 of a merged bucket is approximated by the larger of the two parts.
+_UPSERT = '''INSERT INTO {table} (bucket, metric, count, min, max, sum, p95)
+             VALUES (?, ?, ?, ?, ?, ?, ?)
+             ON CONFLICT(metric, bucket) DO UPDATE SET
+                count = count + excluded.count,
+                min = MIN(min, excluded.min),
+                max = MAX(max, excluded.max),
+                sum = sum + excluded.sum,
+                p95 = MAX(p95, excluded.p95)'''
+
+def create_tables(conn):
+    """Create the rollup tier tables"""
+    for _, table in TIERS.values():
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                        bucket INTEGER NOT NULL,
+                        metric TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        min REAL,
+                        max REAL,
+                        sum REAL,
+                        p95 REAL,
+                        PRIMARY KEY (metric, bucket)
+                    ) WITHOUT ROWID''')
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def _summarize(bucket, metric, values):
+    return (bucket, metric, len(values), min(values), max(values), sum(values), percentile(values, 95))
+
+class RollupAccumulator:
+    """
+    Holds the values of the currently open bucket of every tier.
+
+    add() returns the rows of buckets that closed because a newer sample
+    arrived; drain() returns the still-open buckets (used at shutdown).
+    Rows are (table, (bucket, metric, count, min, max, sum, p95)).
+    """
+
+    def __init__(self):
+        # tier name -> (bucket start, {metric: [values]})
+        self._open = {}
+
+    def add(self, ts, values):
+        closed = []
+        for name, (width, table) in TIERS.items():
+            bucket = ts - ts % width
+            current = self._open.get(name)
+            if current is not None and current[0] != bucket:
+                closed.extend(self._rows(table, current))
+                current = None
+            if current is None:
+                current = (bucket, {metric: [] for metric in METRICS})
+                self._open[name] = current
+            for metric in METRICS:
+                value = values.get(metric)
+                if value is not None:
+                    current[1][metric].append(value)
+        return closed
+
+    def drain(self):
+        rows = []
+        for name, current in self._open.items():
+            rows.extend(self._rows(TIERS[name][1], current))
+        self._open = {}
+        return rows
+
+    @staticmethod
+    def _rows(table, current):
+        bucket, series = current
+        return [(table, _summarize(bucket, metric, values))
+                for metric, values in series.items() if values]
+
+def write_rollups(conn, rows):
+    """Upsert accumulator rows; caller owns the transaction"""
+    by_table = {}
+    for table, row in rows:
+        by_table.setdefault(table, []).append(row)
+    for table, table_rows in by_table.items():
+        conn.executemany(_UPSERT.format(table=table), table_rows)
+
+def prune(conn, retention=None, now=None):
+    """Delete rows that fell out of each tier's retention window"""
+    retention = {**DEFAULT_RETENTION, **(retention or {})}
+    now = int(time.time() if now is None else now)
+    conn.execute("DELETE FROM metrics WHERE timestamp < ?",
+                 (now - int(retention['raw_hours'] * 3600),))
+    conn.execute(f"DELETE FROM {TIERS['1m'][1]} WHERE bucket < ?",
+                 (now - int(retention['minute_days'] * 86400),))
+    conn.execute(f"DELETE FROM {TIERS['1h'][1]} WHERE bucket < ?",
+                 (now - int(retention['hour_days'] * 86400),))
@@ -0,0 +1,140 @@
+"""
+Batched metrics writer
+Keeps one SQLite connection open and flushes buffered samples in a single
+transaction instead of committing every row.
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+
+from storage.db import DB_PATH, FLUSH_SECONDS, ROWS_WRITTEN, init_db
+from storage.rollup import RollupAccumulator, write_rollups, prune
+
+class MetricsWriter:
+    """
+    Buffers metric samples in memory and writes them with executemany.
+
+    A flush happens when batch_size samples are queued, when flush_interval
+    seconds have passed since the last flush, or on close(). add() is safe to
+    call from a sampler thread while another thread flushes.
+
+    Samples also feed the 1m/1h rollup accumulator; closed buckets are written
+    in the same transaction as the raw rows, and retention pruning runs at
+    most once per prune_interval seconds. With archive enabled, raw rows
+    older than archive['after_hours'] are compacted into columnar segments
+    (see storage/archive.py) before pruning.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=100, flush_interval=5.0,
+                 retention=None, prune_interval=600, archive=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.archive = archive
+        self._buffer = []
+        self._rollups = []
+        self._accumulator = RollupAccumulator()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_flush = time.monotonic()
+        self._last_prune = 0.0
+
+    def _connection(self):
+        if self._conn is None:
+            init_db(self.db_path)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA cache_size=10000')
+        return self._conn
+
+    def add(self, cpu, memory, disk, timestamp=None):
+        """Queue one sample; timestamp is epoch seconds (defaults to now)"""
+        ts = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._buffer.append((ts, cpu, memory, disk))
+            self._rollups.extend(self._accumulator.add(ts, {'cpu': cpu, 'memory': memory, 'disk': disk}))
+            due = (len(self._buffer) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+            if due:
+                self._flush_locked()
+
+    def add_snapshot(self, snapshot):
+        """Queue the host-level figures of a monitor Snapshot"""
+        self.add(snapshot.cpu['usage_percent'], snapshot.memory['percent'],
+                 snapshot.disk.get('percent', 0), snapshot.timestamp)
+
+    def flush(self):
+        """Write all buffered samples now"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        now = time.monotonic()
+        self._last_flush = now
+        if not self._buffer and not self._rollups:
+            return
+        rows, self._buffer = self._buffer, []
+        rollups, self._rollups = self._rollups, []
+        conn = self._connection()
+        with FLUSH_SECONDS.time(), conn:
+            conn.executemany(
+                "INSERT INTO metrics (timestamp, cpu, memory, disk) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            write_rollups(conn, rollups)
+            if now - self._last_prune >= self.prune_interval:
+                self._last_prune = now
+                self._archive(conn)
+                prune(conn, self.retention)
+        ROWS_WRITTEN.inc(len(rows))
+
+    def _archive(self, conn):
+        if not self.archive or not self.archive.get('enabled', False):
+            return
+        from storage.archive import ARCHIVE_DIR, compact
+        # Cut on segment boundaries so each compaction writes one full segment
+        span = int(self.archive.get('segment_hours', 6) * 3600)
+        cutoff = int(time.time() - self.archive.get('after_hours', 1) * 3600)
+        compact(conn, cutoff - cutoff % span, self.archive.get('dir', ARCHIVE_DIR))
+
+    def close(self):
+        """Flush remaining samples and partial rollup buckets, then close"""
+        with self._lock:
+            self._rollups.extend(self._accumulator.drain())
+            self._flush_locked()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Return the process-wide writer, flushed automatically at exit"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MetricsWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+# storage.* keys that map onto MetricsWriter settings
+_SETTINGS = ('batch_size', 'flush_interval', 'retention', 'archive')
+
+def configure_writer(config):
+    """
+    Apply storage.batch_size, flush_interval, retention and archive to the
+    shared writer, which log_metrics() also writes through
+    """
+    settings = config.get('storage') or {}
+    writer = get_writer()
+    with writer._lock:
+        for name in _SETTINGS:
+            if name in settings:
+                setattr(writer, name, settings[name])
+    return writer
@@ -16,10 +16,13 @@ const chartOptions = {
             }
         },
         x: {
+            type: 'linear',
             grid: { display: false },
             ticks: { 
                 color: '#999999',
-                font: { family: "'Courier New', monospace" }
+                font: { family: "'Courier New', monospace" },
+                maxTicksLimit: 6,
+                callback: formatTick
             }
         }
     },
@@ -35,10 +38,9 @@ const ctxMem = document.getElementById('memChart').getContext('2d');
 const cpuChart = new Chart(ctxCpu, {
     type: 'line',
     data: {
-        labels: Array(30).fill(''),
         datasets: [{
             label: 'CPU %',
-            data: Array(30).fill(0),
+            data: [],
             borderColor: '#00ff00',
             backgroundColor: 'rgba(0, 255, 0, 0.1)',
             borderWidth: 2,
@@ -53,10 +55,9 @@ const cpuChart = new Chart(ctxCpu, {
 const memChart = new Chart(ctxMem, {
     type: 'line',
     data: {
-        labels: Array(30).fill(''),
         datasets: [{
             label: 'Memory %',
-            data: Array(30).fill(0),
+            data: [],
             borderColor: '#ffaa00',
             backgroundColor: 'rgba(255, 170, 0, 0.1)',
             borderWidth: 2,
@@ -68,10 +69,111 @@ const memChart = new Chart(ctxMem, {
     options: chartOptions
 });
 
+// Charts show the last `range` seconds and follow live samples, or a fixed
+// [since, until] window once zoomed into
+const view = { range: 300, since: null, until: null };
+const charts = [
+    { chart: cpuChart, metric: 'cpu' },
+    { chart: memChart, metric: 'memory' }
+];
+
+function formatTick(value) {
+    const date = new Date(value * 1000);
+    const span = this.max - this.min;
+    if (span > 86400) {
+        return date.toLocaleDateString([], { month: 'short', day: 'numeric' }) + ' ' +
+            date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+    }
+    return date.toLocaleTimeString([], span > 600 ?
+        { hour: '2-digit', minute: '2-digit' } :
+        { hour: '2-digit', minute: '2-digit', second: '2-digit' });
+}
+
+function isLive() {
+    return view.since === null;
+}
+
+// About one point per two pixels; the server downsamples to this many
+function historyPoints(chart) {
+    return Math.max(60, Math.min(500, Math.floor(chart.canvas.clientWidth / 2)));
+}
+
+function setWindow(chart, since, until) {
+    chart.options.scales.x.min = since;
+    chart.options.scales.x.max = until;
+}
+
+async function loadHistory() {
+    const until = isLive() ? Date.now() / 1000 : view.until;
+    const since = isLive() ? until - view.range : view.since;
+    await Promise.all(charts.map(async ({ chart, metric }) => {
+        const query = `metric=${metric}&since=${Math.floor(since)}&until=${Math.ceil(until)}` +
+            `&points=${historyPoints(chart)}`;
+        let points = [];
+        try {
+            const response = await fetch(`/history?${query}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            points = (await response.json()).points.map(([t, v]) => ({ x: t, y: v }));
+        } catch (e) {
+            console.error(`[SysGuard] Error loading ${metric} history:`, e);
+        }
+        chart.data.datasets[0].data = points;
+        setWindow(chart, since, until);
+        chart.update();
+    }));
+}
+
+function selectRange(range) {
+    view.range = range;
+    view.since = view.until = null;
+    markRange();
+    loadHistory();
+}
+
+function zoom(since, until) {
+    view.since = since;
+    view.until = until;
+    markRange();
+    loadHistory();
+}
+
+function markRange() {
+    document.querySelectorAll('.range-select button').forEach(button => {
+        button.classList.toggle('active', isLive() && Number(button.dataset.range) === view.range);
+    });
+}
+
+// Drag across a chart to zoom into that window, double-click to go back live
+function enableZoom(chart) {
+    let start = null;
+    chart.canvas.addEventListener('mousedown', e => { start = e.offsetX; });
+    chart.canvas.addEventListener('mouseup', e => {
+        if (start === null) return;
+        const from = Math.min(start, e.offsetX), to = Math.max(start, e.offsetX);
+        start = null;
+        if (to - from < 5) return;
+        const scale = chart.scales.x;
+        zoom(scale.getValueForPixel(from), scale.getValueForPixel(to));
+    });
+    chart.canvas.addEventListener('dblclick', () => selectRange(view.range));
+}
+
 function updateChart(chart, value) {
+    if (!isLive()) return;
+    const now = Date.now() / 1000;
     const data = chart.data.datasets[0].data;
-    data.shift();
-    data.push(Math.min(100, Math.max(0, value)));
+    const point = { x: now, y: Math.min(100, Math.max(0, value)) };
+    // Live samples keep the history's point spacing: the newest point is
+    // moved along until a downsampled bucket's width has passed
+    const step = view.range / historyPoints(chart);
+    const last = data[data.length - 1];
+    if (last && last.live && now - last.started < step) {
+        Object.assign(last, point);
+    } else {
+        data.push(Object.assign(point, { live: true, started: now }));
+    }
+    while (data.length && data[0].x < now - view.range) data.shift();
+    setWindow(chart, now - view.range, now);
     chart.update();
 }
 
@@ -87,7 +189,7 @@ function updateTimestamp() {
     document.getElementById('footer-time').textContent = now.toLocaleString();
 }
 
-function updateProcessList(processes) {
+function updateProcessList(processes, memory) {
     const tbody = document.getElementById('process-list');
     const sorted = processes
         .sort((a, b) => b.cpu_percent - a.cpu_percent)
@@ -99,17 +201,19 @@ function updateProcessList(processes) {
     }
     
     tbody.innerHTML = sorted.map(proc => {
+        const memPercent = proc.memory_percent !== undefined ? proc.memory_percent :
+            (memory && memory.total_mb ? proc.memory_mb / memory.total_mb * 100 : 0);
         const cpuColor = proc.cpu_percent > 50 ? 'var(--danger)' : 
                         proc.cpu_percent > 25 ? 'var(--warning)' : 'inherit';
-        const memColor = proc.memory_percent > 10 ? 'var(--warning)' : 'inherit';
+        const memColor = memPercent > 10 ? 'var(--warning)' : 'inherit';
         
         return `
             <tr>
                 <td class="process-name">${escapeHtml(proc.name)}</td>
                 <td>${proc.pid}</td>
-                <td>${escapeHtml(proc.username)}</td>
+                <td>${escapeHtml(proc.username || '')}</td>
                 <td class="process-cpu" style="color: ${cpuColor}">${proc.cpu_percent.toFixed(1)}%</td>
-                <td style="text-align: right; color: ${memColor}">${proc.memory_percent.toFixed(1)}%</td>
+                <td style="text-align: right; color: ${memColor}">${memPercent.toFixed(1)}%</td>
             </tr>
         `;
     }).join('');
@@ -121,57 +225,115 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+// Subscription state: keyframes replace it, deltas patch it in place
+const state = { cpu: {}, memory: {}, disk: {}, processes: new Map() };
+
+function applyMessage(message) {
+    const data = message.data;
+    if (message.type === 'keyframe') {
+        state.processes.clear();
+    }
+    for (const channel of ['cpu', 'memory', 'disk']) {
+        if (!data[channel]) continue;
+        if (message.type === 'keyframe') state[channel] = {};
+        for (const [key, value] of Object.entries(data[channel])) {
+            // null marks a key removed from the channel
+            if (value === null) delete state[channel][key];
+            else state[channel][key] = value;
+        }
+    }
+    const procs = data.processes;
+    if (Array.isArray(procs)) {
+        procs.forEach(p => state.processes.set(p.pid, p));
+    } else if (procs) {
+        (procs.removed || []).forEach(pid => state.processes.delete(pid));
+        (procs.added || []).forEach(p => state.processes.set(p.pid, p));
+        (procs.changed || []).forEach(p => {
+            state.processes.set(p.pid, Object.assign(state.processes.get(p.pid) || {}, p));
+        });
+    }
+    return {
+        cpu: state.cpu,
+        memory: state.memory,
+        disk: state.disk,
+        processes: Array.from(state.processes.values())
+    };
+}
+
+function render(data) {
+    // CPU
+    const cpuVal = Math.round(data.cpu.usage_percent * 10) / 10;
+    const cpuEl = document.getElementById('cpu-val');
+    cpuEl.textContent = cpuVal + '%';
+    cpuEl.className = 'metric-value ' + getValueColor(cpuVal);
+
+    // Memory
+    const memVal = Math.round(data.memory.percent * 10) / 10;
+    const memEl = document.getElementById('mem-val');
+    memEl.textContent = memVal + '%';
+    memEl.className = 'metric-value ' + getValueColor(memVal);
+
+    // Disk
+    const diskVal = Math.round(data.disk.percent * 10) / 10;
+    const diskEl = document.getElementById('disk-val');
+    diskEl.textContent = diskVal + '%';
+    diskEl.className = 'metric-value ' + getValueColor(diskVal);
+
+    // Disk Bar
+    const diskBar = document.getElementById('disk-bar');
+    diskBar.style.width = diskVal + '%';
+    diskBar.className = 'progress-fill ' + getValueColor(diskVal);
+
+    // Disk Text
+    document.getElementById('disk-usage-text').textContent = 
+        `${data.disk.used_gb} GB / ${data.disk.total_gb} GB`;
+
+    // Update Charts
+    updateChart(cpuChart, cpuVal);
+    updateChart(memChart, memVal);
+
+    // Update Process List
+    if (data.processes && data.processes.length > 0) {
+        updateProcessList(data.processes, data.memory);
+    }
+}
+
 function connect() {
     const ws = new WebSocket(`ws://${location.host}/ws`);
     const statusEl = document.getElementById('status-text');
     const statusDot = document.getElementById('connection-status');
 
+    let lastSeq = 0;
+
     ws.onopen = () => {
         statusEl.textContent = '● Connected';
         statusDot.classList.add('connected');
         console.log('[SysGuard] WebSocket connected');
+        // Backfill the charts, including any gap while disconnected
+        if (isLive()) loadHistory();
+        // Keyframe, then only what changed each second
+        ws.send(JSON.stringify({
+            subscribe: ['cpu', 'memory', 'disk', 'processes'],
+            interval: 1
+        }));
     };
 
     ws.onmessage = (event) => {
         try {
-            const data = JSON.parse(event.data);
-
-            // CPU
-            const cpuVal = Math.round(data.cpu.usage_percent * 10) / 10;
-            const cpuEl = document.getElementById('cpu-val');
-            cpuEl.textContent = cpuVal + '%';
-            cpuEl.className = 'metric-value ' + getValueColor(cpuVal);
-
-            // Memory
-            const memVal = Math.round(data.memory.percent * 10) / 10;
-            const memEl = document.getElementById('mem-val');
-            memEl.textContent = memVal + '%';
-            memEl.className = 'metric-value ' + getValueColor(memVal);
-
-            // Disk
-            const diskVal = Math.round(data.disk.percent * 10) / 10;
-            const diskEl = document.getElementById('disk-val');
-            diskEl.textContent = diskVal + '%';
-            diskEl.className = 'metric-value ' + getValueColor(diskVal);
-
-            // Disk Bar
-            const diskBar = document.getElementById('disk-bar');
-            diskBar.style.width = diskVal + '%';
-            diskBar.className = 'progress-fill ' + getValueColor(diskVal);
-
-            // Disk Text
-            document.getElementById('disk-usage-text').textContent = 
-                `${data.disk.used_gb} GB / ${data.disk.total_gb} GB`;
-
-            // Update Charts
-            updateChart(cpuChart, cpuVal);
-            updateChart(memChart, memVal);
-
-            // Update Process List
-            if (data.processes && data.processes.length > 0) {
-                updateProcessList(data.processes);
+            const message = JSON.parse(event.data);
+            if (message.type === 'delta' || message.type === 'keyframe') {
+                if (message.type === 'delta' && lastSeq === 0) {
+                    // Delta without a keyframe to apply it to
+                    ws.send(JSON.stringify({ resync: true }));
+                    return;
+                }
+                lastSeq = message.seq;
+                render(applyMessage(message));
+            } else {
+                // Full document from a server without subscriptions
+                render(message.top_processes ?
+                    Object.assign({ processes: message.top_processes }, message) : message);
             }
-
         } catch (e) {
             console.error('[SysGuard] Error parsing message:', e);
         }
@@ -190,6 +352,11 @@ function connect() {
 }
 
 // Initialize
+document.querySelectorAll('.range-select button').forEach(button => {
+    button.addEventListener('click', () => selectRange(Number(button.dataset.range)));
+});
+charts.forEach(({ chart }) => enableZoom(chart));
+markRange();
 updateTimestamp();
 setInterval(updateTimestamp, 1000);
 connect();